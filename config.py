@@ -40,7 +40,48 @@ class Config:
             'base_url': '%s://%s' % ("https", os.environ.get("QUAY_HOST")),
             'test_phases': os.environ.get('TEST_PHASES'),
             'tags': os.environ.get('TAGS'),
-            'skip_push': os.environ.get('SKIP_PUSH', 'false')
+            'skip_push': os.environ.get('SKIP_PUSH', 'false'),
+            'worker_mode': os.environ.get('WORKER_MODE', 'batch').lower(),
+            'push_pull_mode': os.environ.get('PUSH_PULL_MODE', 'sequential').lower(),
+            'telemetry_interval': int(os.environ.get('TELEMETRY_INTERVAL', 10)),
+            'telemetry_window': int(os.environ.get('TELEMETRY_WINDOW', 60)),
+            'telemetry_error_rate': float(os.environ.get('TELEMETRY_ERROR_RATE', 0.05)),
+            'push_engine': os.environ.get('PUSH_ENGINE', 'podman').lower(),
+            'push_upload_mode': os.environ.get('PUSH_UPLOAD_MODE', 'monolithic').lower(),
+            'push_chunk_size_mb': int(os.environ.get('PUSH_CHUNK_SIZE_MB', 5)),
+            'push_pool_size': int(os.environ.get('PUSH_POOL_SIZE', 10)),
+            'push_pool_transport': os.environ.get('PUSH_POOL_TRANSPORT', 'podman').lower(),
+            'image_layers': int(os.environ.get('IMAGE_LAYERS', 0)),
+            'image_layer_size': os.environ.get('IMAGE_LAYER_SIZE', 'fixed:1MB'),
+            'image_compressibility': float(os.environ.get('IMAGE_COMPRESSIBILITY', 0.5)),
+            'image_seed': int(os.environ.get('IMAGE_SEED', 0)),
+            'image_format': os.environ.get('IMAGE_FORMAT', 'docker').lower(),
+            'image_shared_layers': float(os.environ.get('IMAGE_SHARED_LAYERS', 0)),
+            'push_repo_count': int(os.environ.get('PUSH_REPO_COUNT', 1)),
+            'pull_layer_parallelism': int(os.environ.get('PULL_LAYER_PARALLELISM', 6)),
+            'pull_max_in_flight': int(os.environ.get('PULL_MAX_IN_FLIGHT', 0)),
+            'pull_range_segments': int(os.environ.get('PULL_RANGE_SEGMENTS', 0)),
+            'pull_range_min_size_mb': int(os.environ.get('PULL_RANGE_MIN_SIZE_MB', 64)),
+            'attack_backend': os.environ.get('ATTACK_BACKEND', 'vegeta').lower(),
+            'attack_max_workers': int(os.environ.get('ATTACK_MAX_WORKERS', 1000)),
+            'attack_http2': os.environ.get('ATTACK_HTTP2', 'false'),
+            'target_sample_size': int(os.environ.get('TARGET_SAMPLE_SIZE', 0)),
+            'target_sample_seed': int(os.environ.get('TARGET_SAMPLE_SEED', 0)),
+            'target_sample_distribution': os.environ.get('TARGET_SAMPLE_DISTRIBUTION', 'uniform').lower(),
+            'attack_pods': int(os.environ.get('ATTACK_PODS', 1)),
+            'attack_mode': os.environ.get('ATTACK_MODE', 'fixed').lower(),
+            'saturation_strategy': os.environ.get('SATURATION_STRATEGY', 'step').lower(),
+            'saturation_start_rate': int(os.environ.get('SATURATION_START_RATE', 10)),
+            'saturation_max_rate': int(os.environ.get('SATURATION_MAX_RATE', 1000)),
+            'saturation_step_factor': float(os.environ.get('SATURATION_STEP_FACTOR', 1.5)),
+            'saturation_step_duration': int(os.environ.get('SATURATION_STEP_DURATION', 30)),
+            'slo_p99_ms': float(os.environ.get('SLO_P99_MS', 1000)),
+            'slo_success_ratio': float(os.environ.get('SLO_SUCCESS_RATIO', 0.99)),
+            'connection_matrix': os.environ.get('CONNECTION_MATRIX', ''),
+            'matrix_step_duration': int(os.environ.get('MATRIX_STEP_DURATION', 30)),
+            'scenario_mix': os.environ.get('SCENARIO_MIX', ''),
+            'scenario_duration': int(os.environ.get('SCENARIO_DURATION', 300)),
+            'scenario_seed': int(os.environ.get('SCENARIO_SEED', 0))
         }
         self.validate_config()
         return self.config
@@ -60,4 +101,30 @@ class Config:
         assert isinstance(self.config["batch_size"], int), "BATCH_SIZE is not an integer"
         assert self.config["test_namespace"], "TEST_NAMESPACE is not set"
         assert self.config["base_url"], "BASE_URL is not set"
-        assert self.config["test_phases"], "TEST_PHASES are not set. Valid options are LOAD,RUN, PUSH_PULL and DELETE"
+        assert self.config["test_phases"], "TEST_PHASES are not set. Valid options are LOAD,RUN, SCENARIO, PUSH_PULL and DELETE"
+        assert 'scenario' not in self.config["test_phases"].lower() or self.config["scenario_mix"], "SCENARIO_MIX is not set. Required for the SCENARIO phase"
+        assert self.config["worker_mode"] in ('batch', 'drain'), "WORKER_MODE must be batch or drain"
+        assert self.config["push_pull_mode"] in ('sequential', 'pipelined'), "PUSH_PULL_MODE must be sequential or pipelined"
+        assert self.config["push_pull_mode"] == 'sequential' or self.config["skip_push"] != 'true', "PUSH_PULL_MODE=pipelined requires the push phase, unset SKIP_PUSH"
+        assert self.config["telemetry_interval"] >= 1, "TELEMETRY_INTERVAL must be at least 1"
+        assert self.config["telemetry_window"] >= 1, "TELEMETRY_WINDOW must be at least 1"
+        assert self.config["push_engine"] in ('podman', 'native', 'pool'), "PUSH_ENGINE must be podman, native or pool"
+        assert self.config["push_pool_size"] >= 1, "PUSH_POOL_SIZE must be at least 1"
+        assert self.config["push_pool_transport"] in ('podman', 'skopeo'), "PUSH_POOL_TRANSPORT must be podman or skopeo"
+        assert self.config["push_upload_mode"] in ('monolithic', 'chunked'), "PUSH_UPLOAD_MODE must be monolithic or chunked"
+        assert self.config["image_layers"] == 0 or self.config["push_engine"] == 'native', "IMAGE_LAYERS requires PUSH_ENGINE=native"
+        assert 0 <= self.config["image_compressibility"] <= 1, "IMAGE_COMPRESSIBILITY must be between 0 and 1"
+        assert self.config["image_format"] in ('docker', 'oci'), "IMAGE_FORMAT must be docker or oci"
+        assert 0 <= self.config["image_shared_layers"] <= 1, "IMAGE_SHARED_LAYERS must be between 0 and 1"
+        assert self.config["image_shared_layers"] == 0 or self.config["image_layers"] > 0, "IMAGE_SHARED_LAYERS requires IMAGE_LAYERS"
+        assert self.config["push_repo_count"] >= 1, "PUSH_REPO_COUNT must be at least 1"
+        assert self.config["attack_backend"] in ('vegeta', 'asyncio'), "ATTACK_BACKEND must be vegeta or asyncio"
+        assert isinstance(self.config["attack_max_workers"], int), "ATTACK_MAX_WORKERS is not an integer"
+        assert self.config["attack_pods"] >= 1, "ATTACK_PODS must be at least 1"
+        assert self.config["attack_pods"] == 1 or self.config["attack_backend"] == 'vegeta', "ATTACK_PODS > 1 requires ATTACK_BACKEND=vegeta"
+        assert self.config["attack_mode"] in ('fixed', 'saturation', 'matrix'), "ATTACK_MODE must be fixed, saturation or matrix"
+        assert self.config["attack_mode"] == 'fixed' or self.config["attack_pods"] == 1, "ATTACK_MODE=%s requires ATTACK_PODS=1" % self.config["attack_mode"]
+        assert self.config["attack_mode"] != 'matrix' or self.config["connection_matrix"], "CONNECTION_MATRIX is not set. Required for ATTACK_MODE=matrix"
+        assert self.config["saturation_strategy"] in ('step', 'binary'), "SATURATION_STRATEGY must be step or binary"
+        assert isinstance(self.config["target_sample_size"], int), "TARGET_SAMPLE_SIZE is not an integer"
+        assert self.config["target_sample_distribution"] in ('uniform', 'zipfian'), "TARGET_SAMPLE_DISTRIBUTION must be uniform or zipfian"
@@ -1,4 +1,5 @@
 from utils.attacker import Attacker
+from utils.targets import pairs
 from utils.util import print_header
 
 
@@ -10,7 +11,7 @@ class Permissions:
         pass
     
     @staticmethod
-    def add_teams_to_organization_repos(quay_url, org, repos, teams):
+    def add_teams_to_organization_repos(quay_url, org, repos, teams, **sampling):
         """
         Give all specified teams access to all specified repos.
 
@@ -18,14 +19,15 @@ class Permissions:
         :param org: test org to add teams to repos
         :param repos: repos in which teams need to be added
         :param teams: list of teams
+        :param sampling: optional sample_size, seed and distribution to only
+            hit a subset of the combinations (see utils.targets.pairs)
         :return None
         """
         print_header("Running: Grant teams access to repositories")
         path = '/api/v1/repository/%s' % org
         base_url = quay_url + path
-        reqs = []
-        for repo in repos:
-            for team in teams:
+        def reqs():
+            for repo, team in pairs(repos, teams, **sampling):
                 url = base_url + '/%s/permissions/team/%s' % (repo, team)
                 body = {'role': 'admin'}
                 request = {
@@ -33,12 +35,12 @@ class Permissions:
                     'body': body,
                     'method': 'PUT',
                 }
-                reqs.append(request)
+                yield request
         target_name = "'PUT %s'" % path
-        Attacker().run_vegeta('add_teams_to_organizations_repos', reqs, target_name=target_name)
+        Attacker().run_vegeta('add_teams_to_organizations_repos', reqs(), target_name=target_name)
     
     @staticmethod
-    def add_users_to_organization_repos(quay_url, org, repos, users):
+    def add_users_to_organization_repos(quay_url, org, repos, users, **sampling):
         """
         Give all specified users access to all specified repos.
 
@@ -46,14 +48,15 @@ class Permissions:
         :param org: test org to add users to repos
         :param repos: repos in which users need to be added
         :param users: list of users
+        :param sampling: optional sample_size, seed and distribution to only
+            hit a subset of the combinations (see utils.targets.pairs)
         :return None
         """
         print_header("Running: Grant users access to repositories")
         path = '/api/v1/repository/%s' % org
         base_url = quay_url + path
-        reqs = []
-        for repo in repos:
-            for user in users:
+        def reqs():
+            for repo, user in pairs(repos, users, **sampling):
                 url = base_url + '/%s/permissions/user/%s' % (repo, user)
                 body = {'role': 'admin'}
                 request = {
@@ -61,10 +64,10 @@ class Permissions:
                     'body': body,
                     'method': 'PUT',
                 }
-                reqs.append(request)
+                yield request
 
         target_name = "'PUT %s'" % path
-        Attacker().run_vegeta('add_users_to_organizations_repos', reqs, target_name=target_name)
+        Attacker().run_vegeta('add_users_to_organizations_repos', reqs(), target_name=target_name)
     
     @staticmethod
     def list_team_permissions(quay_url, org, teams):
@@ -91,7 +94,7 @@ class Permissions:
         Attacker().run_vegeta('list_team_permissions', reqs, target_name=target_name)
 
     @staticmethod
-    def get_teams_of_organization_repos(quay_url, org, repos, teams):
+    def get_teams_of_organization_repos(quay_url, org, repos, teams, **sampling):
         """
         Fetches the permission info of the specified team in all specified repos.
 
@@ -99,22 +102,23 @@ class Permissions:
         :param org: test org to list teams from
         :param repos: list of repos to scan
         :param teams: list of teams to GET
+        :param sampling: optional sample_size, seed and distribution to only
+            hit a subset of the combinations (see utils.targets.pairs)
         :return: None
         """
         print_header("Running: Fetch teams access to repositories")
         path = '/api/v1/repository/%s' % org
         base_url = quay_url + path
-        reqs = []
-        for repo in repos:
-            for team in teams:
+        def reqs():
+            for repo, team in pairs(repos, teams, **sampling):
                 url = base_url + '/%s/permissions/team/%s' % (repo, team)
                 request = {
                     'url': url,
                     'method': 'GET',
                 }
-                reqs.append(request)
+                yield request
         target_name = "'GET %s'" % path
-        Attacker().run_vegeta('get_teams_of_organizations_repos', reqs, target_name=target_name)
+        Attacker().run_vegeta('get_teams_of_organizations_repos', reqs(), target_name=target_name)
     
     @staticmethod
     def list_teams_of_organization_repos(quay_url, org, repos):
@@ -141,7 +145,7 @@ class Permissions:
         Attacker().run_vegeta('list_teams_of_organizations_repos', reqs, target_name=target_name)
     
     @staticmethod
-    def get_users_of_organization_repos(quay_url, org, repos, users):
+    def get_users_of_organization_repos(quay_url, org, repos, users, **sampling):
         """
         Fetches the permission of the specified user in all specified repos.
 
@@ -149,22 +153,23 @@ class Permissions:
         :param org: test org to list user permissions in
         :param repos: list of repos to scan
         :param users: list of users to fetch info
+        :param sampling: optional sample_size, seed and distribution to only
+            hit a subset of the combinations (see utils.targets.pairs)
         :return None
         """
         print_header("Running: Fetch users access to repositories")
         path = '/api/v1/repository/%s' % org
         base_url = quay_url + path
-        reqs = []
-        for repo in repos:
-            for user in users:
+        def reqs():
+            for repo, user in pairs(repos, users, **sampling):
                 url = base_url + '/%s/permissions/user/%s' % (repo, user)
                 request = {
                     'url': url,
                     'method': 'GET',
                 }
-                reqs.append(request)
+                yield request
         target_name = "'GET %s'" % path
-        Attacker().run_vegeta('get_users_of_organizations_repos', reqs, target_name=target_name)
+        Attacker().run_vegeta('get_users_of_organizations_repos', reqs(), target_name=target_name)
 
     @staticmethod
     def list_users_of_organization_repos(quay_url, org, repos):
@@ -191,7 +196,7 @@ class Permissions:
         Attacker().run_vegeta('list_users_of_organizations_repos', reqs, target_name=target_name)
     
     @staticmethod
-    def delete_teams_of_organization_repos(quay_url, org, repos, teams):
+    def delete_teams_of_organization_repos(quay_url, org, repos, teams, **sampling):
         """
         Deletes the permissions of the specified team in all specified repos.
 
@@ -199,25 +204,26 @@ class Permissions:
         :param org: test org to delete team permissions in
         :param repos: list of repos to scan
         :param teams: list of teams to delete
+        :param sampling: optional sample_size, seed and distribution to only
+            hit a subset of the combinations (see utils.targets.pairs)
         :return None
         """
         print_header("Running: Delete teams access to repositories")
         path = '/api/v1/repository/%s' % org
         base_url = quay_url + path
-        reqs = []
-        for repo in repos:
-            for team in teams:
+        def reqs():
+            for repo, team in pairs(repos, teams, **sampling):
                 url = base_url + '/%s/permissions/team/%s' % (repo, team)
                 request = {
                     'url': url,
                     'method': 'DELETE',
                 }
-                reqs.append(request)
+                yield request
         target_name = "'DELETE %s'" % path
-        Attacker().run_vegeta('delete_teams_of_organizations_repos', reqs, target_name=target_name)
+        Attacker().run_vegeta('delete_teams_of_organizations_repos', reqs(), target_name=target_name)
     
     @staticmethod
-    def delete_users_of_organization_repos(quay_url, org, repos, users):
+    def delete_users_of_organization_repos(quay_url, org, repos, users, **sampling):
         """
         Deletes the permissions of the specified user in all specified repos.
 
@@ -225,19 +231,20 @@ class Permissions:
         :param org: test org to delete user permissions in
         :param repos: list of repos to scan
         :param users: list of users to delete
+        :param sampling: optional sample_size, seed and distribution to only
+            hit a subset of the combinations (see utils.targets.pairs)
         :return None
         """
         print_header("Running: Delete users access to repositories")
         path = '/api/v1/repository/%s' % org
         base_url = quay_url + path
-        reqs = []
-        for repo in repos:
-            for user in users:
+        def reqs():
+            for repo, user in pairs(repos, users, **sampling):
                 url = base_url + '/%s/permissions/user/%s' % (repo, user)
                 request = {
                     'url': url,
                     'method': 'DELETE',
                 }
-                reqs.append(request)
+                yield request
         target_name = "'DELETE %s'" % path
-        Attacker().run_vegeta('delete_users_of_organizations_repos', reqs, target_name=target_name)
\ No newline at end of file
+        Attacker().run_vegeta('delete_users_of_organizations_repos', reqs(), target_name=target_name)
\ No newline at end of file
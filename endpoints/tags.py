@@ -107,14 +107,14 @@ class Tags:
         print_header("Running: Delete Repository Tags")
         path = '/api/v1/repository/%s/%s' % (org, repo)
         base_url = quay_url + path
-        reqs = []
-        for i in range(target_hit_size):
-            for tag in tags:
-                url = base_url + '/tag/%s' % (tag)
-                request = {
-                    'url': url,
-                    'method': 'DELETE'
-                }
-                reqs.append(request)
+        def reqs():
+            for i in range(target_hit_size):
+                for tag in tags:
+                    url = base_url + '/tag/%s' % (tag)
+                    request = {
+                        'url': url,
+                        'method': 'DELETE'
+                    }
+                    yield request
         target_name = "'DELETE %s'" % path
-        Attacker().run_vegeta('delete_repository_tags', reqs, target_name=target_name)
\ No newline at end of file
+        Attacker().run_vegeta('delete_repository_tags', reqs(), target_name=target_name)
\ No newline at end of file
@@ -1,4 +1,5 @@
 from utils.attacker import Attacker
+from utils.targets import pairs
 from utils.util import print_header
 
 
@@ -58,7 +59,7 @@ class Teams:
         Attacker().run_vegeta('delete_teams', reqs, target_name=target_name)
 
     @staticmethod
-    def add_team_members(quay_url, org, teams, users):
+    def add_team_members(quay_url, org, teams, users, **sampling):
         """
         Add every specified user to every specified team.
 
@@ -66,14 +67,15 @@ class Teams:
         :param org: test org to create teams in
         :param teams: list of teams
         :param users: list of users
+        :param sampling: optional sample_size, seed and distribution to only
+            hit a subset of the combinations (see utils.targets.pairs)
         :return None
         """
         print_header("Running: Add Users to Teams")
         path = '/api/v1/organization/%s/team' % org
         base_url = quay_url + path
-        reqs = []
-        for team in teams:
-            for user in users:
+        def reqs():
+            for team, user in pairs(teams, users, **sampling):
                 url = base_url + '/%s/members/%s' % (team, user)
                 body = {}  # No content
                 request = {
@@ -81,9 +83,9 @@ class Teams:
                     'url': url,
                     'method': 'PUT'
                 }
-                reqs.append(request)
+                yield request
         target_name = "'PUT %s'" % path
-        Attacker().run_vegeta('add_team_members', reqs, target_name=target_name)
+        Attacker().run_vegeta('add_team_members', reqs(), target_name=target_name)
     
     @staticmethod
     def list_team_members(quay_url, org, teams):
@@ -110,7 +112,7 @@ class Teams:
         Attacker().run_vegeta('list_team_members', reqs, target_name=target_name)
     
     @staticmethod
-    def delete_team_members(quay_url, org, teams, users):
+    def delete_team_members(quay_url, org, teams, users, **sampling):
         """
         Delete every specified user to every specified team.
 
@@ -118,14 +120,15 @@ class Teams:
         :param org: test org to delete teams members in
         :param teams: list of teams
         :param users: list of users
+        :param sampling: optional sample_size, seed and distribution to only
+            hit a subset of the combinations (see utils.targets.pairs)
         :return None
         """
         print_header("Running: Delete Users to Teams")
         path = '/api/v1/organization/%s/team' % org
         base_url = quay_url + path
-        reqs = []
-        for team in teams:
-            for user in users:
+        def reqs():
+            for team, user in pairs(teams, users, **sampling):
                 url = base_url + '/%s/members/%s' % (team, user)
                 body = {}  # No content
                 request = {
@@ -133,6 +136,6 @@ class Teams:
                     'url': url,
                     'method': 'DELETE'
                 }
-                reqs.append(request)
+                yield request
         target_name = "'DELETE %s'" % path
-        Attacker().run_vegeta('delete_team_members', reqs, target_name=target_name)
\ No newline at end of file
+        Attacker().run_vegeta('delete_team_members', reqs(), target_name=target_name)
\ No newline at end of file
@@ -7,7 +7,7 @@ import platform
 import sys
 import json
 import uuid
-import hashlib
+import itertools
 import multiprocessing as mp
 from endpoints.users import Users
 from endpoints.repositories import Repositories
@@ -15,9 +15,21 @@ from endpoints.teams import Teams
 from endpoints.permissions import Permissions
 from endpoints.tags import Tags
 from config import Config
-from utils.util import print_header
+from utils.attacker import Attacker
+from utils.histogram import LatencyHistogram
+from utils.jobs import wait_for_job
+from utils.scenario import Scenario, parse_mix
+from utils.puller import AsyncPuller
+from utils.pusher import NativePusher
+from utils.pushstats import PushStats
+from utils.imagegen import ImageGenerator
+from utils.imagepool import ImagePool
+from utils.session import merge_connection_stats
+from utils.results import ResultStream
+from utils.telemetry import Telemetry
+from utils.tagqueue import TagQueue, TagRange
+from utils.util import print_header, imap_bounded
 from urllib3.exceptions import InsecureRequestWarning
-from statistics import mean
 from subprocess import Popen, PIPE
 
 import redis
@@ -30,7 +42,7 @@ except ImportError:
     Elasticsearch = None
     helpers = None
 from kubernetes import client, config
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 
 requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -38,6 +50,22 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 # Used for executing tests across multiple pods
 redis_client = redis.Redis(host='redis')
 
+# Push results indexed into Elasticsearch per bulk request.
+ES_BATCH_SIZE = 1000
+
+
+def wait_for_redis(timeout=300):
+    """
+    Block until Redis, deployed next to this Job, accepts connections.
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return redis_client.ping()
+        except redis.exceptions.ConnectionError:
+            assert time.time() < deadline, "Redis did not become reachable in %ss" % timeout
+            time.sleep(1)
+
 
 def write_results_to_file(results, results_dir, filename):
     if not os.path.isdir(results_dir):
@@ -92,10 +120,13 @@ def podman_login(username, password):
     assert p.returncode == 0
 
 
-def build_push_delete_single_image(tag, custom_build_image, max_failures=3):
+def build_push_delete_single_image(tag, custom_build_image, max_failures=3, on_pushed=None):
     """
     Build, push, and delete a single image in one flow.
     Returns statistics dict matching push_single_image format.
+
+    :param on_pushed: optional callable(tag) called as soon as the push
+        succeeded, before the image is deleted
     """
     # Build
     unique_id = str(uuid.uuid4())
@@ -155,6 +186,10 @@ def build_push_delete_single_image(tag, custom_build_image, max_failures=3):
             logging.info(f"Retrying {failure_count}/{max_failures}")
 
     end_time = datetime.datetime.utcnow()
+    # Publish once the push is timed, so the Redis write is not counted
+    # in its latency.
+    if success_count and on_pushed:
+        on_pushed(tag)
 
     # Delete image (always attempt)
     delete_cmd = [
@@ -183,265 +218,208 @@ def build_push_delete_single_image(tag, custom_build_image, max_failures=3):
     }
 
 
-def podman_create(tags, custom_build_image="", concurrency=4):
+def native_pusher(env_config, username, password, concurrency):
+    """
+    Return a NativePusher configured from the env config, generating
+    images with IMAGE_LAYERS layers when set.
+    """
+    generator = None
+    if env_config["image_layers"] > 0:
+        generator = ImageGenerator(env_config["image_seed"], env_config["image_layers"],
+                                   env_config["image_layer_size"], env_config["image_compressibility"],
+                                   env_config["image_format"], env_config["image_shared_layers"])
+    return NativePusher(username, password, concurrency, env_config["push_upload_mode"],
+                        env_config["push_chunk_size_mb"] * 1024 * 1024, generator=generator,
+                        dedup=env_config["image_shared_layers"] > 0)
+
+
+def publish_pushed(push, on_pushed):
+    """
+    Wrap a push function to call `on_pushed(tag)` after every successful push.
+    """
+    def push_and_publish(tag):
+        result = push(tag)
+        if result is not None and result['successful']:
+            on_pushed(tag)
+        return result
+    return push_and_publish
+
+
+def podman_create(tags, custom_build_image="", concurrency=4, username=None, password=None):
     """
     Build, push, and delete multiple images concurrently using Podman.
     Each image follows: build -> push -> delete in a single flow.
+    With PUSH_ENGINE=native, synthesized images are uploaded straight to
+    the registry API instead, and with PUSH_ENGINE=pool every tag is pushed
+    from a pool of images built once. With PUSH_PULL_MODE=pipelined every
+    pushed tag is queued for the pull pods right away.
     """
-    print_header("Running: Build, Push, and Delete images using Podman", quantity=len(tags))
     env_config = Config().get_config()
-
-    # Process all images concurrently (build -> push -> delete)
-    push_results = []
-    with ThreadPoolExecutor(max_workers=concurrency) as executor:
-        futures = {
-            executor.submit(build_push_delete_single_image, tag, custom_build_image): tag 
-            for tag in tags
-        }
-        
-        for n, future in enumerate(as_completed(futures)):
-            result = future.result()
-            
-            # Only add successful results (build_push_delete returns None on build failure)
-            if result is not None:
-                # Add metadata
-                result['uuid'] = env_config["test_uuid"]
-                result['cluster_name'] = env_config["quay_host"]
-                result['hostname'] = platform.node()
-                push_results.append(result)
+    total = len(tags) if isinstance(tags, list) else 'queued'
+    pool = None
+    on_pushed = None
+    if env_config["push_pull_mode"] == 'pipelined':
+        pull_queue = tag_queue('pull', username)
+        on_pushed = lambda tag: pull_queue.push([tag])
+    if env_config["push_engine"] == 'native':
+        print_header("Running: Push images through the registry API", quantity=total)
+        pusher = native_pusher(env_config, username, password, concurrency)
+        push_single_image = pusher.push
+    elif env_config["push_engine"] == 'pool':
+        print_header("Running: Push images from a pool of prebuilt images", quantity=total,
+                     pool_size=env_config["push_pool_size"], transport=env_config["push_pool_transport"])
+        pool = ImagePool(env_config["push_pool_size"], custom_build_image, concurrency,
+                         env_config["push_pool_transport"])
+        pool.build()
+        push_single_image = pool.push
+    else:
+        print_header("Running: Build, Push, and Delete images using Podman", quantity=total)
+        push_single_image = lambda tag: build_push_delete_single_image(tag, custom_build_image,
+                                                                       on_pushed=on_pushed)
+    if on_pushed and env_config["push_engine"] != 'podman':
+        push_single_image = publish_pushed(push_single_image, on_pushed)
+
+    # Process all images concurrently (build -> push -> delete). Tags are
+    # only taken when a worker is free, so they can be drained from a queue.
+    # Results are only streamed, the pod keeps their running summary.
+    stats = PushStats()
+    es_batch = []
+    result_stream = ResultStream(redis_client, 'push_results:' + env_config["test_uuid"])
+    telemetry = Telemetry(redis_client, 'push_telemetry:' + env_config["test_uuid"])
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for n, result in enumerate(imap_bounded(executor, push_single_image, tags, concurrency)):
+                # Only add successful results (build_push_delete returns None on build failure)
+                if result is not None:
+                    # Add metadata
+                    result['uuid'] = env_config["test_uuid"]
+                    result['cluster_name'] = env_config["quay_host"]
+                    result['hostname'] = platform.node()
+                    result_stream.add(result)
+                    stats.add(result)
+                    if env_config["es_host"]:
+                        es_batch.append(result)
+                        if len(es_batch) >= ES_BATCH_SIZE:
+                            write_results_to_es(env_config, es_batch)
+                            es_batch = []
+                    telemetry.record(result['successful'], result['elapsed_time'], result.get('bytes', 0))
+                else:
+                    telemetry.record(False)
             
-            if n % 10 == 0:
-                logging.info(f"{n}/{len(tags)} images completed pushing")
+                if n % 10 == 0:
+                    logging.info(f"{n}/{total} images completed pushing")
+    finally:
+        # Do not leave the pool images and layouts on the pod when a push raises.
+        if pool:
+            pool.close()
+    telemetry.flush()
 
     # Compute summary
-    if push_results:
-        elapsed_times = [r['elapsed_time'] for r in push_results]
-        summary = {
-            'durations': {
-                'mean': mean(elapsed_times),
-                'max': max(elapsed_times),
-                'min': min(elapsed_times),
-            },
-            'total': len(push_results),
-            'successful': sum(1 for r in push_results if r['successful']),
-            'failed': sum(1 for r in push_results if not r['successful']),
-        }
-    else:
-        summary = {'durations': {}, 'total': 0, 'successful': 0, 'failed': 0}
-
-    # Write results to local filesystem
-    write_results_to_file({'summary': summary, 'results': push_results},
-                          env_config["results_directory"],
+    summary = stats.summary(native=env_config["push_engine"] == 'native')
+    if env_config["push_engine"] == 'native':
+        summary['connections'] = pusher.connection_stats()
+        pusher.close()
+
+    # Write the summary to local filesystem, the controller writes the
+    # results it collects from the stream.
+    write_results_to_file({'summary': summary}, env_config["results_directory"],
                           '%s_push_results.json' % env_config["test_uuid"])
 
-    write_results_to_es(env_config, push_results)
+    write_results_to_es(env_config, es_batch)
 
-    for r in push_results:
-        redis_client.rpush('push_results:' + env_config["test_uuid"],
-                           json.dumps(r, default=lambda o: o.isoformat() if isinstance(o, datetime.datetime) else str(o)))
+    result_stream.flush()
+    redis_client.rpush('push_histograms:' + env_config["test_uuid"], stats.durations.dumps())
+    if 'connections' in summary:
+        redis_client.rpush('push_connections:' + env_config["test_uuid"], json.dumps(summary['connections']))
 
     logging.info('Podman-Push Summary')
     logging.info(json.dumps(summary, sort_keys=True, indent=2))
 
 
-def get_auth_token(registry, repository, username=None, password=None):
+def result_time(value):
     """
-    Get authentication token from registry.
+    Return a result timestamp as a datetime. Results collected from Redis
+    carry ISO formatted timestamps.
     """
-    auth_url = f"https://{registry}/v2/auth?service={registry}&scope=repository:{repository}:pull"
-    
-    try:
-        if username and password:
-            response = requests.get(auth_url, auth=(username, password), verify=False)
-        else:
-            response = requests.get(auth_url, verify=False)
-        
-        response.raise_for_status()
-        token = response.json().get('token')
-        return token
-    except Exception as e:
-        logging.info(f"Failed to get auth token: {e}")
-        return None
-
-
-def handle_token_refresh(status_code, registry, repository, username, password, current_token, token_refresh_count, max_token_refresh, context_label):
-    if status_code != 401 or token_refresh_count >= max_token_refresh:
-        return False, current_token, token_refresh_count
-    token_refresh_count += 1
-    new_token = get_auth_token(registry, repository, username, password)
-    if new_token:
-        logging.info(f"{context_label} got 401, token refreshed successfully (refresh {token_refresh_count}/{max_token_refresh})")
-        return True, new_token, token_refresh_count
-    else:
-        logging.warning(f"{context_label} got 401, token refresh failed, retrying with existing token (refresh {token_refresh_count}/{max_token_refresh})")
-        return True, current_token, token_refresh_count
+    return datetime.datetime.fromisoformat(value) if isinstance(value, str) else value
 
 
-
-def get_image_manifest(registry, repository, tag, token, username=None, password=None, max_token_refresh=3):
+def pipeline_summary(push_results, pull_results):
     """
-    Fetch the manifest for a given image tag.
-    On 401 (expired token), refreshes the auth token and retries.
-    Returns (layer_digests, current_token) tuple.
+    Summarize a pipelined push/pull run: how long pushed tags waited for a
+    pull pod (queue delay), the push-to-first-pull latency from the end of
+    a push to the end of the first successful pull of the tag, and the
+    mixed push and pull throughput over the wall-clock time of the run.
     """
-    manifest_url = f"https://{registry}/v2/{repository}/manifests/{tag}"
-    current_token = token
-    token_refresh_count = 0
-
-    while token_refresh_count <= max_token_refresh:
-        headers = {
-            'Accept': 'application/vnd.docker.distribution.manifest.v2+json',
-        }
-
-        if current_token:
-            headers['Authorization'] = f'Bearer {current_token}'
-
-        try:
-            response = requests.get(manifest_url, headers=headers, verify=False)
-            logging.debug(f"Fetching manifest for {tag}, HTTP {response.status_code}")
-
-            refreshed, current_token, token_refresh_count = handle_token_refresh(
-                response.status_code, registry, repository, username, password, current_token, token_refresh_count, max_token_refresh, f"Manifest {tag}")
-            if refreshed:
-                continue
-
-            response.raise_for_status()
-            manifest = response.json()
-
-            layers = []
-            if 'layers' in manifest:
-                layers = [layer['digest'] for layer in manifest['layers']]
-            elif 'fsLayers' in manifest:  # Older manifest format
-                layers = [layer['blobSum'] for layer in manifest['fsLayers']]
-
-            return layers, current_token
-        except Exception as e:
-            logging.error(f"Failed to get manifest for {tag}: {e}")
-            return [], current_token
-
-    return [], current_token
+    pushed = {r['tag']: result_time(r['end_time']) for r in push_results if r.get('successful')}
+    first_pulls = {}
+    for r in pull_results:
+        if r.get('successful') and r['tag'] in pushed:
+            start, end = result_time(r['start_time']), result_time(r['end_time'])
+            if r['tag'] not in first_pulls or end < first_pulls[r['tag']][1]:
+                first_pulls[r['tag']] = (start, end)
+
+    queue_delay = LatencyHistogram()
+    push_to_first_pull = LatencyHistogram()
+    for tag, (start, end) in first_pulls.items():
+        queue_delay.record((start - pushed[tag]).total_seconds())
+        push_to_first_pull.record((end - pushed[tag]).total_seconds())
+
+    results = push_results + pull_results
+    elapsed = 0.0
+    if results:
+        elapsed = (max(result_time(r['end_time']) for r in results) -
+                   min(result_time(r['start_time']) for r in results)).total_seconds()
+    return {
+        'tags_pushed': len(pushed),
+        'tags_pulled': len(first_pulls),
+        'queue_delay': queue_delay.summary(),
+        'push_to_first_pull': push_to_first_pull.summary(),
+        'elapsed': elapsed,
+        'push_per_sec': round(len(push_results) / elapsed, 2) if elapsed > 0 else 0.0,
+        'pull_per_sec': round(len(pull_results) / elapsed, 2) if elapsed > 0 else 0.0,
+        'ops_per_sec': round(len(results) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
 
 
-def fetch_layer_with_retries(registry, repository, digest, token, username=None, password=None, max_attempts=3, max_token_refresh=3):
+def transfer_summary(results):
     """
-    Attempt to download a single layer up to max_attempts times.
-    On 401 (expired token), refreshes the auth token and retries
-    without consuming a retry attempt.
-    Returns True on success, False on permanent failure.
+    Summarize the bytes pulled and their aggregate rate over the time the
+    pulls ran, next to the manifest, blob redirect, and layer storage
+    latencies and the storage hosts that served the layers. The manifest
+    and redirect latencies reflect Quay, the storage latencies and the rate
+    the blob storage.
     """
-    url = f"https://{registry}/v2/{repository}/blobs/{digest}"
-    current_token = token
-    token_refresh_count = 0
-    attempt = 0
-
-    while attempt < max_attempts:
-        attempt += 1
-        try:
-            headers = {"Authorization": f"Bearer {current_token}"}
-            with requests.get(url, headers=headers, stream=True, verify=False) as r:
-                logging.debug(f"Fetching layer {digest}, attempt {attempt}, HTTP {r.status_code}")
-
-                refreshed, current_token, token_refresh_count = handle_token_refresh(
-                    r.status_code, registry, repository, username, password, current_token, token_refresh_count, max_token_refresh, f"Layer {digest}")
-                if refreshed:
-                    attempt -= 1
-                    continue
-
-                r.raise_for_status()
-                sha = hashlib.sha256()
-                for chunk in r.iter_content(chunk_size=2 * 1024 * 1024):  # 2MB chunks
-                    if not chunk:
-                        break
-                    sha.update(chunk)  # simulate compute load
-                _ = sha.digest()
-            logging.info(f"Layer {digest} succeeded on attempt {attempt} (HTTP {r.status_code})")
-            return True
-        except Exception as e:
-            logging.warning(f"Layer {digest} attempt {attempt} failed: {e}")
-            if attempt >= max_attempts:
-                logging.error(f"Layer {digest} failed after {max_attempts} attempts: {e}")
-                return False
-
-
-def pull_single_image_http(tag, username=None, password=None, max_failures=3):
-    """
-    Pull image layers over HTTP (no local storage) with per-layer retries.
-    Returns a dict matching your ES schema.
-    """
-    # parse registry/repository:tag
-    try:
-        parts = tag.split('/', 1)
-        registry = parts[0]
-        repo_tag = parts[1]
-        repository, image_tag = repo_tag.rsplit(':', 1)
-    except Exception:
-        logging.info(f"Malformed tag: {tag}")
-        return None
-
-    start_time = datetime.datetime.utcnow()
-
-    # get token and manifest
-    try:
-        token = get_auth_token(registry, repository, username, password)
-    except Exception as e:
-        logging.info(f"Auth/token retrieval failed for {tag}: {e}")
-        return {
-            'tag': tag,
-            'targets': "image_pulls",
-            'elapsed_time': 0.0,
-            'start_time': start_time,
-            'end_time': datetime.datetime.utcnow(),
-            'success_count': 0,
-            'failure_count': 1,
-            'successful': False,
-        }
-
-    digests, token = get_image_manifest(registry, repository, image_tag, token, username, password)
-    if not digests:
-        end_time = datetime.datetime.utcnow()
-        elapsed_time = (end_time - start_time).total_seconds()
-        return {
-            'tag': tag,
-            'targets': "image_pulls",
-            'elapsed_time': elapsed_time,
-            'start_time': start_time,
-            'end_time': end_time,
-            'success_count': 0,
-            'failure_count': 1,
-            'successful': False,
-        }
-
-    success_count = 0
-    failure_count = 0
-
-    # Submit layer fetch tasks (each task includes its own retry logic)
-    with ThreadPoolExecutor(max_workers=6) as layer_pool:
-        futures = {
-            layer_pool.submit(fetch_layer_with_retries, registry, repository, d, token, username, password, max_failures): d
-            for d in digests
-        }
-        for fut in as_completed(futures):
-            ok = fut.result()
-            if not ok:
-                failure_count += 1
-
-    if failure_count == 0:
-        success_count = 1
-    end_time = datetime.datetime.utcnow()
-    elapsed_time = (end_time - start_time).total_seconds()
-    layers_succeeded = len(digests) - failure_count
-    layers_per_sec = layers_succeeded / elapsed_time if elapsed_time > 0 else 0.0
-
+    manifest_times = LatencyHistogram()
+    redirect_times = LatencyHistogram()
+    layer_ttfb = LatencyHistogram()
+    storage_times = LatencyHistogram()
+    storage_hosts = {}
+    for r in results:
+        if 'manifest_time' in r:
+            manifest_times.record(r['manifest_time'])
+        for layer in r.get('layers', []):
+            if layer['successful']:
+                if layer['redirect_time']:
+                    redirect_times.record(layer['redirect_time'])
+                layer_ttfb.record(layer['ttfb'])
+                storage_times.record(layer['storage_time'])
+                storage_hosts[layer['storage_host']] = storage_hosts.get(layer['storage_host'], 0) + 1
+
+    num_bytes = sum(r.get('bytes', 0) for r in results)
+    elapsed = 0.0
+    if results:
+        elapsed = (max(result_time(r['end_time']) for r in results) -
+                   min(result_time(r['start_time']) for r in results)).total_seconds()
     return {
-        'tag': tag,
-        'targets': "image_pulls",
-        'elapsed_time': elapsed_time,
-        'start_time': start_time,
-        'end_time': end_time,
-        'success_count': success_count,
-        'failure_count': failure_count,
-        'successful': (failure_count == 0),
-        'layers_per_sec': round(layers_per_sec, 2),
+        'bytes': num_bytes,
+        'bytes_per_sec': round(num_bytes / elapsed, 2) if elapsed > 0 else 0.0,
+        'mb_per_sec': round(num_bytes / elapsed / 1e6, 3) if elapsed > 0 else 0.0,
+        'manifest_times': manifest_times.summary(),
+        'redirect_times': redirect_times.summary(),
+        'layer_ttfb': layer_ttfb.summary(),
+        'storage_times': storage_times.summary(),
+        'storage_hosts': storage_hosts,
     }
 
 
@@ -452,45 +430,63 @@ def podman_pull(tags, concurrency, username=None, password=None):
     """
     logging.info("Running: HTTP-based image pull for all tags")
     env_config = Config().get_config()
+    total = len(tags) if isinstance(tags, list) else 'queued'
+
+    # All images are pulled on one event loop sharing a pool of keep-alive
+    # connections and one token per repository.
+    puller = AsyncPuller(
+        username,
+        password,
+        concurrency=concurrency,
+        layer_parallelism=env_config["pull_layer_parallelism"],
+        max_in_flight=env_config["pull_max_in_flight"],
+        range_segments=env_config["pull_range_segments"],
+        range_min_size=env_config["pull_range_min_size_mb"] * 1024 * 1024,
+    )
 
     results = []
-    with ThreadPoolExecutor(max_workers=concurrency) as executor:
-        futures = {
-            executor.submit(pull_single_image_http, tag, username, password): tag
-            for tag in tags
-        }
-        for n, fut in enumerate(as_completed(futures)):
-            result = fut.result()
-            if result is None:
-                continue
-
-            # Add metadata consistent with previous schema
-            result['uuid'] = env_config["test_uuid"]
-            result['cluster_name'] = env_config["quay_host"]
-            result['hostname'] = platform.node()
-
-            results.append(result)
-
-            if n % 10 == 0:
-                logging.info(f"Pulling {n}/{len(tags)} images completed.")
+    histogram = LatencyHistogram()
+    done = itertools.count(1)
+    result_stream = ResultStream(redis_client, 'pull_results:' + env_config["test_uuid"])
+    telemetry = Telemetry(redis_client, 'pull_telemetry:' + env_config["test_uuid"])
+
+    def on_result(result):
+        n = next(done)
+        if result is None:
+            telemetry.record(False)
+            return
+
+        # Add metadata consistent with previous schema
+        result['uuid'] = env_config["test_uuid"]
+        result['cluster_name'] = env_config["quay_host"]
+        result['hostname'] = platform.node()
+
+        results.append(result)
+        result_stream.add(result)
+        telemetry.record(result['successful'], result['elapsed_time'], result.get('bytes', 0))
+        if result['successful']:
+            histogram.record(result['elapsed_time'])
+
+        if n % 10 == 0:
+            logging.info(f"Pulling {n}/{total} images completed.")
+
+    puller.run(tags, on_result)
+    telemetry.flush()
+    connections = puller.connection_stats()
+    auth = puller.token_cache.stats()
 
     # Compute summary — duration stats from successful images only
     successful_results = [r for r in results if r['successful']]
     failed_count = sum(1 for r in results if not r['successful'])
 
     if successful_results:
-        elapsed_times = [r['elapsed_time'] for r in successful_results]
         success_starts = [r['start_time'] for r in successful_results]
         success_ends = [r['end_time'] for r in successful_results]
         total_elapsed = (max(success_ends) - min(success_starts)).total_seconds()
         throughput = len(successful_results) / total_elapsed if total_elapsed > 0 else 0.0
         total_layers_per_sec = sum(r['layers_per_sec'] for r in successful_results) / len(successful_results)
         summary = {
-            'durations': {
-                'mean': mean(elapsed_times),
-                'max': max(elapsed_times),
-                'min': min(elapsed_times),
-            },
+            'durations': histogram.summary(),
             'total_elapsed': total_elapsed,
             'throughput_img_per_sec': round(throughput, 2),
             'avg_layers_per_sec': round(total_layers_per_sec, 2),
@@ -498,7 +494,11 @@ def podman_pull(tags, concurrency, username=None, password=None):
                 'total': len(results),
                 'successful': len(successful_results),
                 'failed': failed_count,
+                'corrupted_layers': sum(r.get('corrupted_layers', 0) for r in results),
             },
+            'connections': connections,
+            'auth': auth,
+            'transfer': transfer_summary(results),
         }
     else:
         summary = {
@@ -506,7 +506,11 @@ def podman_pull(tags, concurrency, username=None, password=None):
             'total_elapsed': 0.0,
             'throughput_img_per_sec': 0.0,
             'avg_layers_per_sec': 0.0,
-            'pulls': {'total': len(results), 'successful': 0, 'failed': failed_count},
+            'pulls': {'total': len(results), 'successful': 0, 'failed': failed_count,
+                      'corrupted_layers': sum(r.get('corrupted_layers', 0) for r in results)},
+            'connections': connections,
+            'auth': auth,
+            'transfer': transfer_summary(results),
         }
 
     # Write results to local filesystem
@@ -516,14 +520,38 @@ def podman_pull(tags, concurrency, username=None, password=None):
 
     write_results_to_es(env_config, results)
 
-    for r in results:
-        redis_client.rpush('pull_results:' + env_config["test_uuid"],
-                           json.dumps(r, default=lambda o: o.isoformat() if isinstance(o, datetime.datetime) else str(o)))
+    result_stream.flush()
+    redis_client.rpush('pull_histograms:' + env_config["test_uuid"], histogram.dumps())
+    redis_client.rpush('pull_connections:' + env_config["test_uuid"], json.dumps(connections))
 
     logging.info('HTTP-Pull Summary')
     logging.info(json.dumps(summary, sort_keys=True, indent=2))
 
 
+def tag_queue(kind, username):
+    """
+    Return the queue of the tags to push or pull for a user.
+    """
+    return TagQueue(redis_client, 'tags_to_' + kind + "-".join(username.split("_")))
+
+
+def worker_tags(queue, batch_size, concurrency, follow=False):
+    """
+    Return the tags a push or pull pod works on: one batch of `batch_size`
+    tags, or with WORKER_MODE=drain a lazy iterator taking `concurrency`
+    tags at a time from the queue until it is empty. Empty when there is
+    nothing to do.
+
+    :param follow: drain the queue as tags are pushed to it until it is
+        closed, regardless of WORKER_MODE
+    """
+    if follow or Config().get_config()["worker_mode"] == 'drain':
+        tags = queue.drain(concurrency, follow)
+        first = next(tags, None)
+        return itertools.chain([first], tags) if first is not None else []
+    return queue.pop(batch_size)
+
+
 def test_pull(num_tags):
 
     username = os.environ.get('QUAY_USERNAME')
@@ -533,14 +561,11 @@ def test_pull(num_tags):
     assert username, 'Ensure QUAY_USERNAME is set on this job.'
     assert password, 'Ensure QUAY_PASSWORD is set on this job.'
 
-    tags = []
-    for n in range(num_tags):
-        tag = redis_client.lpop('tags_to_pull'+"-".join(username.split("_")))
-        if tag:
-            tags.append(tag.decode('utf-8'))
-
+    # Pipelined pull pods take the tags as the push pods push them.
+    pipelined = Config().get_config()["push_pull_mode"] == 'pipelined'
+    tags = worker_tags(tag_queue('pull', username), num_tags, concurrency, follow=pipelined)
     if tags:
-        logging.info("Pulling %s tags", len(tags))
+        logging.info("Pulling %s tags", len(tags) if isinstance(tags, list) else 'queued')
         podman_pull(tags, concurrency, username, password)
         logging.info("Finished pulling batch.")
     
@@ -558,22 +583,30 @@ def test_push(num_tags):
     assert username, 'Ensure QUAY_USERNAME is set on this job.'
     assert password, 'Ensure QUAY_PASSWORD is set on this job.'
 
-    tags = []
-    for n in range(num_tags):
-        tag = redis_client.lpop('tags_to_push'+"-".join(username.split("_")))
-        if tag:
-            tags.append(tag.decode('utf-8'))
-
+    tags = worker_tags(tag_queue('push', username), num_tags, concurrency)
     if tags:
-        podman_login(username, password)
-        logging.info("Creating and pushing %s tags", len(tags))
-        podman_create(tags, custom_build_image, concurrency)
+        if Config().get_config()["push_engine"] != 'native':
+            podman_login(username, password)
+        logging.info("Creating and pushing %s tags", len(tags) if isinstance(tags, list) else 'queued')
+        podman_create(tags, custom_build_image, concurrency, username, password)
         logging.info("Finished pushing batch.")
     
     else:
         logging.info("No tags in build queue. Finished.")
 
 
+def worker_pods(tag_count, batch_size, concurrency, drain=False):
+    """
+    Return the number of push or pull pods to complete: one per batch, or
+    with WORKER_MODE=drain (or `drain`) at most `concurrency` long-lived
+    pods draining the queue.
+    """
+    num_jobs = math.ceil(tag_count / batch_size)
+    if drain or Config().get_config()["worker_mode"] == 'drain':
+        return min(concurrency, num_jobs)
+    return num_jobs
+
+
 def create_test_push_job(namespace, quay_host, username, password, concurrency,
                             test_uuid, batch_size, tag_count, image,
                             custom_build_image, target_hit_size):
@@ -582,12 +615,14 @@ def create_test_push_job(namespace, quay_host, username, password, concurrency,
     off the queue and perform the podman build + podman push action on them.
     """
 
-    num_jobs = math.ceil(tag_count / batch_size)
+    num_jobs = worker_pods(tag_count, batch_size, concurrency)
     env_config = Config().get_config()
 
     env_vars = [
         client.V1EnvVar(name='QUAY_HOST', value=quay_host),
         client.V1EnvVar(name='PYTHONUNBUFFERED', value='0'),
+        client.V1EnvVar(name='WORKER_MODE', value=env_config["worker_mode"]),
+        client.V1EnvVar(name='PUSH_PULL_MODE', value=env_config["push_pull_mode"]),
         client.V1EnvVar(name='QUAY_USERNAME', value=username),
         client.V1EnvVar(name='QUAY_PASSWORD', value=password),
         client.V1EnvVar(name='CONCURRENCY', value=str(concurrency)),
@@ -599,12 +634,27 @@ def create_test_push_job(namespace, quay_host, username, password, concurrency,
         client.V1EnvVar(name='TEST_UUID', value=test_uuid),
         client.V1EnvVar(name='TEST_NAMESPACE', value=namespace),
         client.V1EnvVar(name='QUAY_TEST_NAME', value='push'),
+        client.V1EnvVar(name='PUSH_ENGINE', value=env_config["push_engine"]),
+        client.V1EnvVar(name='PUSH_UPLOAD_MODE', value=env_config["push_upload_mode"]),
+        client.V1EnvVar(name='PUSH_CHUNK_SIZE_MB', value=str(env_config["push_chunk_size_mb"])),
+        client.V1EnvVar(name='PUSH_POOL_SIZE', value=str(env_config["push_pool_size"])),
+        client.V1EnvVar(name='PUSH_POOL_TRANSPORT', value=env_config["push_pool_transport"]),
+        client.V1EnvVar(name='IMAGE_LAYERS', value=str(env_config["image_layers"])),
+        client.V1EnvVar(name='IMAGE_LAYER_SIZE', value=env_config["image_layer_size"]),
+        client.V1EnvVar(name='IMAGE_COMPRESSIBILITY', value=str(env_config["image_compressibility"])),
+        client.V1EnvVar(name='IMAGE_SEED', value=str(env_config["image_seed"])),
+        client.V1EnvVar(name='IMAGE_FORMAT', value=env_config["image_format"]),
+        client.V1EnvVar(name='IMAGE_SHARED_LAYERS', value=str(env_config["image_shared_layers"])),
         client.V1EnvVar(name='QUAY_ORG', value=env_config["quay_org"]),
         client.V1EnvVar(name='TEST_BATCH_SIZE', value=str(batch_size)),
         client.V1EnvVar(name='ES_HOST', value=env_config["es_host"]),
         client.V1EnvVar(name='ES_PORT', value=str(env_config["es_port"])),
         client.V1EnvVar(name='ES_INDEX', value=env_config["es_index"]),
         client.V1EnvVar(name='TEST_PHASES', value=env_config["test_phases"]),
+        # Config() validates the scenario settings of the phases in every pod.
+        client.V1EnvVar(name='SCENARIO_MIX', value=env_config["scenario_mix"]),
+        client.V1EnvVar(name='SCENARIO_DURATION', value=str(env_config["scenario_duration"])),
+        client.V1EnvVar(name='SCENARIO_SEED', value=str(env_config["scenario_seed"])),
         client.V1EnvVar(name='RESULTS_DIR', value=env_config["results_directory"]),
     ]
 
@@ -657,12 +707,14 @@ def create_test_pull_job(namespace, quay_host, username, password, concurrency,
     off the queue and perform the podman pull action on them.
     """
 
-    num_jobs = math.ceil(tag_count / batch_size)
     env_config = Config().get_config()
+    num_jobs = worker_pods(tag_count, batch_size, concurrency, drain=env_config["push_pull_mode"] == 'pipelined')
 
     env_vars = [
         client.V1EnvVar(name='QUAY_HOST', value=quay_host),
         client.V1EnvVar(name='PYTHONUNBUFFERED', value='0'),
+        client.V1EnvVar(name='WORKER_MODE', value=env_config["worker_mode"]),
+        client.V1EnvVar(name='PUSH_PULL_MODE', value=env_config["push_pull_mode"]),
         client.V1EnvVar(name='QUAY_USERNAME', value=username),
         client.V1EnvVar(name='QUAY_PASSWORD', value=password),
         client.V1EnvVar(name='CONCURRENCY', value=str(concurrency)),
@@ -673,12 +725,20 @@ def create_test_pull_job(namespace, quay_host, username, password, concurrency,
         client.V1EnvVar(name='TEST_UUID', value=test_uuid),
         client.V1EnvVar(name='TEST_NAMESPACE', value=namespace),
         client.V1EnvVar(name='QUAY_TEST_NAME', value='pull'),
+        client.V1EnvVar(name='PULL_LAYER_PARALLELISM', value=str(env_config["pull_layer_parallelism"])),
+        client.V1EnvVar(name='PULL_MAX_IN_FLIGHT', value=str(env_config["pull_max_in_flight"])),
+        client.V1EnvVar(name='PULL_RANGE_SEGMENTS', value=str(env_config["pull_range_segments"])),
+        client.V1EnvVar(name='PULL_RANGE_MIN_SIZE_MB', value=str(env_config["pull_range_min_size_mb"])),
         client.V1EnvVar(name='QUAY_ORG', value=env_config["quay_org"]),
         client.V1EnvVar(name='TEST_BATCH_SIZE', value=str(batch_size)),
         client.V1EnvVar(name='ES_HOST', value=env_config["es_host"]),
         client.V1EnvVar(name='ES_PORT', value=str(env_config["es_port"])),
         client.V1EnvVar(name='ES_INDEX', value=env_config["es_index"]),
         client.V1EnvVar(name='TEST_PHASES', value=env_config["test_phases"]),
+        # Config() validates the scenario settings of the phases in every pod.
+        client.V1EnvVar(name='SCENARIO_MIX', value=env_config["scenario_mix"]),
+        client.V1EnvVar(name='SCENARIO_DURATION', value=str(env_config["scenario_duration"])),
+        client.V1EnvVar(name='SCENARIO_SEED', value=str(env_config["scenario_seed"])),
         client.V1EnvVar(name='RESULTS_DIR', value=env_config["results_directory"]),
     ]
 
@@ -723,6 +783,61 @@ def create_test_pull_job(namespace, quay_host, username, password, concurrency,
     logging.info("Created Job: %s", resp.metadata.name)
 
 
+def merge_histograms(key):
+    """
+    Merge the latency histograms published by the worker pods under the
+    given Redis key.
+    """
+    histogram = LatencyHistogram()
+    for data in redis_client.lrange(key, 0, -1):
+        histogram.merge(LatencyHistogram.loads(data))
+    redis_client.delete(key)
+    return histogram
+
+
+def follow_job(job_name, namespace, queue, total, telemetry, env_config):
+    """
+    Wait for a push or pull Job to complete, logging the live throughput,
+    error rate and latency of its pods every TELEMETRY_INTERVAL seconds.
+    A warning is logged as soon as the rolling error rate exceeds
+    TELEMETRY_ERROR_RATE, so a degrading run shows in its first minutes.
+    The Job is followed with the watch API, so this returns as soon as it
+    completes or fails.
+
+    :param job_name: name of the Job
+    :param namespace: namespace of the Job
+    :param queue: TagQueue the pods take their tags from
+    :param total: number of queued tags
+    :param telemetry: Telemetry the pods of the Job publish to
+    :param env_config: config with the telemetry settings
+    :return: (whether the Job completed, the rolling stats logged while waiting)
+    """
+    timeline = []
+    drained = False
+
+    def on_tick(job):
+        nonlocal drained
+        # Log Queue Status and the stats of the last seconds
+        remaining = queue.remaining()
+        totals = telemetry.totals()
+        stats = telemetry.window(env_config["telemetry_window"])
+        timeline.append(dict(stats, time=datetime.datetime.utcnow().isoformat(), queue=remaining, totals=totals))
+        logging.info('Waiting for %s to finish. Queue: %s/%s, done: %s (%s errors), last %ss: %s img/s, '
+                     '%s MB/s, error rate %.2f%%, latency %s' % (
+                         job_name, remaining, total, totals['ops'], totals['errors'], stats['window'],
+                         stats['ops_per_sec'], stats['mb_per_sec'], stats['error_rate'] * 100,
+                         json.dumps(stats['latency'])))
+        if stats['error_rate'] > env_config["telemetry_error_rate"]:
+            logging.warning('%s error rate is %.2f%% over the last %ss (%s/%s)' % (
+                job_name, stats['error_rate'] * 100, stats['window'], stats['errors'], stats['ops']))
+        if not remaining and not drained and queue.closed():
+            drained = True
+            logging.info('Queue of %s drained, waiting for %s active pods' % (job_name, job.status.active or 0))
+
+    completed = wait_for_job(namespace, job_name, on_tick, env_config["telemetry_interval"])
+    return completed, timeline
+
+
 def parallel_process(user, **kwargs):
     """
     This function is triggered using python multiprocessing to create push/pull jobs in parallel
@@ -739,100 +854,192 @@ def parallel_process(user, **kwargs):
     common_args = kwargs
     env_config = Config().get_config()
     # Container Operations
-    redis_client.delete('tags_to_push'+"-".join(user.split("_")))  # avoid stale data
-    redis_client.rpush('tags_to_push'+"-".join(user.split("_")), *common_args['tags'])
+    push_queue = tag_queue('push', user)
+    push_queue.fill(common_args['tags'])
     logging.info('Queued %s tags to be created' % len(common_args['tags']))
 
-    redis_client.delete('tags_to_pull'+"-".join(user.split("_")))  # avoid stale data
-    redis_client.rpush('tags_to_pull'+"-".join(user.split("_")), *common_args['tags'])
-
-    redis_client.delete('push_results:' + common_args['uuid'])  # avoid stale data
-    redis_client.delete('pull_results:' + common_args['uuid'])  # avoid stale data
-    logging.info('Queued %s tags to be pulled' % len(common_args['tags']))
+    # Pipelined pull pods start with an empty queue and pull the tags as
+    # the push pods push them.
+    pipelined = env_config["push_pull_mode"] == 'pipelined'
+    pull_queue = tag_queue('pull', user)
+    if pipelined:
+        pull_queue.fill([], closed=False)
+    else:
+        pull_queue.fill(common_args['tags'])
+
+    push_stream = ResultStream(redis_client, 'push_results:' + common_args['uuid'])
+    push_stream.reset()  # avoid stale data
+    pull_stream = ResultStream(redis_client, 'pull_results:' + common_args['uuid'])
+    pull_stream.reset()  # avoid stale data
+    push_telemetry = Telemetry(redis_client, 'push_telemetry:' + common_args['uuid'])
+    push_telemetry.reset()  # avoid stale data
+    pull_telemetry = Telemetry(redis_client, 'pull_telemetry:' + common_args['uuid'])
+    pull_telemetry.reset()  # avoid stale data
+    redis_client.delete('push_histograms:' + common_args['uuid'])  # avoid stale data
+    redis_client.delete('pull_histograms:' + common_args['uuid'])  # avoid stale data
+    redis_client.delete('push_connections:' + common_args['uuid'])  # avoid stale data
+    redis_client.delete('pull_connections:' + common_args['uuid'])  # avoid stale data
+    if not pipelined:
+        logging.info('Queued %s tags to be pulled' % len(common_args['tags']))
+
+    def start_pull_job():
+        create_test_pull_job(common_args['namespace'], common_args['quay_host'], user, common_args['password'],
+                             common_args['concurrency'], common_args['uuid'],
+                             common_args['batch_size'], len(common_args['tags']), common_args['push_pull_image'],
+                             common_args['target_hit_size'])
 
     # Start the Registry Push Test job
+    push_results = []
     if common_args['skip_push'] != "true":
         create_test_push_job(common_args['namespace'], common_args['quay_host'], user,
         common_args['password'], common_args['concurrency'], common_args['uuid'],
         common_args['batch_size'], len(common_args['tags']), common_args['push_pull_image'], common_args['custom_build_image'],
         common_args['target_hit_size'])
-        time.sleep(60)  # Give the Job time to start
-        while True:
-            # Check Job Status
-            job_name = 'test-registry-push'+"-".join(user.split("_"))
-            job_api = client.BatchV1Api()
-            resp = job_api.read_namespaced_job_status(name=job_name, namespace=common_args['namespace'])
-            completion_time = resp.status.completion_time
-            if completion_time:
-                logging.info("Job %s has been completed." % (job_name))
-                break
-
-            # Log Queue Status
-            remaining = redis_client.llen('tags_to_push'+"-".join(user.split("_")))
-            logging.info('Waiting for %s to finish. Queue: %s/%s' % (job_name, remaining, len(common_args['tags'])))
-            time.sleep(60 * 1)  # 1 minute
+        if pipelined:
+            start_pull_job()
+        completed, timeline = follow_job('test-registry-push'+"-".join(user.split("_")), common_args['namespace'],
+                                         push_queue, len(common_args['tags']), push_telemetry, env_config)
+        if pipelined:
+            # Every push pod is done, let the pull pods finish.
+            pull_queue.close()
+        if not completed:
+            logging.error("Push Job failed, collecting the results of the pods that ran")
+        write_results_to_file(timeline, env_config["results_directory"],
+                              '%s_push_telemetry.json' % common_args['uuid'])
 
         # Collect push results from all worker pods via Redis
-        push_results = []
-        while True:
-            data = redis_client.lpop('push_results:' + common_args['uuid'])
-            if data is None:
-                break
-            push_results.append(json.loads(data))
+        push_results, push_ids = push_stream.collect(consumer=user)
         if push_results:
-            elapsed_times = [r['elapsed_time'] for r in push_results]
-            summary = {
-                'durations': {'mean': mean(elapsed_times), 'max': max(elapsed_times), 'min': min(elapsed_times)},
-                'total': len(push_results),
-                'successful': sum(1 for r in push_results if r.get('successful')),
-                'failed': sum(1 for r in push_results if not r.get('successful')),
-            }
+            stats = PushStats()
+            for r in push_results:
+                stats.add(r)
+            summary = stats.summary()
+            summary['durations'] = merge_histograms('push_histograms:' + common_args['uuid']).summary()
+            push_connections = redis_client.lrange('push_connections:' + common_args['uuid'], 0, -1)
+            if push_connections:
+                # Only the native engine reports its connections.
+                summary['connections'] = merge_connection_stats(json.loads(data) for data in push_connections)
+            redis_client.delete('push_connections:' + common_args['uuid'])
             write_results_to_file({'summary': summary, 'results': push_results},
                                   env_config["results_directory"],
                                   '%s_push_results.json' % common_args['uuid'])
             logging.info("Collected %d push results from worker pods", len(push_results))
+        push_stream.ack(push_ids)
 
     # Start the Registry Pull Test job
-    create_test_pull_job(common_args['namespace'], common_args['quay_host'], user, common_args['password'],
-                         common_args['concurrency'], common_args['uuid'],
-                         common_args['batch_size'], len(common_args['tags']), common_args['push_pull_image'],
-                         common_args['target_hit_size'])
-    time.sleep(60)  # Give the Job time to start
-    while True:
-
-        # Check Job Status
-        job_name = 'test-registry-pull'+"-".join(user.split("_"))
-        job_api = client.BatchV1Api()
-        resp = job_api.read_namespaced_job_status(name=job_name, namespace=common_args['namespace'])
-        completion_time = resp.status.completion_time
-        if completion_time:
-            logging.info("Job %s has been completed." % (job_name))
-            break
-
-        # Log Queue Status
-        remaining = redis_client.llen('tags_to_pull'+"-".join(user.split("_")))
-        logging.info('Waiting for %s to finish. Queue: %s/%s' % (job_name, remaining, len(common_args['tags'])))
-        time.sleep(60 * 1)  # 1 minute
+    if not pipelined:
+        start_pull_job()
+    completed, timeline = follow_job('test-registry-pull'+"-".join(user.split("_")), common_args['namespace'],
+                                     pull_queue, len(common_args['tags']), pull_telemetry, env_config)
+    if not completed:
+        logging.error("Pull Job failed, collecting the results of the pods that ran")
+    write_results_to_file(timeline, env_config["results_directory"],
+                          '%s_pull_telemetry.json' % common_args['uuid'])
 
     # Collect pull results from all worker pods via Redis
-    pull_results = []
-    while True:
-        data = redis_client.lpop('pull_results:' + common_args['uuid'])
-        if data is None:
-            break
-        pull_results.append(json.loads(data))
+    pull_results, pull_ids = pull_stream.collect(consumer=user)
     if pull_results:
-        elapsed_times = [r['elapsed_time'] for r in pull_results]
+        connections = merge_connection_stats(
+            json.loads(data) for data in redis_client.lrange('pull_connections:' + common_args['uuid'], 0, -1))
+        redis_client.delete('pull_connections:' + common_args['uuid'])
         summary = {
-            'durations': {'mean': mean(elapsed_times), 'max': max(elapsed_times), 'min': min(elapsed_times)},
+            'durations': merge_histograms('pull_histograms:' + common_args['uuid']).summary(),
+            'auth_time': round(sum(r.get('auth_time', 0.0) for r in pull_results), 4),
+            'connections': connections,
+            'transfer': transfer_summary(pull_results),
             'total': len(pull_results),
             'successful': sum(1 for r in pull_results if r.get('successful')),
             'failed': sum(1 for r in pull_results if not r.get('successful')),
+            'corrupted_layers': sum(r.get('corrupted_layers', 0) for r in pull_results),
         }
+        if pipelined:
+            summary['pipeline'] = pipeline_summary(push_results, pull_results)
+            logging.info('Pipelined Push/Pull Summary')
+            logging.info(json.dumps(summary['pipeline'], sort_keys=True, indent=2))
         write_results_to_file({'summary': summary, 'results': pull_results},
                               env_config["results_directory"],
                               '%s_pull_results.json' % common_args['uuid'])
         logging.info("Collected %d pull results from worker pods", len(pull_results))
+    pull_stream.ack(pull_ids)
+
+
+def run_scenario(env_config, organization, users, repos, teams, tags, password, sampling):
+    """
+    Run the weighted mix of endpoint tests and image push/pulls given by
+    SCENARIO_MIX concurrently at CONCURRENCY requests per second.
+    """
+    base_url = env_config['base_url']
+    tags_repo = "repo_with_" + str(env_config["push_pull_numbers"]) + "_tags"
+    mix = parse_mix(env_config["scenario_mix"])
+
+    # Collect the requests of the (non destructive) endpoint tests without
+    # running them.
+    with Attacker.capture() as captured:
+        Users.list_users(base_url, env_config["target_hit_size"])
+        Users.get_users(base_url, users)
+        Users.update_passwords(base_url, users, password)
+        Repositories.get_repositories(base_url, organization, repos)
+        Repositories.update_repositories(base_url, organization, repos)
+        Teams.list_team_members(base_url, organization, teams)
+        Teams.add_team_members(base_url, organization, teams, users, **sampling)
+        Permissions.list_team_permissions(base_url, organization, teams)
+        Permissions.add_teams_to_organization_repos(base_url, organization, repos, teams, **sampling)
+        Permissions.add_users_to_organization_repos(base_url, organization, repos, users, **sampling)
+        Permissions.get_teams_of_organization_repos(base_url, organization, repos, teams, **sampling)
+        Permissions.list_teams_of_organization_repos(base_url, organization, repos)
+        Permissions.get_users_of_organization_repos(base_url, organization, repos, users, **sampling)
+        Permissions.list_users_of_organization_repos(base_url, organization, repos)
+        Tags.get_catalog(base_url, env_config["target_hit_size"])
+        Tags.list_tags(base_url, env_config['quay_host'], [users[0]], tags_repo)
+
+    scenario = Scenario(mix, env_config)
+    for name, request_dicts in captured.items():
+        scenario.add_requests(name, request_dicts)
+
+    # Image operations run in threads. `tags` may be a TagRange, whose
+    # iterator is a generator, so tags are indexed under a shared counter.
+    pull_count = itertools.count()
+    push_count = itertools.count()
+
+    pool = None
+    if env_config["push_engine"] == 'native':
+        pusher = native_pusher(env_config, users[0], password, env_config["concurrency"])
+        push_single_image = pusher.push
+    elif env_config["push_engine"] == 'pool' and 'image_push' in mix:
+        pool = ImagePool(env_config["push_pool_size"], env_config["custom_build_image"], env_config["concurrency"],
+                         env_config["push_pool_transport"])
+        pool.build()
+        push_single_image = pool.push
+    else:
+        push_single_image = lambda tag: build_push_delete_single_image(tag, env_config["custom_build_image"])
+
+    def image_push():
+        tag = '%s/%s/%s:scenario-%s' % (env_config["quay_host"], organization, tags_repo, next(push_count))
+        result = push_single_image(tag)
+        return result is not None and result['successful']
+
+    # Every pull reuses the connections and tokens of a single puller.
+    puller = None
+    if 'image_pull' in mix:
+        puller = AsyncPuller(users[0], password, concurrency=env_config["concurrency"])
+        puller.start()
+
+    def image_pull():
+        result = puller.pull_one(tags[next(pull_count) % len(tags)])
+        return result is not None and result['successful']
+
+    scenario.add_operation('image_push', image_push)
+    scenario.add_operation('image_pull', image_pull)
+    if 'image_push' in mix and env_config["push_engine"] != 'native':
+        podman_login(users[0], password)
+
+    try:
+        scenario.run()
+    finally:
+        if puller:
+            puller.close()
+        if pool:
+            pool.close()
 
 
 def batch_process(users_chunk, batch_args):
@@ -862,15 +1069,17 @@ if __name__ == '__main__':
     if not os.path.isdir(env_config["log_directory"]):
         os.mkdir(env_config["log_directory"])
 
+    # Execute only a shard of a distributed API test
+    if os.environ.get("QUAY_TEST_NAME") == 'attack':
+        Attacker().run_attack_shard()
+        exit(0)
+
     # Execute only the registry push tests
     if os.environ.get("QUAY_TEST_NAME") == 'push':
         test_push(env_config["batch_size"])
         exit(0)
     
     # Execute only the registry pull tests
-    # TODO: Pulls don't suffer from the same problem as builds with the Alpine+Podman
-    #       image. Just spin up n=CONCURRENCY workers and let them continuously
-    #       pop tags off the queue and pull them from the registry.
     if os.environ.get("QUAY_TEST_NAME") == 'pull':
         test_pull(env_config["batch_size"])
         exit(0)
@@ -886,12 +1095,30 @@ if __name__ == '__main__':
     teams = ['%s_team_%s' % (PREFIX, n) for n in range(0, num_teams)]
     repos = ['%s_repo_%s' % (PREFIX, n) for n in range(0, num_repos)]
 
+    # Optionally hit only a sample of the repos x teams/users combinations
+    # instead of all of them.
+    sampling = {
+        'sample_size': env_config["target_sample_size"],
+        'seed': env_config["target_sample_seed"],
+        'distribution': env_config["target_sample_distribution"],
+    }
+
     # Create repositories which will contain a specified number of tags when the
     # registry operation tests are performed.
     repo_sizes = (env_config["push_pull_numbers"],)
     repos_with_data = ['repo_with_%s_tags' % n for n in repo_sizes]
     repos.extend(repos_with_data)  # Create these while running tests
 
+    # With PUSH_REPO_COUNT > 1 the tags are spread across that many
+    # repositories, e.g. to exercise cross-repository layer mounts.
+    push_repo_count = env_config["push_repo_count"]
+    repos_with_data_spread = {
+        repo: [repo] + ['%s_%s' % (repo, n) for n in range(1, push_repo_count)]
+        for repo in repos_with_data
+    }
+    for repo in repos_with_data:
+        repos.extend(repos_with_data_spread[repo][1:])
+
     # Calculate all tags to be pushed/pulled
     tags = []
     if env_config["tags"] is not None:
@@ -903,17 +1130,15 @@ if __name__ == '__main__':
         for tag in explicit_tags:
             tags.append(tag)
     else:
+        # Generated tags are a pattern and an index range rather than a list,
+        # so they cost the same memory and queueing time at any scale.
         if env_config["skip_push"] == "true" and int(env_config["pull_layers"]) > 0 and env_config["pull_repo_prefix"] != "":
-            for i in range(1, int(env_config["push_pull_numbers"]) + 1):
-                tags.append('%s_layers_%s_tag_%s' % (env_config["pull_repo_prefix"], env_config["pull_layers"], i))
+            tags = TagRange('%s_layers_%s_tag_{index}' % (env_config["pull_repo_prefix"], env_config["pull_layers"]),
+                            1, int(env_config["push_pull_numbers"]) + 1)
         else:
-            for i, repo_size in enumerate(repo_sizes):
-                repo = repos_with_data[i]
-                repo_tags = [
-                    '%s/%s/%s:%s' % (env_config["quay_host"], organization, repo, n)
-                    for n in range(0, repo_size)
-                ]
-                tags.extend(repo_tags)
+            repo = repos_with_data[0]
+            tags = TagRange('%s/%s/{repo}:{index}' % (env_config["quay_host"], organization),
+                            0, repo_sizes[0], repos_with_data_spread[repo])
 
     print_header(
         'Running Quay Scale & Performance Tests',
@@ -932,13 +1157,15 @@ if __name__ == '__main__':
         skip_push=env_config['skip_push'],
         pull_layers=env_config['pull_layers'],
         pull_repo_prefix=env_config['pull_repo_prefix'],
+        attack_pods=env_config['attack_pods'],
         pull_push_batch_size=env_config["batch_size"],
+        target_sample_size=env_config["target_sample_size"],
     )
 
     namespace = env_config["test_namespace"]
 
-    if not ({'load', 'run', 'delete', 'push_pull'} & set(phases_list)):
-        logging.info("No valid phases defined to run the tests. Valid options: LOAD, RUN, PUSH_PULL and DELETE")
+    if not ({'load', 'run', 'scenario', 'delete', 'push_pull'} & set(phases_list)):
+        logging.info("No valid phases defined to run the tests. Valid options: LOAD, RUN, SCENARIO, PUSH_PULL and DELETE")
         sys.exit()
     
     batch_args = {
@@ -957,7 +1184,7 @@ if __name__ == '__main__':
     }
 
     if ('push_pull' in phases_list):
-        time.sleep(60)
+        wait_for_redis()
         username = os.environ.get('QUAY_USERNAME')
         batch_args['password'] = os.environ.get('QUAY_PASSWORD')
         start_time = datetime.datetime.utcnow()
@@ -978,9 +1205,9 @@ if __name__ == '__main__':
     Repositories.create_repositories(env_config["base_url"], organization, repos)
     Repositories.update_repositories(env_config["base_url"], organization, repos)
     Teams.create_teams(env_config["base_url"], organization, teams)
-    Teams.add_team_members(env_config["base_url"], organization, teams, users)
-    Permissions.add_teams_to_organization_repos(env_config["base_url"], organization, repos, teams)
-    Permissions.add_users_to_organization_repos(env_config["base_url"], organization, repos, users)
+    Teams.add_team_members(env_config["base_url"], organization, teams, users, **sampling)
+    Permissions.add_teams_to_organization_repos(env_config["base_url"], organization, repos, teams, **sampling)
+    Permissions.add_users_to_organization_repos(env_config["base_url"], organization, repos, users, **sampling)
     end_time = datetime.datetime.utcnow()
     logging.info(f"Ending load phase (UTC): {end_time.strftime('%Y-%m-%d %H:%M:%S.%f')}")
     elapsed_time = end_time - start_time
@@ -1006,9 +1233,9 @@ if __name__ == '__main__':
         Users.get_users(env_config['base_url'], users)
         Repositories.get_repositories(env_config['base_url'], organization, repos)
         Permissions.list_team_permissions(env_config['base_url'], organization, teams)
-        Permissions.get_teams_of_organization_repos(env_config['base_url'], organization, repos, teams)
+        Permissions.get_teams_of_organization_repos(env_config['base_url'], organization, repos, teams, **sampling)
         Permissions.list_teams_of_organization_repos(env_config['base_url'], organization, repos)
-        Permissions.get_users_of_organization_repos(env_config['base_url'], organization, repos, users)
+        Permissions.get_users_of_organization_repos(env_config['base_url'], organization, repos, users, **sampling)
         Permissions.list_users_of_organization_repos(env_config['base_url'], organization, repos)
         Tags.get_catalog(env_config['base_url'], env_config["target_hit_size"])
         Tags.list_tags(env_config['base_url'], env_config['quay_host'], [users[0]], "repo_with_" + str(env_config["push_pull_numbers"]) + "_tags")
@@ -1017,6 +1244,19 @@ if __name__ == '__main__':
         elapsed_time = end_time - start_time
         logging.info(f"The run phase took {str(datetime.timedelta(seconds=elapsed_time.total_seconds()))}.")
 
+    if ('scenario' not in phases_list):
+        logging.info("Skipping scenario phase as it is not specified")
+    else:
+        # Scenario Phase
+        # Runs a weighted mix of the run phase tests and image push/pulls concurrently
+        start_time = datetime.datetime.utcnow()
+        logging.info(f"Starting scenario phase (UTC): {start_time.strftime('%Y-%m-%d %H:%M:%S.%f')}")
+        run_scenario(env_config, organization, users, repos, teams, tags, password, sampling)
+        end_time = datetime.datetime.utcnow()
+        logging.info(f"Ending scenario phase (UTC): {end_time.strftime('%Y-%m-%d %H:%M:%S.%f')}")
+        elapsed_time = end_time - start_time
+        logging.info(f"The scenario phase took {str(datetime.timedelta(seconds=elapsed_time.total_seconds()))}.")
+
     if ('delete' not in phases_list):
         logging.info("Skipping delete phase as it is not specified")
     else:
@@ -1024,9 +1264,9 @@ if __name__ == '__main__':
         # These tests are ran at the end to cleanup stuff
         start_time = datetime.datetime.utcnow()
         logging.info(f"Starting cleanup phase (UTC): {start_time.strftime('%Y-%m-%d %H:%M:%S.%f')}")
-        Permissions.delete_teams_of_organization_repos(env_config['base_url'], organization, repos, teams)
-        Permissions.delete_users_of_organization_repos(env_config['base_url'], organization, repos, users)
-        Teams.delete_team_members(env_config['base_url'], organization, teams, users)
+        Permissions.delete_teams_of_organization_repos(env_config['base_url'], organization, repos, teams, **sampling)
+        Permissions.delete_users_of_organization_repos(env_config['base_url'], organization, repos, users, **sampling)
+        Teams.delete_team_members(env_config['base_url'], organization, teams, users, **sampling)
         Teams.delete_teams(env_config['base_url'], organization, teams)
         Tags.delete_repository_tags(env_config['base_url'], organization, "repo_with_" + str(env_config["push_pull_numbers"]) + "_tags", tags, env_config["target_hit_size"])
         Repositories.delete_repositories(env_config['base_url'], organization, repos)
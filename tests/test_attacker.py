@@ -0,0 +1,57 @@
+import pytest
+
+from utils import attacker
+from utils.attacker import Attacker
+
+
+@pytest.fixture(params=['saturation', 'matrix'])
+def attacks(request, monkeypatch, tmp_path):
+    """
+    Run `run_vegeta` in each replaying mode and record which attack it chose.
+    """
+    class Config:
+        def get_config(self):
+            return {'attack_mode': request.param, 'log_directory': str(tmp_path), 'test_uuid': 'uuid'}
+
+    monkeypatch.setattr(attacker, 'Config', Config)
+    attacks = []
+    monkeypatch.setattr(Attacker, 'attack_saturation', lambda self, name, *args: attacks.append(('saturation', name)))
+    monkeypatch.setattr(Attacker, 'attack_matrix', lambda self, name, *args: attacks.append(('matrix', name)))
+    monkeypatch.setattr(Attacker, 'attack', lambda self, name, *args: attacks.append(('fixed', name)))
+    monkeypatch.setattr(Attacker, 'index_results', lambda self, *args: None)
+    return attacks
+
+
+def test_read_tests_are_replayed(attacks, request):
+    Attacker().run_vegeta('list_users', [{'method': 'GET', 'url': 'https://quay/api/v1/users'}], 'users')
+    assert attacks == [(request.node.callspec.params['attacks'], 'list_users')]
+
+
+def test_write_tests_are_attacked_once(attacks):
+    Attacker().run_vegeta('create_users', iter([{'method': 'POST', 'url': 'https://quay/api/v1/users'}]), 'users')
+    assert attacks == [('fixed', 'create_users')]
+
+
+def test_distributed_job_is_deleted_when_pods_do_not_start(monkeypatch):
+    calls = []
+
+    class DistributedAttack:
+        def __init__(self, test_name, env_config):
+            pass
+
+        def shard(self, request_dicts):
+            return 1
+
+        def create_job(self):
+            calls.append('create_job')
+
+        def start(self):
+            raise AssertionError('Only 1/2 attacker pods became ready')
+
+        def delete_job(self):
+            calls.append('delete_job')
+
+    monkeypatch.setattr(attacker, 'DistributedAttack', DistributedAttack)
+    with pytest.raises(AssertionError):
+        Attacker().attack_distributed('get_users', [], 'result.json', {})
+    assert calls == ['create_job', 'delete_job']
@@ -0,0 +1,47 @@
+import re
+
+import pytest
+
+from utils import distributed
+from utils.distributed import DistributedAttack
+
+fakeredis = pytest.importorskip('fakeredis')
+
+ENV_CONFIG = {'attack_pods': 3, 'test_uuid': 'abcd-1234', 'test_namespace': 'quay'}
+
+
+@pytest.fixture(autouse=True)
+def redis_client(monkeypatch):
+    redis_client = fakeredis.FakeRedis()
+    monkeypatch.setattr(distributed, 'redis_client', redis_client)
+    return redis_client
+
+
+@pytest.mark.parametrize('test_name', ['get_users', 'list_' + 'x' * 60, 'list_' + 'x' * 44 + '_' * 20])
+def test_job_name_is_a_dns_label(test_name):
+    job_name = DistributedAttack(test_name, ENV_CONFIG).job_name
+    assert re.fullmatch(r'[a-z0-9]([-a-z0-9]{0,61}[a-z0-9])?', job_name)
+
+
+def test_targets_are_sharded_round_robin():
+    attack = DistributedAttack('get_users', ENV_CONFIG)
+    requests = [{'method': 'GET', 'url': 'https://quay/%s' % i} for i in range(3000)]
+    assert attack.shard(iter(requests)) == 3000
+    shards = [list(attack.shard_targets(index)) for index in range(3)]
+    assert [len(shard) for shard in shards] == [1000, 1000, 1000]
+    assert shards[1][:2] == [requests[1], requests[4]]
+
+
+def test_results_round_trip(monkeypatch, tmp_path):
+    monkeypatch.setattr(distributed, 'RESULT_CHUNK_SIZE', 10)
+    attack = DistributedAttack('get_users', ENV_CONFIG)
+    source = tmp_path / 'source.bin'
+    source.write_bytes(bytes(range(256)) * 3)
+    attack.publish_results(0, str(source))
+    attack.publish_results(2, str(source))
+
+    paths = attack.collect(str(tmp_path))
+    assert len(paths) == 2
+    for path in paths:
+        assert open(path, 'rb').read() == source.read_bytes()
+    assert attack.collect(str(tmp_path)) == []
@@ -0,0 +1,59 @@
+import pytest
+
+from utils.engine import AsyncAttackEngine, AttackStats
+
+pytest.importorskip('httpx')
+
+
+def test_stats_report():
+    stats = AttackStats()
+    stats.record(100.0, 0.5, 200, 10, 2)
+    stats.record(101.0, 1.5, 500, 0, 2, error='500 Internal Server Error')
+    report = stats.report()
+
+    assert report['requests'] == 2
+    assert report['success'] == 0.5
+    assert report['status_codes'] == {'200': 1, '500': 1}
+    assert report['errors'] == ['500 Internal Server Error']
+    assert report['bytes_in'] == {'total': 10, 'mean': 5.0}
+    assert report['duration'] == 1e9
+    assert report['wait'] == 1.5e9
+    assert report['latencies']['max'] == 1.5e9
+
+
+def test_every_request_is_recorded():
+    def fail():
+        raise RuntimeError('boom')
+
+    requests = [
+        {'name': 'ok', 'call': lambda: True},
+        {'name': 'ok', 'call': lambda: True},
+        {'name': 'falsy', 'call': lambda: False},
+        {'name': 'raises', 'call': fail},
+        # A malformed target fails before any connection is made.
+        {'name': 'malformed', 'method': 'GET', 'url': 'nowhere://target'},
+    ]
+    engine = AsyncAttackEngine(rate=1000, auth_token='token', max_workers=4)
+    stats = engine.run('test', requests)
+
+    assert stats.requests == len(requests)
+    assert stats.successes == 2
+    assert stats.status_codes == {'200': 2, '0': 3}
+    assert {name: s.requests for name, s in engine.endpoints.items()} == \
+        {'ok': 2, 'falsy': 1, 'raises': 1, 'malformed': 1}
+    assert engine.endpoints['raises'].errors == {'RuntimeError: boom'}
+    assert engine.endpoints['malformed'].successes == 0
+
+
+def test_build_request():
+    engine = AsyncAttackEngine(rate=1, auth_token='token')
+    method, url, headers, content = engine.build_request(
+        {'method': 'POST', 'url': 'https://quay/api', 'body': {'name': 'repo'}})
+    assert (method, url) == ('POST', 'https://quay/api')
+    assert ('Authorization', 'Bearer token') in headers
+    assert content == b'{"name": "repo"}'
+
+    _, _, headers, content = engine.build_request(
+        {'method': 'GET', 'url': 'https://quay/api', 'header': {'Accept': ['a', 'b']}, 'body': {}})
+    assert headers == [('Accept', 'a'), ('Accept', 'b')]
+    assert content is None
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from utils.histogram import LatencyHistogram
+
+
+def test_quantiles_within_precision():
+    rng = random.Random(0)
+    values = sorted(rng.uniform(0.001, 2.0) for _ in range(10000))
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    assert histogram.count == len(values)
+    assert histogram.min == values[0]
+    assert histogram.max == values[-1]
+    assert histogram.mean == pytest.approx(sum(values) / len(values))
+    for q in (0.5, 0.9, 0.99):
+        assert histogram.quantile(q) == pytest.approx(values[int(q * len(values)) - 1], rel=0.02)
+
+
+def test_empty():
+    histogram = LatencyHistogram()
+    assert histogram.quantile(0.99) == 0.0
+    assert histogram.summary() == {}
+
+
+def test_round_trip():
+    histogram = LatencyHistogram()
+    for value in (0.0, 0.000001, 0.25, 0.25, 3.5, 120.0):
+        histogram.record(value)
+    loaded = LatencyHistogram.loads(histogram.dumps())
+    assert loaded.to_dict() == histogram.to_dict()
+    assert loaded.summary() == histogram.summary()
+
+
+def test_merge_matches_single_histogram():
+    rng = random.Random(1)
+    values = [rng.expovariate(10) for _ in range(5000)]
+    single = LatencyHistogram()
+    parts = [LatencyHistogram() for _ in range(4)]
+    for i, value in enumerate(values):
+        single.record(value)
+        parts[i % len(parts)].record(value)
+
+    merged = LatencyHistogram()
+    for part in parts:
+        merged.merge(LatencyHistogram.loads(part.dumps()))
+    assert merged.counts == single.counts
+    assert merged.count == single.count
+    assert (merged.min, merged.max) == (single.min, single.max)
+    assert merged.quantile(0.99) == single.quantile(0.99)
+
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(AssertionError):
+        LatencyHistogram().merge(LatencyHistogram(precision_bits=5))
@@ -0,0 +1,76 @@
+import io
+import gzip
+import json
+import random
+import hashlib
+import tarfile
+
+import pytest
+
+from utils.imagegen import ImageGenerator, SyntheticLayer, parse_size, parse_size_distribution
+
+
+@pytest.mark.parametrize('size', [0, 1, 511, 512, 1024 * 1024 + 3])
+def test_layer_is_a_valid_gzipped_tar(size):
+    layer = SyntheticLayer('seed', size, compressibility=0.5)
+    blob = b''.join(layer.stream())
+
+    assert layer.digest == 'sha256:' + hashlib.sha256(blob).hexdigest()
+    assert layer.blob_size == len(blob)
+    tar = gzip.decompress(blob)
+    assert layer.diff_id == 'sha256:' + hashlib.sha256(tar).hexdigest()
+    assert len(tar) % tarfile.RECORDSIZE == 0
+    with tarfile.open(fileobj=io.BytesIO(tar)) as archive:
+        member, = archive.getmembers()
+        assert member.size == size
+        assert len(archive.extractfile(member).read()) == size
+
+
+def test_layer_deterministic():
+    first = SyntheticLayer('a', 100000).describe()
+    assert first.digest == SyntheticLayer('a', 100000).describe().digest
+    assert first.digest != SyntheticLayer('b', 100000).describe().digest
+
+
+def test_compressibility():
+    size = 1024 * 1024
+    random_layer = SyntheticLayer('a', size, compressibility=0).describe()
+    zero_layer = SyntheticLayer('a', size, compressibility=1).describe()
+    assert random_layer.blob_size > size
+    assert zero_layer.blob_size < size / 100
+
+
+def test_images_share_base_layers():
+    generator = ImageGenerator(seed=1, layers=4, sizes='fixed:4KB', shared_layers=0.5)
+    first, second = generator.image('repo:1'), generator.image('repo:2')
+    digests = [[layer.describe().digest for layer in image.layers] for image in (first, second)]
+    assert digests[0][:2] == digests[1][:2]
+    assert not set(digests[0][2:]) & set(digests[1][2:])
+    assert digests[0] == [layer.describe().digest for layer in
+                          ImageGenerator(seed=1, layers=4, sizes='fixed:4KB', shared_layers=0.5).image('repo:1').layers]
+
+
+def test_manifest_describes_layers():
+    image = ImageGenerator(layers=2, sizes='fixed:1KB', image_format='oci').image('repo:1')
+    config = image.config()
+    manifest = json.loads(image.manifest(config))
+    assert manifest['config']['digest'] == 'sha256:' + hashlib.sha256(config).hexdigest()
+    assert [(layer['digest'], layer['size']) for layer in manifest['layers']] == \
+        [(layer.digest, layer.blob_size) for layer in image.layers]
+    assert json.loads(config)['rootfs']['diff_ids'] == [layer.diff_id for layer in image.layers]
+
+
+def test_parse_size():
+    assert parse_size('512') == 512
+    assert parse_size('64KB') == 64 * 1024
+    assert parse_size('1.5m') == int(1.5 * 1024 ** 2)
+    with pytest.raises(AssertionError):
+        parse_size('ten')
+
+
+def test_parse_size_distribution():
+    rng = random.Random(0)
+    assert parse_size_distribution('10MB')(rng) == 10 * 1024 ** 2
+    assert 1024 <= parse_size_distribution('uniform:1KB-2KB')(rng) <= 2048
+    with pytest.raises(AssertionError):
+        parse_size_distribution('pareto:1MB')
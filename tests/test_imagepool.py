@@ -0,0 +1,53 @@
+import pytest
+
+from utils import imagepool
+from utils.imagepool import ImagePool
+
+
+@pytest.fixture
+def commands(monkeypatch):
+    """
+    Record the commands run by the pool; builds of odd indices fail.
+    """
+    commands = []
+
+    def run(cmd, stdin=None):
+        commands.append(cmd)
+        if cmd[:2] == ['podman', 'build']:
+            index = int(cmd[cmd.index('--tag') + 1].rpartition(':')[2])
+            return index % 2 == 0, '', 'build failed'
+        return True, '', ''
+
+    monkeypatch.setattr(imagepool, 'run', run)
+    return commands
+
+
+def test_only_built_images_are_removed(commands):
+    pool = ImagePool(size=4, concurrency=2)
+    assert pool.build() == 2
+    pool.close()
+    removed = [cmd[-1] for cmd in commands if cmd[:2] == ['podman', 'rmi']]
+    assert sorted(removed) == ['localhost/quay-perf-pool:0', 'localhost/quay-perf-pool:2']
+
+
+def test_images_are_pushed_round_robin(commands):
+    pool = ImagePool(size=4, concurrency=1)
+    pool.build()
+    sources = [pool.push('quay/o/r:%s' % i)['source'] for i in range(4)]
+    assert sources == ['localhost/quay-perf-pool:0', 'localhost/quay-perf-pool:2'] * 2
+
+
+def test_images_that_failed_to_export_are_removed(monkeypatch, tmp_path):
+    commands = []
+
+    def run(cmd, stdin=None):
+        commands.append(cmd)
+        # Every export to an OCI layout fails.
+        return not cmd[-1].startswith('oci:'), '', ''
+
+    monkeypatch.setattr(imagepool, 'run', run)
+    pool = ImagePool(size=2, concurrency=1, transport='skopeo', layout_dir=str(tmp_path))
+    with pytest.raises(AssertionError):
+        pool.build()
+    removed = [cmd[-1] for cmd in commands if cmd[:2] == ['podman', 'rmi']]
+    assert sorted(removed) == ['localhost/quay-perf-pool:0', 'localhost/quay-perf-pool:1']
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from utils.jobs import job_state
+
+
+def job(completions=2, succeeded=None, completion_time=None, conditions=None):
+    return SimpleNamespace(
+        metadata=SimpleNamespace(name='test-job'),
+        spec=SimpleNamespace(completions=completions),
+        status=SimpleNamespace(succeeded=succeeded, completion_time=completion_time, conditions=conditions),
+    )
+
+
+def condition(type, status='True', message=''):
+    return SimpleNamespace(type=type, status=status, message=message)
+
+
+def test_running():
+    assert job_state(job()) is None
+    assert job_state(job(succeeded=1)) is None
+    assert job_state(job(conditions=[condition('Failed', status='False')])) is None
+
+
+def test_completed():
+    assert job_state(job(succeeded=2)) is True
+    assert job_state(job(completion_time='now')) is True
+    assert job_state(job(completions=None, conditions=[condition('Complete')])) is True
+
+
+def test_failed():
+    assert job_state(job(succeeded=1, conditions=[condition('Failed', message='BackoffLimitExceeded')])) is False
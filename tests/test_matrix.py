@@ -0,0 +1,42 @@
+import pytest
+
+from utils.matrix import ConnectionMatrix, cell_name, parse_matrix
+
+
+def test_parse_matrix():
+    cells = parse_matrix(' connections=10, 100 ;KeepAlive=true,False;')
+    assert cells == [
+        {'connections': 10, 'keepalive': True},
+        {'connections': 10, 'keepalive': False},
+        {'connections': 100, 'keepalive': True},
+        {'connections': 100, 'keepalive': False},
+    ]
+    assert cell_name(cells[1]) == 'connections_10_keepalive_false'
+
+
+def test_parse_matrix_rejects_unknown_options():
+    with pytest.raises(AssertionError):
+        parse_matrix('pipelining=true')
+
+
+def test_matrix_attacks_every_cell():
+    def attack_cell(settings):
+        throughput = settings['connections'] * (2 if settings['http2'] else 1)
+        return {'requests': 100, 'throughput': throughput, 'success': 1.0,
+                'latencies': {'mean': 1e7, '50th': 1e7, '99th': 2e7}}
+
+    results = ConnectionMatrix(attack_cell, parse_matrix('connections=1,4;http2=false,true')).run()
+    assert [result['name'] for result in results] == [
+        'connections_1_http2_false', 'connections_1_http2_true',
+        'connections_4_http2_false', 'connections_4_http2_true',
+    ]
+    assert results[0]['p99'] == 0.02
+
+    lines = ConnectionMatrix.table(results).splitlines()
+    assert len(lines) == 5
+    assert lines[1].split()[:3] == ['4', '-', 'true']
+
+
+def test_empty_matrix():
+    with pytest.raises(AssertionError):
+        ConnectionMatrix(None, [])
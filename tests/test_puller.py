@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip('httpx')
+
+from utils.puller import AsyncPuller
+
+
+class StaticTokens:
+    def get(self, registry, repository, scope='pull'):
+        return 'token'
+
+
+def probe(handler):
+    """
+    Run probe_ranges against `handler` and return (result, layer).
+    """
+    async def run():
+        puller = AsyncPuller(token_cache=StaticTokens(), range_segments=4, range_min_size=1)
+        puller.in_flight = asyncio.Semaphore(1)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as puller.client:
+            layer = {}
+            result = await puller.probe_ranges('https://quay/v2/o/r/blobs/sha256:x', 'quay', 'o/r', layer)
+            return result, layer
+    return asyncio.run(run())
+
+
+def test_probe_follows_redirect_to_storage():
+    def handler(request):
+        if request.url.host == 'quay':
+            return httpx.Response(302, headers={'Location': 'https://storage/blob'})
+        assert 'Authorization' not in request.headers
+        assert request.headers['Range'] == 'bytes=0-0'
+        return httpx.Response(206, headers={'Content-Range': 'bytes 0-0/1000'}, content=b'x')
+
+    result, layer = probe(handler)
+    assert result == ('https://storage/blob', False, 1000)
+    assert layer['storage_host'] == 'storage'
+
+
+def test_probe_does_not_read_an_ignored_range():
+    chunks_read = []
+
+    async def body():
+        for _ in range(100):
+            chunks_read.append(1)
+            yield b'x' * 1024
+
+    def handler(request):
+        return httpx.Response(200, content=body())
+
+    result, layer = probe(handler)
+    assert result is None
+    assert layer['storage_host'] == 'quay'
+    assert not chunks_read
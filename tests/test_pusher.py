@@ -0,0 +1,18 @@
+import pytest
+
+from utils.pusher import rechunk
+
+
+@pytest.mark.parametrize('sizes', [[], [10], [3, 3, 3, 1], [1] * 25, [25], [4, 0, 13, 8]])
+def test_rechunk(sizes):
+    data = bytes(range(sum(sizes)))
+    chunks, offset = [], 0
+    for size in sizes:
+        chunks.append(data[offset:offset + size])
+        offset += size
+
+    pairs = list(rechunk(iter(chunks), 4))
+    assert b''.join(chunk for _, chunk in pairs) == data
+    assert [offset for offset, _ in pairs] == list(range(0, len(data), 4))
+    assert all(len(chunk) == 4 for _, chunk in pairs[:-1])
+    assert not pairs or 0 < len(pairs[-1][1]) <= 4
@@ -0,0 +1,25 @@
+from utils.pushstats import PushStats
+
+
+def test_summary():
+    stats = PushStats()
+    stats.add({'successful': True, 'elapsed_time': 1.0, 'steps': {'patch': 0.25, 'put': 0.5},
+               'bytes_uploaded': 100, 'layers_uploaded': 1})
+    stats.add({'successful': True, 'elapsed_time': 2.0, 'steps': {'patch': 0.75},
+               'bytes_skipped': 100, 'layers_mounted': 1, 'mount_times': [0.1]})
+    stats.add({'successful': False, 'elapsed_time': 3.0, 'mount_failures': 1})
+
+    summary = stats.summary()
+    assert (summary['total'], summary['successful'], summary['failed']) == (3, 2, 1)
+    assert summary['durations']['max'] == 3.0
+    assert summary['steps']['patch']['mean'] == 0.5
+    assert summary['steps']['put']['max'] == 0.5
+    transfer = summary['transfer']
+    assert (transfer['bytes_uploaded'], transfer['bytes_skipped'], transfer['mount_failures']) == (100, 100, 1)
+    assert transfer['mount_times']['max'] == 0.1
+
+
+def test_podman_summary_has_no_steps():
+    stats = PushStats()
+    stats.add({'successful': True, 'elapsed_time': 1.0})
+    assert set(stats.summary(native=False)) == {'durations', 'total', 'successful', 'failed'}
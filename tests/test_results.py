@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+
+from utils import results
+from utils.results import ResultStream
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def stream():
+    stream = ResultStream(fakeredis.FakeRedis(), 'results', batch_size=3, flush_interval=3600)
+    stream.reset()
+    return stream
+
+
+@pytest.mark.parametrize('packed', [True, False])
+def test_encode_round_trip(packed, monkeypatch):
+    if packed:
+        pytest.importorskip('msgpack')
+    else:
+        monkeypatch.setattr(results, 'msgpack', None)
+    when = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    result = {'tag': 'repo:1', 'successful': True, 'elapsed_time': 0.5, 'end_time': when}
+    # Redis hands the fields back as bytes.
+    fields = {name.encode('utf-8'): value if isinstance(value, bytes) else value.encode('utf-8')
+              for name, value in results.encode(result).items()}
+    assert results.decode(fields) == dict(result, end_time=when.isoformat())
+
+
+def test_results_are_batched(stream):
+    for i in range(4):
+        stream.add({'tag': 'repo:%s' % i})
+    assert stream.redis.xlen('results') == 3
+    stream.flush()
+    assert stream.redis.xlen('results') == 4
+
+
+def test_results_are_flushed_every_interval(stream):
+    stream.add({'tag': 'repo:0'})
+    stream.flush_interval = 0
+    stream.add({'tag': 'repo:1'})
+    assert stream.redis.xlen('results') == 2
+
+
+def test_collect_and_ack(stream):
+    for i in range(10):
+        stream.add({'tag': 'repo:%s' % i})
+    stream.flush()
+
+    collected, ids = stream.collect(count=4)
+    assert [r['tag'] for r in collected] == ['repo:%s' % i for i in range(10)]
+    # Unacknowledged results are read again by the next collection.
+    assert stream.collect(count=4)[0] == collected
+    stream.ack(ids)
+    assert stream.collect() == ([], [])
+
+
+def test_reset_drops_stale_results(stream):
+    stream.add({'tag': 'stale'})
+    stream.flush()
+    stream.reset()
+    stream.reset()
+    assert stream.collect() == ([], [])
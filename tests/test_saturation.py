@@ -0,0 +1,69 @@
+import pytest
+
+from utils.saturation import SaturationSearch
+
+
+def endpoint(capacity):
+    """
+    Return an attack_step for an endpoint whose latency explodes past
+    `capacity` requests per second, and the list of attacked rates.
+    """
+    rates = []
+
+    def attack_step(rate):
+        rates.append(rate)
+        p99 = 0.05 if rate <= capacity else 2.0
+        return {
+            'requests': rate * 10,
+            'throughput': min(rate, capacity),
+            'success': 1.0,
+            'latencies': {'50th': p99 / 2 * 1e9, '99th': p99 * 1e9},
+        }
+    return attack_step, rates
+
+
+def test_step_search():
+    attack_step, rates = endpoint(capacity=100)
+    result = SaturationSearch(attack_step, 10, 1000, step_factor=2).run()
+    assert rates == [10, 20, 40, 80, 160]
+    assert result['max_sustainable_rate'] == 80
+    assert result['knee_rate'] == 160
+
+
+def test_step_search_stops_at_max_rate():
+    attack_step, rates = endpoint(capacity=10000)
+    result = SaturationSearch(attack_step, 10, 50, step_factor=2).run()
+    assert rates == [10, 20, 40, 50]
+    assert result['max_sustainable_rate'] == 50
+    assert result['knee_rate'] is None
+
+
+def test_binary_search():
+    attack_step, rates = endpoint(capacity=333)
+    result = SaturationSearch(attack_step, 10, 1000, strategy='binary', resolution=0.01).run()
+    assert rates[:2] == [10, 1000]
+    assert 330 <= result['max_sustainable_rate'] <= 333
+    assert 333 < result['knee_rate'] <= 337
+
+
+def test_start_rate_breaks_the_slo():
+    for strategy in ('step', 'binary'):
+        attack_step, rates = endpoint(capacity=5)
+        result = SaturationSearch(attack_step, 10, 1000, strategy=strategy).run()
+        assert rates == [10]
+        assert result['max_sustainable_rate'] is None
+
+
+def test_success_slo():
+    def attack_step(rate):
+        return {'requests': rate, 'throughput': rate, 'success': 0.98,
+                'latencies': {'50th': 1e6, '99th': 1e6}}
+
+    assert SaturationSearch(attack_step, 10, 100).run()['max_sustainable_rate'] is None
+
+
+def test_invalid_settings():
+    with pytest.raises(AssertionError):
+        SaturationSearch(None, 100, 10)
+    with pytest.raises(AssertionError):
+        SaturationSearch(None, 10, 100, strategy='linear')
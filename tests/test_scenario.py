@@ -0,0 +1,14 @@
+import pytest
+
+from utils.scenario import parse_mix
+
+
+def test_parse_mix():
+    assert parse_mix('get_users:5, get_catalog:0.5,image_pull') == \
+        {'get_users': 5.0, 'get_catalog': 0.5, 'image_pull': 1.0}
+    assert parse_mix('get_users:1,,') == {'get_users': 1.0}
+
+
+def test_parse_mix_rejects_non_positive_weights():
+    with pytest.raises(AssertionError):
+        parse_mix('get_users:0')
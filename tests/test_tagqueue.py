@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from utils.tagqueue import TagQueue, TagRange
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+def test_tag_range():
+    tags = TagRange('quay/org/{repo}:{index}', 10, 14, ['a', 'b'])
+    assert len(tags) == 4
+    assert list(tags) == ['quay/org/a:10', 'quay/org/b:11', 'quay/org/a:12', 'quay/org/b:13']
+    assert tags[3] == 'quay/org/b:13'
+    with pytest.raises(IndexError):
+        tags[4]
+    assert list(TagRange.loads(tags.dumps())) == list(tags)
+
+
+def test_tag_range_shared_between_threads():
+    tags = TagRange('repo:{index}', 0, 100)
+    seen = []
+
+    def worker():
+        for i in range(1000):
+            seen.append(tags[i % len(tags)])
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(seen) == 8000
+    assert set(seen) == set(tags)
+
+
+def test_list_queue(redis_client):
+    queue = TagQueue(redis_client, 'tags')
+    queue.fill(['a', 'b', 'c'])
+    assert queue.remaining() == 3
+    assert queue.pop(2) == ['a', 'b']
+    assert list(TagQueue(redis_client, 'tags').drain(2)) == ['c']
+    assert queue.pop(2) == []
+
+
+def test_range_queue_is_split_between_consumers(redis_client):
+    TagQueue(redis_client, 'tags').fill(TagRange('repo:{index}', 0, 25))
+    consumers = [TagQueue(redis_client, 'tags') for _ in range(3)]
+    popped = []
+    while True:
+        batches = [consumer.pop(4) for consumer in consumers]
+        if not any(batches):
+            break
+        for batch in batches:
+            popped.extend(batch)
+    assert sorted(popped) == sorted('repo:%s' % i for i in range(25))
+    assert consumers[0].remaining() == 0
+
+
+def test_follow_until_closed(redis_client):
+    queue = TagQueue(redis_client, 'tags')
+    queue.fill([], closed=False)
+    queue.push(['a', 'b'])
+    drained = queue.drain(10, follow=True, poll_timeout=0.1)
+    assert [next(drained), next(drained)] == ['a', 'b']
+    queue.push(['c'])
+    queue.close()
+    assert list(drained) == ['c']
@@ -0,0 +1,58 @@
+import math
+from collections import Counter
+
+import pytest
+
+from utils.targets import expm1_over_x, log1p_over_x, pairs, sample_indices
+
+
+@pytest.mark.parametrize('distribution', ['uniform', 'zipfian'])
+def test_sample_indices_deterministic(distribution):
+    first = list(sample_indices(10000, 500, seed=7, distribution=distribution))
+    assert first == list(sample_indices(10000, 500, seed=7, distribution=distribution))
+    assert first != list(sample_indices(10000, 500, seed=8, distribution=distribution))
+    assert len(set(first)) == 500
+    assert all(0 <= index < 10000 for index in first)
+
+
+def test_zipfian_saturation_fills_the_sample():
+    indices = list(sample_indices(100, 100, seed=1, distribution='zipfian'))
+    assert sorted(indices) == list(range(100))
+
+
+def test_sample_larger_than_population():
+    assert sorted(sample_indices(5, 10, seed=1)) == list(range(5))
+
+
+def test_unknown_distribution():
+    with pytest.raises(AssertionError):
+        list(sample_indices(10, 5, distribution='normal'))
+
+
+def test_pairs_without_sampling():
+    assert list(pairs(['a', 'b'], [1, 2])) == [('a', 1), ('a', 2), ('b', 1), ('b', 2)]
+
+
+@pytest.mark.parametrize('distribution', ['uniform', 'zipfian'])
+def test_pairs_deterministic(distribution):
+    rows, cols = list(range(50)), list(range(40))
+    first = list(pairs(rows, cols, 300, seed=3, distribution=distribution))
+    assert first == list(pairs(rows, cols, 300, seed=3, distribution=distribution))
+    assert len(set(first)) == 300
+
+
+def test_zipfian_pairs_favour_first_rows_and_columns():
+    rows, cols = list(range(50)), list(range(40))
+    sampled = list(pairs(rows, cols, 300, seed=3, distribution='zipfian'))
+    assert Counter(row for row, _ in sampled).most_common(1)[0][0] == 0
+    assert Counter(col for _, col in sampled).most_common(1)[0][0] == 0
+
+
+@pytest.mark.parametrize('x', [-0.5, -1e-9, 0.0, 1e-12, 1e-9, 0.5, 3.0])
+def test_zipf_helpers(x):
+    if abs(x) > 1e-6:
+        assert log1p_over_x(x) == pytest.approx(math.log1p(x) / x)
+        assert expm1_over_x(x) == pytest.approx(math.expm1(x) / x)
+    else:
+        assert log1p_over_x(x) == pytest.approx(1.0)
+        assert expm1_over_x(x) == pytest.approx(1.0)
@@ -0,0 +1,51 @@
+import pytest
+
+from utils.telemetry import Telemetry
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+def test_window_sums_the_last_seconds(redis_client):
+    workers = [Telemetry(redis_client, 'push', flush_interval=3600) for _ in range(2)]
+    for second in range(1000, 1010):
+        for worker in workers:
+            worker.record(True, elapsed=0.1, num_bytes=100, now=second + 0.5)
+    workers[0].record(False, elapsed=5.0, now=1009)
+    for worker in workers:
+        worker.flush()
+
+    window = workers[0].window(seconds=5, now=1010)
+    assert window['ops'] == 11
+    assert window['errors'] == 1
+    assert window['bytes'] == 1000
+    assert window['ops_per_sec'] == 2.2
+    assert window['error_rate'] == round(1 / 11, 4)
+    # Failed operations are not in the latency quantiles.
+    assert window['latency']['p99'] == pytest.approx(0.1, rel=0.01)
+
+    assert workers[1].totals() == {'ops': 21, 'errors': 1, 'bytes': 2000}
+
+
+def test_empty_window(redis_client):
+    window = Telemetry(redis_client, 'pull').window(seconds=10, now=1000)
+    assert (window['ops'], window['error_rate'], window['latency']) == (0, 0.0, {})
+
+
+def test_flush_interval(redis_client):
+    telemetry = Telemetry(redis_client, 'pull', flush_interval=0)
+    telemetry.record(True, elapsed=0.2, now=1000)
+    assert telemetry.totals()['ops'] == 1
+
+
+def test_reset(redis_client):
+    telemetry = Telemetry(redis_client, 'pull', flush_interval=0)
+    telemetry.record(True, now=1000)
+    redis_client.set('pull_other', 1)
+    telemetry.reset()
+    assert telemetry.totals()['ops'] == 0
+    assert redis_client.exists('pull_other')
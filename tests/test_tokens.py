@@ -0,0 +1,86 @@
+import time
+import threading
+
+import pytest
+
+from utils import tokens
+from utils.tokens import TokenCache
+
+
+class TokenEndpoint:
+    """
+    Issues numbered tokens, slowly enough for concurrent requests to overlap.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.expires_in = 300
+        self.lock = threading.Lock()
+
+    def request_token(self, registry, repository, scope='pull', username=None, password=None, session=None,
+                      mount_from=None):
+        time.sleep(0.05)
+        with self.lock:
+            self.count += 1
+            return 'token-%s' % self.count, self.expires_in
+
+
+@pytest.fixture
+def issued(monkeypatch):
+    issued = TokenEndpoint()
+    monkeypatch.setattr(tokens, 'request_token', issued.request_token)
+    return issued
+
+
+def run_threads(target, count=16):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(target())) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_gets_fetch_once(issued):
+    cache = TokenCache()
+    results = run_threads(lambda: cache.get('quay', 'o/r'))
+    assert set(results) == {'token-1'}
+    assert cache.stats()['fetches'] == 1
+    assert cache.stats()['hits'] == 15
+
+
+def test_keys_are_cached_apart(issued):
+    cache = TokenCache()
+    assert cache.get('quay', 'o/a') != cache.get('quay', 'o/b')
+    assert cache.get('quay', 'o/a', scope='push,pull') == 'token-3'
+
+
+def test_concurrent_invalidations_refresh_once(issued):
+    cache = TokenCache()
+    stale = cache.get('quay', 'o/r')
+    results = run_threads(lambda: cache.invalidate('quay', 'o/r', 'pull', stale))
+    assert set(results) == {'token-2'}
+    assert cache.stats()['fetches'] == 2
+    assert cache.stats()['invalidations'] == 1
+    # A late 401 with the stale token does not drop the fresh one.
+    assert cache.invalidate('quay', 'o/r', 'pull', stale) == 'token-2'
+
+
+def test_short_lived_tokens_are_reused(issued):
+    issued.expires_in = 1
+    cache = TokenCache(refresh_margin=10)
+    assert cache.get('quay', 'o/r') == cache.get('quay', 'o/r')
+    time.sleep(0.6)
+    assert cache.get('quay', 'o/r') == 'token-2'
+
+
+def test_failed_fetch_is_not_cached(monkeypatch):
+    def request_token(*args):
+        raise OSError('unreachable')
+
+    monkeypatch.setattr(tokens, 'request_token', request_token)
+    cache = TokenCache()
+    assert cache.get('quay', 'o/r') is None
+    assert cache.get('quay', 'o/r') is None
+    assert cache.stats()['failures'] == 2
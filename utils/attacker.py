@@ -4,15 +4,47 @@ import json
 import base64
 import logging
 import datetime
+import tempfile
+import itertools
+import threading
+import contextlib
 from config import Config
+from utils.engine import AsyncAttackEngine
+from utils.distributed import DistributedAttack
+from utils.saturation import SaturationSearch
+from utils.matrix import ConnectionMatrix, cell_name, parse_matrix
 from subprocess import run, Popen, PIPE, STDOUT
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
+# Size of the reads used when teeing `vegeta attack` output to disk and the
+# reporters.
+RESULT_CHUNK_SIZE = 64 * 1024
+
+
 class Attacker:
+    # When set, requests handed to `run_vegeta` are collected here by test
+    # name instead of being executed. See `capture`.
+    captured = None
+
     def __init__(self):
         pass
 
+    @classmethod
+    @contextlib.contextmanager
+    def capture(cls):
+        """
+        Collect the requests of the endpoint tests called within the context
+        instead of running them, e.g. to mix them in a scenario.
+
+        :return: dict mapping test names to their request dicts
+        """
+        cls.captured = {}
+        try:
+            yield cls.captured
+        finally:
+            cls.captured = None
+
     def to_base64_json(self, obj):
         """
         Return a base64-encoded JSON string from a given Python object.
@@ -21,84 +53,347 @@ class Attacker:
         string = base64.b64encode(json_data).decode('utf-8')
         return string
 
-    def run_vegeta(self, test_name, request_dicts, target_name):
+    def to_vegeta_target(self, req_dict, auth_token):
         """
-        Run Vegeta to execute the given HTTP requests and output the statistics.
-
-        target_name: A meaningful representation of what is being tested. Often,
-                    this will be an API endpoint path.
+        Return a single newline terminated Vegeta JSON target for the given
+        request dict.
         """
-        logging.info("Preparing to execute %s HTTP Requests." % len(request_dicts))
-        env_config = Config().get_config()
+        req = {
+            'url': req_dict['url'],
+            'method': req_dict['method'],
+        }
 
-        # Convert request_dicts to a string and perform all needed transformations
-        # for vegeta.
-        reqs = ''
-        for req_dict in request_dicts:
+        # Do not send a body if the HTTP Method is GET. Otherwise, ensure
+        # it's wrapped as a base64 encoded JSON string as expected by Vegeta.
+        if 'body' in req_dict and req_dict['method'] != 'GET':
+            req['body'] = self.to_base64_json(req_dict['body'])
 
-            req = {
-                'url': req_dict['url'],
-                'method': req_dict['method'],
+        # Some tests do not need authentication. Allow them to pass `None`
+        # as the request header to avoid injecting it.
+        if 'header' not in req_dict:
+            req['header'] = {
+                'Authorization': ['Bearer %s' % auth_token],
+                'Content-Type': ['application/json']
             }
+        else:
+            req['header'] = req_dict['header']
+
+        return json.dumps(req) + '\n'
 
-            # Do not send a body if the HTTP Method is GET. Otherwise, ensure
-            # it's wrapped as a base64 encoded JSON string as expected by Vegeta.
-            if 'body' in req_dict and req_dict['method'] != 'GET':
-                req['body'] = self.to_base64_json(req_dict['body'])
+    def write_targets(self, stream, request_dicts, auth_token, sent):
+        """
+        Lazily encode the request dicts and write them into Vegeta's stdin.
+        The number of targets written is recorded in `sent[0]`.
+        """
+        try:
+            for req_dict in request_dicts:
+                stream.write(self.to_vegeta_target(req_dict, auth_token).encode('ascii'))
+                sent[0] += 1
+        except BrokenPipeError:
+            logging.error("vegeta attack exited before all targets were sent")
+        finally:
+            try:
+                stream.close()
+            except BrokenPipeError:
+                pass
 
-            # Some tests do not need authentication. Allow them to pass `None`
-            # as the request header to avoid injecting it.
-            if 'header' not in req_dict:
-                req['header'] = {
-                    'Authorization': ['Bearer %s' % env_config["auth_token"]],
-                    'Content-Type': ['application/json']
-                }
-            else:
-                req['header'] = req_dict['header']
+    def run_vegeta(self, test_name, request_dicts, target_name):
+        """
+        Run the configured attack backend (`ATTACK_BACKEND`) to execute the
+        given HTTP requests and output the statistics.
 
-            req_string = json.dumps(req) + '\n'
-            reqs = reqs + req_string
+        request_dicts: An iterable (list or generator) of request dicts.
+        target_name: A meaningful representation of what is being tested. Often,
+                    this will be an API endpoint path.
+        """
+        if Attacker.captured is not None:
+            Attacker.captured[test_name] = request_dicts
+            return
+
+        env_config = Config().get_config()
 
         # Sanity Checks
-        assert reqs.strip()
+        request_dicts = iter(request_dicts)
+        first = next(request_dicts, None)
+        assert first is not None
         assert ' ' not in test_name
+        request_dicts = itertools.chain([first], request_dicts)
 
         # Ensure a directory exists for writing vegeta results
         if not os.path.isdir(env_config["log_directory"]):
             os.mkdir(env_config["log_directory"])
 
+        # The saturation and matrix modes replay the targets, which would
+        # create or delete the same objects again and only measure errors.
+        attack_mode = env_config["attack_mode"]
+        if attack_mode != 'fixed' and first['method'] != 'GET':
+            logging.info("ATTACK_MODE=%s only applies to read tests, attacking %s once" % (attack_mode, test_name))
+            attack_mode = 'fixed'
+
         start_time = datetime.datetime.utcnow()
         logging.info(f"Sending requests to {test_name} (UTC): {start_time.strftime('%Y-%m-%d %H:%M:%S.%f')}")
-        # Run `vegeta attack` to execute the HTTP Requests
+        if attack_mode == 'saturation':
+            self.attack_saturation(test_name, request_dicts, env_config)
+        elif attack_mode == 'matrix':
+            self.attack_matrix(test_name, request_dicts, env_config)
+        else:
+            result_filename = '%s/%s_%s_result.json' % (env_config["log_directory"], env_config["test_uuid"], test_name)
+            self.attack(test_name, request_dicts, result_filename, env_config)
+            logging.info('Results for test %s written to file: %s' % (test_name, result_filename))
+            self.index_results(test_name, result_filename, env_config)
+
+        end_time = datetime.datetime.utcnow()
+        logging.info(f"Ending requests to {test_name} (UTC): {end_time.strftime('%Y-%m-%d %H:%M:%S.%f')}")
+        elapsed_time = end_time - start_time
+        logging.info(f"Testing {test_name} took {str(datetime.timedelta(seconds=elapsed_time.total_seconds()))}.")
+
+    def attack(self, test_name, request_dicts, result_filename, env_config, rate=None, connection=None):
+        """
+        Execute the requests with the configured backend at `rate` requests
+        per second (`CONCURRENCY` by default). `connection` optionally
+        overrides the connection settings, see `utils.matrix`.
+        """
+        if env_config["attack_pods"] > 1:
+            self.attack_distributed(test_name, request_dicts, result_filename, env_config)
+        elif env_config["attack_backend"] == 'asyncio':
+            self.attack_asyncio(test_name, request_dicts, result_filename, env_config, rate, connection)
+        else:
+            self.attack_vegeta(test_name, request_dicts, result_filename, env_config, rate, connection)
+
+    def spool_targets(self, request_dicts, path):
+        """
+        Write the request dicts to a file, one JSON document per line, so they
+        can be replayed without keeping them in memory.
+        """
+        with open(path, 'w') as f:
+            for req_dict in request_dicts:
+                f.write(json.dumps(req_dict) + '\n')
+
+    def replay_targets(self, path):
+        """
+        Endlessly yield the request dicts of a spool file, starting over from
+        the first one once the last one has been yielded.
+        """
+        while True:
+            with open(path) as f:
+                for line in f:
+                    yield json.loads(line)
+
+    def attack_saturation(self, test_name, request_dicts, env_config):
+        """
+        Search the maximum request rate the endpoint sustains within the
+        configured SLOs. Every step replays the requests at a fixed rate for
+        `SATURATION_STEP_DURATION` seconds. Because requests are replayed,
+        `run_vegeta` only uses this mode for read (GET) tests.
+        """
+        log_directory = env_config["log_directory"]
+        spool = '%s/%s_%s_targets.jsonl' % (log_directory, env_config["test_uuid"], test_name)
+        self.spool_targets(request_dicts, spool)
+        duration = env_config["saturation_step_duration"]
+
+        def attack_step(rate):
+            step_name = '%s_rate_%s' % (test_name, rate)
+            result_filename = '%s/%s_%s_result.json' % (log_directory, env_config["test_uuid"], step_name)
+            requests = itertools.islice(self.replay_targets(spool), rate * duration)
+            self.attack(step_name, requests, result_filename, env_config, rate)
+            self.index_results(step_name, result_filename, env_config)
+            with open(result_filename) as f:
+                return json.loads(f.readlines()[-1])
+
+        search = SaturationSearch(
+            attack_step,
+            env_config["saturation_start_rate"],
+            env_config["saturation_max_rate"],
+            strategy=env_config["saturation_strategy"],
+            step_factor=env_config["saturation_step_factor"],
+            p99_slo=env_config["slo_p99_ms"] / 1000,
+            success_slo=env_config["slo_success_ratio"],
+        )
+        result = search.run()
+        result['test_name'] = test_name
+        os.remove(spool)
+
+        result_filename = '%s/%s_%s_saturation.json' % (log_directory, env_config["test_uuid"], test_name)
+        with open(result_filename, 'w') as f:
+            json.dump(result, f, indent=2)
+        logging.info("Maximum sustainable rate of %s: %s/s (throughput %s/s, knee at %s/s)",
+                     test_name, result['max_sustainable_rate'], result['max_sustainable_throughput'],
+                     result['knee_rate'])
+        logging.info('Saturation results for test %s written to file: %s' % (test_name, result_filename))
+
+    def attack_matrix(self, test_name, request_dicts, env_config):
+        """
+        Replay the requests for `MATRIX_STEP_DURATION` seconds with every
+        combination of the connection settings in `CONNECTION_MATRIX` and
+        write a comparison table. Because requests are replayed,
+        `run_vegeta` only uses this mode for read (GET) tests.
+        """
+        log_directory = env_config["log_directory"]
+        spool = '%s/%s_%s_targets.jsonl' % (log_directory, env_config["test_uuid"], test_name)
+        self.spool_targets(request_dicts, spool)
+        rate = env_config["concurrency"]
+
+        def attack_cell(settings):
+            cell_test_name = '%s_%s' % (test_name, cell_name(settings))
+            result_filename = '%s/%s_%s_result.json' % (log_directory, env_config["test_uuid"], cell_test_name)
+            requests = itertools.islice(self.replay_targets(spool), rate * env_config["matrix_step_duration"])
+            logging.info("Attacking %s with %s" % (test_name, settings))
+            self.attack(cell_test_name, requests, result_filename, env_config, connection=settings)
+            self.index_results(cell_test_name, result_filename, env_config)
+            with open(result_filename) as f:
+                return json.loads(f.readlines()[-1])
+
+        matrix = ConnectionMatrix(attack_cell, parse_matrix(env_config["connection_matrix"]))
+        results = matrix.run()
+        os.remove(spool)
+
+        table = ConnectionMatrix.table(results)
+        logging.info("Connection matrix of %s at %s/s:\n%s" % (test_name, rate, table))
+        result_filename = '%s/%s_%s_matrix.json' % (log_directory, env_config["test_uuid"], test_name)
+        with open(result_filename, 'w') as f:
+            json.dump({'test_name': test_name, 'rate': rate, 'cells': results}, f, indent=2)
+        with open('%s/%s_%s_matrix.txt' % (log_directory, env_config["test_uuid"], test_name), 'w') as f:
+            f.write(table + '\n')
+        logging.info('Connection matrix results for test %s written to file: %s' % (test_name, result_filename))
+
+    def attack_asyncio(self, test_name, request_dicts, result_filename, env_config, rate=None, connection=None):
+        """
+        Execute the requests with the in-process asyncio engine. A Vegeta
+        compatible JSON report is written to `result_filename` every second.
+        """
+        connection = connection or {}
+        engine = AsyncAttackEngine(
+            rate or env_config["concurrency"],
+            env_config["auth_token"],
+            max_workers=connection.get('max_workers', env_config["attack_max_workers"]),
+            http2=connection.get('http2', env_config["attack_http2"] == "true"),
+            connections=connection.get('connections'),
+            keepalive=connection.get('keepalive', True),
+        )
+        with open(result_filename, 'w') as output:
+            stats = engine.run(test_name, request_dicts, output=output)
+        logging.info("Sent %s HTTP Requests." % stats.requests)
+        logging.info(json.dumps(stats.report(), indent=2))
+
+    def attack_vegeta(self, test_name, request_dicts, result_filename, env_config, rate=None, connection=None):
+        """
+        Stream the requests into `vegeta attack`. The attack results are teed
+        once to disk and into the reporters, so memory usage does not grow
+        with the number of requests.
+        """
+        results_filename = '%s/%s_%s_results.bin' % (env_config["log_directory"], env_config["test_uuid"], test_name)
+
+        # Run `vegeta attack` to execute the HTTP Requests. The reporters read
+        # the attack output as it is produced: one shows the Vegeta stats and
+        # the other writes the per-second stats to a file.
         cmd = [
             'vegeta', 'attack',
             '-lazy',
             '-format=json',
-            '-rate', str(env_config["concurrency"]),
+            '-rate', str(rate or env_config["concurrency"]),
             '-insecure',
         ]
-        p = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=STDOUT)
-        output, _ = p.communicate(input=reqs.encode('ascii'))
+        # Connection settings map to the Vegeta flags of the same name, e.g.
+        # max_workers=100 to -max-workers=100 and keepalive=False to -keepalive=false.
+        for option, value in (connection or {}).items():
+            cmd.append('-%s=%s' % (option.replace('_', '-'), str(value).lower()))
+        # stderr goes to a file, so it can neither fill up a pipe nobody
+        # reads while the results stream nor get lost.
+        errors = tempfile.TemporaryFile()
+        attack = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=errors)
+        reporters = [
+            Popen(['vegeta', 'report'], stdin=PIPE),
+            Popen(['vegeta', 'report', '--every=1s', '--type=json', '--output=%s' % result_filename], stdin=PIPE),
+        ]
 
-        # Show Vegeta Stats
-        cmd = ['vegeta', 'report']
-        p = Popen(cmd, stdin=PIPE)
-        p.communicate(input=output)
-        assert p.returncode == 0
+        sent = [0]
+        writer = threading.Thread(
+            target=self.write_targets,
+            args=(attack.stdin, request_dicts, env_config["auth_token"], sent),
+            daemon=True,
+        )
+        writer.start()
 
-        end_time = datetime.datetime.utcnow()
-        logging.info(f"Ending requests to {test_name} (UTC): {end_time.strftime('%Y-%m-%d %H:%M:%S.%f')}")
-        elapsed_time = end_time - start_time
-        logging.info(f"Testing {test_name} took {str(datetime.timedelta(seconds=elapsed_time.total_seconds()))}.")
-        # Write Vegeta Stats to a file
-        result_filename = '%s/%s_%s_result.json' % (env_config["log_directory"], env_config["test_uuid"], test_name)
-        cmd = ['vegeta', 'report', '--every=1s', '--type=json', '--output=%s' % result_filename]
-        p = Popen(cmd, stdin=PIPE)
-        p.communicate(input=output)
+        with open(results_filename, 'wb') as results:
+            for chunk in iter(lambda: attack.stdout.read(RESULT_CHUNK_SIZE), b''):
+                results.write(chunk)
+                for reporter in reporters:
+                    reporter.stdin.write(chunk)
+        writer.join()
+        attack.wait()
+        for reporter in reporters:
+            reporter.stdin.close()
+            reporter.wait()
+        with errors:
+            if attack.returncode != 0:
+                errors.seek(0)
+                logging.error("vegeta attack of %s failed: %s" % (test_name, errors.read().decode('utf-8', 'replace').strip()))
+        assert attack.returncode == 0, "vegeta attack exited with %s" % attack.returncode
+        for reporter in reporters:
+            assert reporter.returncode == 0
+        logging.info("Sent %s HTTP Requests." % sent[0])
+        return results_filename
+
+    def attack_distributed(self, test_name, request_dicts, result_filename, env_config):
+        """
+        Shard the requests across `ATTACK_PODS` attacker pods which start
+        together and each attack at `CONCURRENCY` requests per second. Their
+        raw results are merged into a single report.
+        """
+        attack = DistributedAttack(test_name, env_config)
+        sent = attack.shard(request_dicts)
+        attack.create_job()
+        try:
+            attack.start()
+        except AssertionError:
+            # Do not leave the ready pods waiting on the barrier.
+            attack.delete_job()
+            raise
+        if not attack.wait():
+            logging.error("The attacker Job of %s failed, its report only covers the pods that finished" % test_name)
+        results = attack.collect(env_config["log_directory"])
+        assert results, "No results were received from the attacker pods"
+        logging.info("Sent %s HTTP Requests from %s pods." % (sent, len(results)))
+        self.report_files(results, result_filename)
+
+    def report_files(self, results_filenames, result_filename):
+        """
+        Show the Vegeta stats of the given raw result files and write the
+        per-second stats to `result_filename`.
+        """
+        p = Popen(['vegeta', 'report'] + results_filenames)
+        p.communicate()
+        assert p.returncode == 0
+        p = Popen(['vegeta', 'report', '--every=1s', '--type=json', '--output=%s' % result_filename] + results_filenames)
+        p.communicate()
         assert p.returncode == 0
-        logging.info('Results for test %s written to file: %s' % (test_name, result_filename))
 
-        # Use Snafu to push results to Elasticsearch (if configured)
+    def run_attack_shard(self):
+        """
+        Entry point of an attacker pod: attack with the shard of targets
+        assigned to this pod once every pod is ready, then publish the raw
+        results for the controller to merge.
+        """
+        env_config = Config().get_config()
+        test_name = os.environ.get('ATTACK_TEST_NAME')
+        index = int(os.environ.get('JOB_COMPLETION_INDEX'))
+        assert test_name, 'Ensure ATTACK_TEST_NAME is set on this job.'
+
+        if not os.path.isdir(env_config["log_directory"]):
+            os.mkdir(env_config["log_directory"])
+        result_filename = '%s/%s_%s_result_%s.json' % (env_config["log_directory"], env_config["test_uuid"], test_name, index)
+
+        attack = DistributedAttack(test_name, env_config)
+        request_dicts = attack.shard_targets(index)
+        attack.wait_for_start()
+        logging.info("Attacking %s as pod %s/%s" % (test_name, index, attack.pods))
+        results_filename = self.attack_vegeta(test_name, request_dicts, result_filename, env_config)
+        attack.publish_results(index, results_filename)
+
+    def index_results(self, test_name, result_filename, env_config):
+        """
+        Use Snafu to push results to Elasticsearch (if configured).
+        """
         if env_config["es_host"]:
             logging.info("Recording test results in ElasticSearch: %s", env_config["es_host"])
             cmd = [
@@ -0,0 +1,245 @@
+import os
+import sys
+import json
+import time
+import logging
+
+import redis
+from kubernetes import client
+
+from utils.jobs import wait_for_job
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+# Used for executing tests across multiple pods
+redis_client = redis.Redis(host='redis')
+
+# Number of targets written to (or read from) Redis per round trip.
+TARGET_CHUNK_SIZE = 1000
+
+# Size of the list elements used to move attack results through Redis.
+RESULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Seconds between all attacker pods being ready and the attack starting.
+START_DELAY = 2
+
+# Seconds to wait for all attacker pods to become ready.
+START_TIMEOUT = 600
+
+# Extra seconds attacker pods wait for the start beyond START_TIMEOUT.
+START_RELEASE_SLACK = 60
+
+
+class DistributedAttack:
+    """
+    Shards the targets of an API test across a Kubernetes Job of attacker
+    pods through Redis. The pods wait on a start barrier so that they all
+    fire at the same moment and their raw results are merged back on the
+    controller.
+    """
+
+    def __init__(self, test_name, env_config):
+        self.test_name = test_name
+        self.env_config = env_config
+        self.pods = env_config["attack_pods"]
+        self.run_id = '%s:%s' % (env_config["test_uuid"], test_name)
+        # Job names are DNS-1123 labels: at most 63 characters, not ending in '-'.
+        job_name = ('quay-attack-%s-%s' % (test_name, env_config["test_uuid"][-4:])).replace('_', '-').lower()
+        self.job_name = job_name[:63].rstrip('-')
+
+    def targets_key(self, index):
+        return 'attack_targets:%s:%s' % (self.run_id, index)
+
+    def results_key(self, index):
+        return 'attack_results:%s:%s' % (self.run_id, index)
+
+    @property
+    def ready_key(self):
+        return 'attack_ready:' + self.run_id
+
+    @property
+    def start_key(self):
+        return 'attack_start:' + self.run_id
+
+    def shard(self, request_dicts):
+        """
+        Distribute the request dicts round-robin over one Redis list per pod.
+
+        :param request_dicts: iterable of request dicts
+        :return: number of targets queued
+        """
+        for index in range(self.pods):
+            redis_client.delete(self.targets_key(index), self.results_key(index))  # avoid stale data
+        redis_client.delete(self.ready_key, self.start_key)
+
+        count = 0
+        buffers = [[] for _ in range(self.pods)]
+        for req_dict in request_dicts:
+            buffers[count % self.pods].append(json.dumps(req_dict))
+            count += 1
+            if count % (TARGET_CHUNK_SIZE * self.pods) == 0:
+                self.flush(buffers)
+        self.flush(buffers)
+        logging.info('Queued %s targets for %s across %s attacker pods' % (count, self.test_name, self.pods))
+        return count
+
+    def flush(self, buffers):
+        pipe = redis_client.pipeline(transaction=False)
+        for index, buffer in enumerate(buffers):
+            if buffer:
+                pipe.rpush(self.targets_key(index), *buffer)
+                buffer.clear()
+        pipe.execute()
+
+    def create_job(self):
+        """
+        Create an Indexed Kubernetes Job with one attacker pod per shard.
+        """
+        env_config = self.env_config
+        env_vars = [
+            client.V1EnvVar(name='QUAY_HOST', value=env_config["quay_host"]),
+            client.V1EnvVar(name='PYTHONUNBUFFERED', value='0'),
+            client.V1EnvVar(name='QUAY_OAUTH_TOKEN', value=env_config["auth_token"]),
+            client.V1EnvVar(name='CONCURRENCY', value=str(env_config["concurrency"])),
+            client.V1EnvVar(name='TARGET_HIT_SIZE', value=str(env_config["target_hit_size"])),
+            client.V1EnvVar(name='PUSH_PULL_IMAGE', value=env_config["push_pull_image"]),
+            client.V1EnvVar(name='TEST_UUID', value=env_config["test_uuid"]),
+            client.V1EnvVar(name='TEST_NAMESPACE', value=env_config["test_namespace"]),
+            client.V1EnvVar(name='QUAY_TEST_NAME', value='attack'),
+            client.V1EnvVar(name='QUAY_ORG', value=env_config["quay_org"]),
+            client.V1EnvVar(name='TEST_PHASES', value=env_config["test_phases"]),
+            # Config() validates the scenario settings of the phases in every pod.
+            client.V1EnvVar(name='SCENARIO_MIX', value=env_config["scenario_mix"]),
+            client.V1EnvVar(name='SCENARIO_DURATION', value=str(env_config["scenario_duration"])),
+            client.V1EnvVar(name='SCENARIO_SEED', value=str(env_config["scenario_seed"])),
+            client.V1EnvVar(name='ATTACK_TEST_NAME', value=self.test_name),
+            client.V1EnvVar(name='ATTACK_PODS', value=str(self.pods)),
+        ]
+
+        resource_requirements = client.V1ResourceRequirements(
+            requests={
+                'cpu': '1',
+                'memory': '512Mi',
+            }
+        )
+
+        container = client.V1Container(
+            name='python',
+            image=env_config["push_pull_image"],
+            env=env_vars,
+            resources=resource_requirements,
+        )
+
+        template = client.V1PodTemplateSpec(
+            metadata=client.V1ObjectMeta(labels={'quay-perf-test-component-attack': self.job_name}),
+            spec=client.V1PodSpec(restart_policy='Never', containers=[container])
+        )
+
+        spec = client.V1JobSpec(template=template, backoff_limit=0, completion_mode='Indexed',
+                                parallelism=self.pods, completions=self.pods, ttl_seconds_after_finished=120)
+
+        job = client.V1Job(
+            api_version="batch/v1",
+            kind="Job",
+            metadata=client.V1ObjectMeta(name=self.job_name),
+            spec=spec
+        )
+
+        api = client.BatchV1Api()
+        resp = api.create_namespaced_job(namespace=env_config["test_namespace"], body=job)
+        logging.info("Created Job: %s", resp.metadata.name)
+
+    def delete_job(self):
+        """
+        Delete the attacker Job and its pods.
+        """
+        client.BatchV1Api().delete_namespaced_job(name=self.job_name, namespace=self.env_config["test_namespace"],
+                                                  propagation_policy='Background')
+        logging.info("Deleted Job: %s", self.job_name)
+
+    def start(self):
+        """
+        Wait for every attacker pod to reach the barrier and release them
+        with a common start time.
+        """
+        deadline = time.time() + START_TIMEOUT
+        while True:
+            ready = int(redis_client.get(self.ready_key) or 0)
+            if ready >= self.pods:
+                break
+            assert time.time() < deadline, "Only %s/%s attacker pods became ready" % (ready, self.pods)
+            time.sleep(1)
+        start_at = time.time() + START_DELAY
+        redis_client.rpush(self.start_key, *[start_at] * self.pods)
+        logging.info('All %s attacker pods ready, starting %s' % (self.pods, self.test_name))
+
+    def wait(self):
+        """
+        Block until the attacker Job has finished.
+        """
+        return wait_for_job(self.env_config["test_namespace"], self.job_name)
+
+    def collect(self, results_directory):
+        """
+        Download the raw Vegeta results of every pod into local files. The
+        chunks are popped as they are written, so Redis frees them as the
+        download goes.
+
+        :return: list of result file paths
+        """
+        paths = []
+        for index in range(self.pods):
+            key = self.results_key(index)
+            if not redis_client.llen(key):
+                logging.error('No results received from attacker pod %s of %s' % (index, self.test_name))
+                continue
+            path = '%s/%s_%s_results_%s.bin' % (results_directory, self.env_config["test_uuid"], self.test_name, index)
+            with open(path, 'wb') as f:
+                for chunk in iter(lambda: redis_client.lpop(key), None):
+                    f.write(chunk)
+            paths.append(path)
+        return paths
+
+    # Attacker pod side
+
+    def shard_targets(self, index):
+        """
+        Lazily yield the request dicts queued for the given pod.
+        """
+        key = self.targets_key(index)
+        offset = 0
+        while True:
+            chunk = redis_client.lrange(key, offset, offset + TARGET_CHUNK_SIZE - 1)
+            if not chunk:
+                break
+            offset += len(chunk)
+            for data in chunk:
+                yield json.loads(data)
+        redis_client.delete(key)
+
+    def wait_for_start(self):
+        """
+        Register this pod at the barrier and sleep until the common start
+        time. Fails when the controller does not release the barrier within
+        its own start timeout, e.g. because it died, so the Job ends instead
+        of hanging.
+        """
+        redis_client.incr(self.ready_key)
+        item = redis_client.blpop(self.start_key, timeout=START_TIMEOUT + START_RELEASE_SLACK)
+        assert item, "The attack %s was not started within %ss" % (self.test_name, START_TIMEOUT + START_RELEASE_SLACK)
+        _, start_at = item
+        delay = float(start_at) - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def publish_results(self, index, results_filename):
+        """
+        Upload the raw Vegeta results of this pod to Redis as a list of
+        chunks, which unlike a single string is not capped at 512MB.
+        """
+        key = self.results_key(index)
+        redis_client.delete(key)
+        with open(results_filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(RESULT_CHUNK_SIZE), b''):
+                redis_client.rpush(key, chunk)
+        logging.info('Published %s bytes of results for %s' % (os.path.getsize(results_filename), self.test_name))
@@ -0,0 +1,263 @@
+import sys
+import json
+import time
+import asyncio
+import logging
+import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.histogram import LatencyHistogram
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+# httpx logs every request at INFO, far too verbose under load.
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+def _rfc3339(timestamp):
+    """
+    Format a unix timestamp the way Vegeta reports do.
+    """
+    if timestamp is None:
+        return '0001-01-01T00:00:00Z'
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+class AttackStats:
+    """
+    Accumulates the outcome of every request of an attack and renders it in
+    the same JSON layout as `vegeta report --type=json`, so the results can
+    be indexed by snafu exactly like the Vegeta ones.
+    """
+
+    def __init__(self):
+        self.latencies = LatencyHistogram()
+        self.requests = 0
+        self.successes = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.status_codes = Counter()
+        self.errors = set()
+        self.earliest = None
+        self.latest = None
+        self.end = None
+
+    def record(self, started, latency, status_code, bytes_in, bytes_out, error=None):
+        """
+        Record a single request that was sent at `started` (unix time) and
+        took `latency` seconds.
+        """
+        self.latencies.record(latency)
+        self.requests += 1
+        if 200 <= status_code < 400:
+            self.successes += 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.status_codes[str(status_code)] += 1
+        if error:
+            self.errors.add(error)
+        if self.earliest is None or started < self.earliest:
+            self.earliest = started
+        if self.latest is None or started > self.latest:
+            self.latest = started
+        if self.end is None or started + latency > self.end:
+            self.end = started + latency
+
+    def report(self):
+        """
+        Return a dict matching the `vegeta report --type=json` format.
+        """
+        ns = 1e9
+        duration = (self.latest - self.earliest) if self.requests else 0.0
+        wait = (self.end - self.latest) if self.requests else 0.0
+        latencies = self.latencies
+        return {
+            'latencies': {
+                'total': int(latencies.total * ns),
+                'mean': int(latencies.mean * ns),
+                '50th': int(latencies.quantile(0.50) * ns),
+                '90th': int(latencies.quantile(0.90) * ns),
+                '95th': int(latencies.quantile(0.95) * ns),
+                '99th': int(latencies.quantile(0.99) * ns),
+                'max': int((latencies.max or 0.0) * ns),
+                'min': int((latencies.min or 0.0) * ns),
+            },
+            'bytes_in': {
+                'total': self.bytes_in,
+                'mean': self.bytes_in / self.requests if self.requests else 0.0,
+            },
+            'bytes_out': {
+                'total': self.bytes_out,
+                'mean': self.bytes_out / self.requests if self.requests else 0.0,
+            },
+            'earliest': _rfc3339(self.earliest),
+            'latest': _rfc3339(self.latest),
+            'end': _rfc3339(self.end),
+            'duration': int(duration * ns),
+            'wait': int(wait * ns),
+            'requests': self.requests,
+            'rate': self.requests / duration if duration > 0 else 0.0,
+            'throughput': self.successes / (duration + wait) if duration + wait > 0 else 0.0,
+            'success': self.successes / self.requests if self.requests else 0.0,
+            'status_codes': dict(self.status_codes),
+            'errors': sorted(self.errors),
+        }
+
+
+class AsyncAttackEngine:
+    """
+    In-process HTTP load generator built on asyncio and httpx.
+
+    Requests are scheduled open-loop: request `n` is sent at `n / rate`
+    seconds after the start regardless of how long earlier requests take,
+    and its latency is measured from that scheduled time. It consumes the
+    same request dicts that the endpoint classes hand to `Attacker`.
+
+    A request dict may carry a `name`, in which case its outcome is also
+    accounted per name in `endpoints`. Instead of an HTTP request it may
+    carry a `call`: a blocking callable (e.g. an image push) that is run in
+    a thread pool and counts as successful when it returns a truthy value.
+    """
+
+    def __init__(self, rate, auth_token, max_workers=1000, http2=False, timeout=30, call_workers=32,
+                 connections=None, keepalive=True):
+        """
+        :param rate: requests per second
+        :param auth_token: bearer token injected when a request has no header
+        :param max_workers: upper bound of in-flight requests
+        :param http2: negotiate HTTP/2 with the server
+        :param timeout: per-request timeout in seconds
+        :param call_workers: threads available to `call` operations
+        :param connections: idle connections kept open for reuse (`max_workers` by default)
+        :param keepalive: reuse connections between requests
+        """
+        assert httpx, "httpx is not installed. Required for the asyncio attack backend."
+        self.rate = rate
+        self.auth_token = auth_token
+        self.max_workers = max_workers
+        self.http2 = http2
+        self.timeout = timeout
+        self.call_workers = call_workers
+        self.connections = connections or max_workers
+        self.keepalive = keepalive
+        self.executor = None
+        self.stats = AttackStats()
+        self.endpoints = {}
+
+    def build_request(self, req_dict):
+        """
+        Translate a request dict into (method, url, headers, content).
+        """
+        if 'header' not in req_dict:
+            headers = [
+                ('Authorization', 'Bearer %s' % self.auth_token),
+                ('Content-Type', 'application/json'),
+            ]
+        else:
+            headers = [(k, v) for k, values in (req_dict['header'] or {}).items() for v in values]
+
+        content = None
+        if 'body' in req_dict and req_dict['method'] != 'GET':
+            content = json.dumps(req_dict['body']).encode('utf-8')
+        return req_dict['method'], req_dict['url'], headers, content
+
+    async def hit(self, client, req_dict, scheduled, workers):
+        """
+        Send a single request (or run a single operation) and record its outcome.
+        """
+        started = time.time() - (time.monotonic() - scheduled)
+        status_code, bytes_in, bytes_out, error = 0, 0, 0, None
+        try:
+            if 'call' in req_dict:
+                status_code, error = await self.call(req_dict['call'])
+            else:
+                method, url, headers, content = self.build_request(req_dict)
+                bytes_out = len(content or b'')
+                response = await client.request(method, url, headers=headers, content=content)
+                status_code = response.status_code
+                bytes_in = len(response.content)
+                if status_code >= 400:
+                    error = '%s %s' % (status_code, response.reason_phrase)
+        except Exception as e:
+            # Any failure, e.g. a malformed target, is recorded so that every
+            # scheduled request shows in the report.
+            error = '%s: %s' % (type(e).__name__, e)
+        finally:
+            workers.release()
+        latency = time.monotonic() - scheduled
+        self.stats.record(started, latency, status_code, bytes_in, bytes_out, error)
+        if 'name' in req_dict:
+            stats = self.endpoints.setdefault(req_dict['name'], AttackStats())
+            stats.record(started, latency, status_code, bytes_in, bytes_out, error)
+
+    async def call(self, operation):
+        """
+        Run a blocking operation in the thread pool.
+
+        :return: (status_code, error) where 200 means the operation succeeded
+        """
+        try:
+            ok = await asyncio.get_running_loop().run_in_executor(self.executor, operation)
+        except Exception as e:
+            return 0, '%s: %s' % (type(e).__name__, e)
+        return (200, None) if ok else (0, 'operation failed')
+
+    async def tick(self, test_name, output):
+        """
+        Emit the accumulated stats every second while the attack runs.
+        """
+        while True:
+            await asyncio.sleep(1)
+            self.emit(test_name, output)
+
+    def emit(self, test_name, output):
+        report = self.stats.report()
+        if output:
+            output.write(json.dumps(report) + '\n')
+            output.flush()
+        logging.info("%s: %s requests, %.2f%% success, p99 %.1fms",
+                     test_name, report['requests'], report['success'] * 100,
+                     report['latencies']['99th'] / 1e6)
+
+    async def attack(self, test_name, request_dicts, output=None):
+        limits = httpx.Limits(
+            max_connections=self.max_workers,
+            max_keepalive_connections=self.connections if self.keepalive else 0,
+        )
+        workers = asyncio.Semaphore(self.max_workers)
+        pending = set()
+        self.executor = ThreadPoolExecutor(max_workers=self.call_workers)
+        async with httpx.AsyncClient(http2=self.http2, verify=False, limits=limits, timeout=self.timeout) as client:
+            ticker = asyncio.create_task(self.tick(test_name, output))
+            start = time.monotonic()
+            for n, req_dict in enumerate(request_dicts):
+                scheduled = start + n / self.rate
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await workers.acquire()
+                task = asyncio.create_task(self.hit(client, req_dict, scheduled, workers))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.wait(pending)
+            ticker.cancel()
+        self.executor.shutdown()
+        self.emit(test_name, output)
+
+    def run(self, test_name, request_dicts, output=None):
+        """
+        Execute the attack and block until every request has completed.
+
+        :param test_name: name used when logging progress
+        :param request_dicts: iterable of request dicts
+        :param output: optional file object receiving one JSON report per second
+        :return: AttackStats
+        """
+        asyncio.run(self.attack(test_name, request_dicts, output))
+        return self.stats
@@ -0,0 +1,136 @@
+import json
+
+
+class LatencyHistogram:
+    """
+    Compact, mergeable latency histogram in the spirit of HdrHistogram.
+
+    Values are recorded as integer multiples of `unit` seconds into
+    log-linear buckets: values below 2^precision_bits are exact, larger
+    values keep `precision_bits` significant bits, i.e. a relative error
+    below 2^-(precision_bits - 1). The buckets are stored sparsely, so the
+    size depends on the spread of the latencies and not on how many were
+    recorded, and histograms from different pods can simply be added up.
+    """
+
+    def __init__(self, precision_bits=7, unit=1e-6):
+        """
+        :param precision_bits: significant bits kept per value (7 bits ~ 1% error)
+        :param unit: resolution in seconds (microseconds by default)
+        """
+        self.precision_bits = precision_bits
+        self.unit = unit
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def bucket(self, value):
+        """
+        Return the bucket index of an integer value.
+        """
+        shift = value.bit_length() - self.precision_bits
+        if shift <= 0:
+            return value
+        return (shift << (self.precision_bits - 1)) + (value >> shift)
+
+    def bucket_value(self, bucket):
+        """
+        Return the integer value a bucket stands for (its midpoint).
+        """
+        if bucket < (1 << self.precision_bits):
+            return bucket
+        shift = (bucket >> (self.precision_bits - 1)) - 1
+        mantissa = bucket - (shift << (self.precision_bits - 1))
+        return (mantissa << shift) + ((1 << shift) - 1) / 2
+
+    def record(self, seconds, count=1):
+        """
+        Record a latency (in seconds) `count` times.
+        """
+        seconds = max(seconds, 0.0)
+        bucket = self.bucket(int(round(seconds / self.unit)))
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += count
+        self.total += seconds * count
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other):
+        """
+        Add the values of another histogram recorded with the same settings.
+        """
+        assert (other.precision_bits, other.unit) == (self.precision_bits, self.unit), \
+            "Cannot merge histograms with different precision"
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """
+        Return the latency (seconds) at quantile `q`, e.g. 0.99 for p99.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, q * self.count)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                value = self.bucket_value(bucket) * self.unit
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self):
+        """
+        Return the duration stats used in the push/pull summaries.
+        """
+        if not self.count:
+            return {}
+        return {
+            'mean': self.mean,
+            'max': self.max,
+            'min': self.min,
+            'p50': self.quantile(0.50),
+            'p90': self.quantile(0.90),
+            'p99': self.quantile(0.99),
+            'p99_9': self.quantile(0.999),
+        }
+
+    def to_dict(self):
+        return {
+            'precision_bits': self.precision_bits,
+            'unit': self.unit,
+            'counts': {str(bucket): count for bucket, count in self.counts.items()},
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['precision_bits'], data['unit'])
+        histogram.counts = {int(bucket): count for bucket, count in data['counts'].items()}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+    def dumps(self):
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def loads(cls, data):
+        return cls.from_dict(json.loads(data))
@@ -0,0 +1,270 @@
+import re
+import json
+import math
+import zlib
+import random
+import hashlib
+import tarfile
+import functools
+
+DOCKER_MEDIA_TYPES = {
+    'manifest': 'application/vnd.docker.distribution.manifest.v2+json',
+    'config': 'application/vnd.docker.container.image.v1+json',
+    'layer': 'application/vnd.docker.image.rootfs.diff.tar.gzip',
+}
+OCI_MEDIA_TYPES = {
+    'manifest': 'application/vnd.oci.image.manifest.v1+json',
+    'config': 'application/vnd.oci.image.config.v1+json',
+    'layer': 'application/vnd.oci.image.layer.v1.tar+gzip',
+}
+MEDIA_TYPES = {'docker': DOCKER_MEDIA_TYPES, 'oci': OCI_MEDIA_TYPES}
+
+# Uncompressed bytes generated at a time.
+BLOCK_SIZE = 1024 * 1024
+
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2, 'G': 1024 ** 3, 'GB': 1024 ** 3}
+
+
+def sha256_digest(data):
+    return 'sha256:' + hashlib.sha256(data).hexdigest()
+
+
+def parse_size(text):
+    """
+    Parse a size such as 512, 64KB, 1.5MB or 2G into bytes.
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*', text.upper())
+    assert match, "Invalid size: %s" % text
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def parse_size_distribution(spec):
+    """
+    Parse a layer size distribution into a callable(rng) returning a size
+    in bytes. Supported distributions:
+
+    * fixed:<size> (or just <size>), e.g. fixed:10MB
+    * uniform:<min>-<max>, e.g. uniform:1MB-100MB
+    * lognormal:<median>,<sigma>, e.g. lognormal:8MB,1.5, which has the long
+      tail of real image layers
+    """
+    kind, _, args = spec.partition(':')
+    if not args:
+        kind, args = 'fixed', kind
+    kind = kind.strip().lower()
+    if kind == 'fixed':
+        size = parse_size(args)
+        return lambda rng: size
+    if kind == 'uniform':
+        low, _, high = args.partition('-')
+        low, high = parse_size(low), parse_size(high)
+        assert low <= high, "Invalid uniform size range: %s" % args
+        return lambda rng: rng.randint(low, high)
+    if kind == 'lognormal':
+        median, _, sigma = args.partition(',')
+        mu, sigma = math.log(max(parse_size(median), 1)), float(sigma)
+        return lambda rng: int(rng.lognormvariate(mu, sigma))
+    raise AssertionError("Unknown size distribution %s. Valid options: fixed, uniform, lognormal" % kind)
+
+
+def gzip_member(data, level=0):
+    return zlib.compress(data, level, wbits=31)
+
+
+@functools.lru_cache(maxsize=64)
+def zeros(size):
+    return bytes(size)
+
+
+@functools.lru_cache(maxsize=64)
+def zeros_member(size):
+    return gzip_member(zeros(size), 9)
+
+
+class SyntheticLayer:
+    """
+    A deterministic gzipped tar layer holding a single file of `size` bytes.
+
+    The content is generated from `seed` while it is streamed, so a layer
+    never has to be kept in memory or on disk, and the same seed always
+    produces the same blob. `compressibility` is the share of the content
+    made of zeros; the rest is random, so the blob is about
+    `(1 - compressibility) * size` bytes.
+
+    The blob is a concatenation of gzip members, which container runtimes
+    read as a single stream: random runs are stored uncompressed and zero
+    runs are deflated once and cached. Generating a layer costs about as
+    much as hashing it instead of as much as deflating it.
+    """
+
+    def __init__(self, seed, size, compressibility=0.5, media_type=DOCKER_MEDIA_TYPES['layer']):
+        """
+        :param seed: string the content is generated from
+        :param size: size in bytes of the file in the layer
+        :param compressibility: share of zeros in the content, 0 to 1
+        :param media_type: media type of the layer in manifests
+        """
+        self.seed = seed
+        self.size = size
+        self.compressibility = compressibility
+        self.media_type = media_type
+        self.digest = None
+        self.diff_id = None
+        self.blob_size = None
+
+    def tar_segments(self):
+        """
+        Yield the uncompressed tar as (random bytes, number of zeros) pairs.
+        """
+        info = tarfile.TarInfo('data/%s.bin' % hashlib.sha256(self.seed.encode('utf-8')).hexdigest()[:16])
+        info.size = self.size
+        info.mtime = 0
+        info.mode = 0o644
+        yield info.tobuf(tarfile.GNU_FORMAT), 0
+
+        rng = random.Random(self.seed)
+        for offset in range(0, self.size, BLOCK_SIZE):
+            length = min(BLOCK_SIZE, self.size - offset)
+            zero_count = int(length * self.compressibility)
+            yield rng.randbytes(length - zero_count), zero_count
+
+        # Pad the file to a tar block, end the archive with two empty
+        # blocks and pad it to a full record like tarfile does.
+        length = tarfile.BLOCKSIZE + self.size + (-self.size % tarfile.BLOCKSIZE) + 2 * tarfile.BLOCKSIZE
+        yield b'', -self.size % tarfile.BLOCKSIZE + 2 * tarfile.BLOCKSIZE + (-length % tarfile.RECORDSIZE)
+
+    def stream(self):
+        """
+        Yield the compressed blob in chunks. `digest`, `diff_id` and
+        `blob_size` are set once the stream is exhausted.
+        """
+        digest = hashlib.sha256()
+        diff_id = hashlib.sha256()
+        blob_size = 0
+        for data, zero_count in self.tar_segments():
+            if data:
+                member = gzip_member(data)
+                diff_id.update(data)
+                digest.update(member)
+                blob_size += len(member)
+                yield member
+            if zero_count:
+                member = zeros_member(zero_count)
+                diff_id.update(zeros(zero_count))
+                digest.update(member)
+                blob_size += len(member)
+                yield member
+        self.digest = 'sha256:' + digest.hexdigest()
+        self.diff_id = 'sha256:' + diff_id.hexdigest()
+        self.blob_size = blob_size
+
+    def describe(self):
+        """
+        Compute the digest, diff_id and blob size without keeping the blob.
+        """
+        if self.digest is None:
+            for _ in self.stream():
+                pass
+        return self
+
+
+class SyntheticImage:
+    """
+    A synthetic image: its layers plus the config and manifest describing
+    them.
+    """
+
+    def __init__(self, layers, image_format='docker'):
+        self.layers = layers
+        self.media_types = MEDIA_TYPES[image_format]
+
+    def config(self):
+        """
+        Return the image config. Describes the layers that were not
+        streamed yet.
+        """
+        return image_config([layer.describe().diff_id for layer in self.layers])
+
+    def manifest(self, config):
+        """
+        Return the manifest for the config blob and the layers.
+        """
+        return image_manifest(config, [(layer.describe().digest, layer.blob_size) for layer in self.layers],
+                              self.media_types)
+
+
+class ImageGenerator:
+    """
+    Generates deterministic synthetic images with a given layer count,
+    layer size distribution and compressibility.
+
+    The shape and the content of an image only depend on the generator
+    seed and the image name, so a run can be repeated with the same images
+    and different names get different blobs. The first `shared_layers`
+    share of the layers of every image are the same base layers, like
+    images built from a common base image.
+    """
+
+    def __init__(self, seed=0, layers=1, sizes='fixed:1MB', compressibility=0.5, image_format='docker',
+                 shared_layers=0.0):
+        """
+        :param seed: seed of every generated image
+        :param layers: number of layers per image
+        :param sizes: layer size distribution, see `parse_size_distribution`
+        :param compressibility: share of zeros in the layer content, 0 to 1
+        :param image_format: docker (schema 2) or oci manifests
+        :param shared_layers: share of the layers common to all images, 0 to 1
+        """
+        assert image_format in MEDIA_TYPES, "Unknown image format: %s" % image_format
+        assert 0 <= compressibility <= 1, "Compressibility must be between 0 and 1"
+        assert 0 <= shared_layers <= 1, "Shared layers must be between 0 and 1"
+        self.seed = seed
+        self.layers = layers
+        self.sample_size = parse_size_distribution(sizes)
+        self.compressibility = compressibility
+        self.image_format = image_format
+
+        # Shared layers are generated once and reused by every image, so
+        # their digests are only computed once.
+        rng = random.Random('%s/shared' % seed)
+        self.shared = [
+            SyntheticLayer('%s/shared/%s' % (seed, index), max(0, self.sample_size(rng)),
+                           compressibility, MEDIA_TYPES[image_format]['layer'])
+            for index in range(round(layers * shared_layers))
+        ]
+
+    def image(self, name):
+        """
+        Return the synthetic image for `name`, e.g. a repository and tag.
+        """
+        rng = random.Random('%s/%s' % (self.seed, name))
+        return SyntheticImage(self.shared + [
+            SyntheticLayer('%s/%s/%s' % (self.seed, name, index), max(0, self.sample_size(rng)),
+                           self.compressibility, MEDIA_TYPES[self.image_format]['layer'])
+            for index in range(len(self.shared), self.layers)
+        ], self.image_format)
+
+
+def image_config(diff_ids):
+    """
+    Return a minimal image config for layers with the given diff_ids.
+    """
+    return json.dumps({
+        'architecture': 'amd64',
+        'os': 'linux',
+        'config': {},
+        'rootfs': {'type': 'layers', 'diff_ids': diff_ids},
+        'history': [{'created_by': 'quay-performance-scripts'} for _ in diff_ids],
+    }).encode('utf-8')
+
+
+def image_manifest(config, layers, media_types=DOCKER_MEDIA_TYPES):
+    """
+    Return a manifest for the config blob and (digest, size) layers.
+    """
+    return json.dumps({
+        'schemaVersion': 2,
+        'mediaType': media_types['manifest'],
+        'config': {'mediaType': media_types['config'], 'size': len(config), 'digest': sha256_digest(config)},
+        'layers': [{'mediaType': media_types['layer'], 'size': size, 'digest': digest} for digest, size in layers],
+    }).encode('utf-8')
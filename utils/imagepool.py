@@ -0,0 +1,163 @@
+import os
+import sys
+import uuid
+import shutil
+import logging
+import datetime
+import itertools
+import threading
+from subprocess import Popen, PIPE
+from concurrent.futures import ThreadPoolExecutor
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+PODMAN_STORAGE_OPTS = [
+    '--storage-opt', 'overlay.mount_program=/usr/bin/fuse-overlayfs',
+    '--storage-driver', 'overlay',
+]
+
+# Local name of the prebuilt images.
+POOL_REPOSITORY = 'localhost/quay-perf-pool'
+
+
+def run(cmd, stdin=None):
+    """
+    Run a command and return (success, stdout, stderr).
+    """
+    p = Popen(cmd, stdin=PIPE if stdin is not None else None, stdout=PIPE, stderr=PIPE)
+    output, errors = p.communicate(input=stdin)
+    return p.returncode == 0, output.decode(), errors.decode()
+
+
+class ImagePool:
+    """
+    A bounded pool of `size` distinct images built once, from which every
+    tag is pushed instead of building, pushing and deleting an image per
+    tag.
+
+    The images are built in parallel ahead of time. Tags are then pushed
+    round-robin from the pool, either with `podman push <pool image> <tag>`
+    straight from podman storage or, with the skopeo transport, with
+    `skopeo copy` from OCI layouts the pool is exported to. Only the push
+    is timed, so results measure the registry rather than local builds.
+    """
+
+    def __init__(self, size=10, base_image='', concurrency=4, transport='podman', layout_dir='/tmp/quay-perf-pool'):
+        """
+        :param size: number of distinct images in the pool
+        :param base_image: image the pool images are built from
+        :param concurrency: parallel builds
+        :param transport: podman or skopeo
+        :param layout_dir: directory of the OCI layouts the pool is exported to
+            for skopeo
+        """
+        assert transport in ('podman', 'skopeo'), "Unknown pool transport: %s" % transport
+        self.size = size
+        self.base_image = base_image or 'quay.io/jitesoft/alpine'
+        self.concurrency = concurrency
+        self.transport = transport
+        self.layout_dir = layout_dir
+        self.images = []
+        self.built = []
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def build_image(self, index):
+        """
+        Build one pool image and export it for skopeo when needed.
+
+        :return: the source to push it from, or None on failure
+        """
+        image = '%s:%s' % (POOL_REPOSITORY, index)
+        dockerfile = (
+            f"FROM {self.base_image}\n"
+            f"RUN echo {uuid.uuid4()} > /tmp/key.txt"
+        )
+        success, output, errors = run(['podman', 'build', '--tag', image] + PODMAN_STORAGE_OPTS +
+                                      ['--no-cache', '-f', '-'], dockerfile.encode('ascii'))
+        if not success:
+            logging.error(f"Failed to build pool image {image}")
+            logging.error(output)
+            logging.error(errors)
+            return None
+        with self.lock:
+            self.built.append(image)
+        if self.transport == 'podman':
+            return image
+
+        # One layout per image, so parallel exports don't race on the
+        # layout index.
+        source = 'oci:%s/%s:latest' % (self.layout_dir, index)
+        success, output, errors = run(['podman', 'push'] + PODMAN_STORAGE_OPTS + [image, source])
+        if not success:
+            logging.error(f"Failed to export pool image {image} to {source}")
+            logging.error(errors)
+            return None
+        return source
+
+    def build(self):
+        """
+        Build the pool in parallel.
+
+        :return: number of images in the pool
+        """
+        start_time = datetime.datetime.utcnow()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            self.images = [image for image in executor.map(self.build_image, range(self.size)) if image]
+        elapsed = (datetime.datetime.utcnow() - start_time).total_seconds()
+        logging.info(f"Built {len(self.images)}/{self.size} pool images in {elapsed:.1f}s")
+        if not self.images:
+            self.close()
+        assert self.images, "Failed to build any pool image"
+        return len(self.images)
+
+    def push_command(self, source, tag):
+        if self.transport == 'skopeo':
+            return ['skopeo', 'copy', '--dest-tls-verify=false', source, 'docker://%s' % tag]
+        return ['podman', 'push', '--tls-verify=false'] + PODMAN_STORAGE_OPTS + [source, 'docker://%s' % tag]
+
+    def push(self, tag, max_failures=3):
+        """
+        Push the next pool image to `tag`, retrying up to `max_failures`
+        times. Returns statistics dict matching the podman push results.
+        """
+        with self.lock:
+            source = self.images[next(self.counter) % len(self.images)]
+
+        failure_count = 0
+        success_count = 0
+        start_time = datetime.datetime.utcnow()
+        while failure_count < max_failures:
+            success, output, errors = run(self.push_command(source, tag))
+            if success:
+                success_count += 1
+                break
+            failure_count += 1
+            logging.info(f"Failed to push tag: {tag}")
+            logging.info(f"STDOUT: {output}")
+            logging.info(f"STDERR: {errors}")
+            logging.info(f"Retrying {failure_count}/{max_failures}")
+        end_time = datetime.datetime.utcnow()
+
+        return {
+            'tag': tag,
+            'targets': "image_pushes",
+            'engine': 'pool',
+            'source': source,
+            'elapsed_time': (end_time - start_time).total_seconds(),
+            'start_time': start_time,
+            'end_time': end_time,
+            'failure_count': failure_count,
+            'success_count': success_count,
+            'successful': success_count > 0,
+        }
+
+    def close(self):
+        """
+        Remove the pool images that were built and their OCI layouts.
+        """
+        for image in self.built:
+            run(['podman', 'rmi', '--force'] + PODMAN_STORAGE_OPTS + [image])
+        self.built = []
+        if self.transport == 'skopeo' and os.path.isdir(self.layout_dir):
+            shutil.rmtree(self.layout_dir, ignore_errors=True)
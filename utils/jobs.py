@@ -0,0 +1,100 @@
+import sys
+import logging
+from kubernetes import client, watch
+from kubernetes.client.rest import ApiException
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+
+def job_state(job):
+    """
+    Return True once the Job reached its completions, False once it
+    failed and None while it runs.
+    """
+    status = job.status
+    if status.completion_time or (job.spec.completions and (status.succeeded or 0) >= job.spec.completions):
+        return True
+    for condition in status.conditions or []:
+        if condition.status == 'True' and condition.type in ('Complete', 'Failed'):
+            if condition.type == 'Failed':
+                logging.error("Job %s failed: %s" % (job.metadata.name, condition.message))
+            return condition.type == 'Complete'
+    return None
+
+
+def log_pod_failures(namespace, job_name, seen):
+    """
+    Log why the failed pods of a Job not in `seen` failed.
+    """
+    pods = client.CoreV1Api().list_namespaced_pod(namespace, label_selector='job-name=%s' % job_name,
+                                                  field_selector='status.phase=Failed')
+    for pod in pods.items:
+        if pod.metadata.name in seen:
+            continue
+        seen.add(pod.metadata.name)
+        reasons = []
+        for container in pod.status.container_statuses or []:
+            terminated = container.state.terminated if container.state else None
+            if terminated:
+                reasons.append('%s exited with %s (%s) %s' % (container.name, terminated.exit_code,
+                                                              terminated.reason, terminated.message or ''))
+        logging.error("Pod %s of Job %s failed: %s" % (pod.metadata.name, job_name,
+                                                      '; '.join(reasons) or pod.status.reason))
+
+
+def wait_for_job(namespace, job_name, on_tick=None, tick_interval=10):
+    """
+    Block until the given Kubernetes Job has completed or failed.
+
+    The Job is followed with the watch API instead of being polled, so this
+    returns as soon as its completions are reached, and failed pods are
+    logged as soon as the Job counts them.
+
+    :param namespace: namespace of the job
+    :param job_name: name of the job
+    :param on_tick: optional callable(job) called about every
+        `tick_interval` seconds while the Job runs, e.g. to log progress
+    :param tick_interval: seconds between two calls of `on_tick`
+    :return: True if the job completed, False if it failed
+    """
+    job_api = client.BatchV1Api()
+    failed_pods = set()
+    failed = 0
+    resource_version = None
+    while True:
+        try:
+            if resource_version is None:
+                # Start from the current state, then follow the changes.
+                job = job_api.read_namespaced_job(name=job_name, namespace=namespace)
+                resource_version = job.metadata.resource_version
+                events = [{'type': 'MODIFIED', 'object': job}]
+            else:
+                # The server ends the stream after `tick_interval` seconds.
+                events = watch.Watch().stream(job_api.list_namespaced_job, namespace,
+                                              field_selector='metadata.name=%s' % job_name,
+                                              resource_version=resource_version, timeout_seconds=tick_interval)
+            for event in events:
+                job = event['object']
+                if event['type'] == 'ERROR':
+                    raise ApiException(status=event['raw_object'].get('code'),
+                                       reason=event['raw_object'].get('message'))
+                if event['type'] == 'DELETED':
+                    logging.error("Job %s was deleted before it completed." % (job_name))
+                    return False
+                resource_version = job.metadata.resource_version
+                if (job.status.failed or 0) > failed:
+                    failed = job.status.failed
+                    log_pod_failures(namespace, job_name, failed_pods)
+                state = job_state(job)
+                if state is not None:
+                    if state:
+                        logging.info("Job %s has been completed." % (job_name))
+                    return state
+        except ApiException as e:
+            if e.status != 410:
+                raise
+            # The watched version is too old, read the Job again.
+            resource_version = None
+            continue
+        if on_tick:
+            on_tick(job)
@@ -0,0 +1,103 @@
+import sys
+import logging
+import itertools
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+# Connection settings a matrix may vary and how their values are parsed.
+CONNECTION_OPTIONS = {
+    'connections': int,
+    'keepalive': lambda value: value.strip().lower() == 'true',
+    'http2': lambda value: value.strip().lower() == 'true',
+    'max_workers': int,
+}
+
+
+def parse_matrix(spec):
+    """
+    Parse a matrix such as "connections=10,100;keepalive=true,false" into
+    the list of every combination of the given settings, e.g.
+    [{'connections': 10, 'keepalive': True}, ...].
+    """
+    axes = []
+    for axis in spec.split(';'):
+        if not axis.strip():
+            continue
+        option, _, values = axis.partition('=')
+        option = option.strip().lower()
+        assert option in CONNECTION_OPTIONS, "Unknown connection option %s. Valid options: %s" % (
+            option, ', '.join(CONNECTION_OPTIONS))
+        parse = CONNECTION_OPTIONS[option]
+        axes.append([(option, parse(value)) for value in values.split(',') if value.strip()])
+    return [dict(cell) for cell in itertools.product(*axes)]
+
+
+def cell_name(settings):
+    """
+    Return a name usable in test names and file names for a set of
+    connection settings, e.g. connections_10_keepalive_true.
+    """
+    return '_'.join('%s_%s' % (option, str(value).lower()) for option, value in settings.items())
+
+
+class ConnectionMatrix:
+    """
+    Runs the same attack once for every combination of connection settings
+    (connections per host, keep-alive, HTTP/2, max workers) and compares
+    the results.
+
+    `attack_cell(settings)` must attack with the given settings and return
+    a Vegeta style JSON report.
+    """
+
+    def __init__(self, attack_cell, cells):
+        """
+        :param attack_cell: callable(settings) returning a Vegeta style report
+        :param cells: list of connection settings dicts, see `parse_matrix`
+        """
+        assert cells, "The connection matrix is empty"
+        self.attack_cell = attack_cell
+        self.cells = cells
+
+    def measure(self, settings):
+        report = self.attack_cell(settings)
+        return {
+            'name': cell_name(settings),
+            'settings': settings,
+            'requests': report['requests'],
+            'throughput': report['throughput'],
+            'success': report['success'],
+            'mean': report['latencies']['mean'] / 1e9,
+            'p50': report['latencies']['50th'] / 1e9,
+            'p99': report['latencies']['99th'] / 1e9,
+        }
+
+    def run(self):
+        """
+        Attack with every cell of the matrix.
+
+        :return: list with the results of every cell
+        """
+        return [self.measure(settings) for settings in self.cells]
+
+    @staticmethod
+    def table(results):
+        """
+        Render the results as a comparison table, best throughput first.
+        """
+        options = list(CONNECTION_OPTIONS)
+        header = options + ['requests', 'success', 'throughput', 'mean (ms)', 'p50 (ms)', 'p99 (ms)']
+        rows = []
+        for result in sorted(results, key=lambda result: -result['throughput']):
+            settings = result['settings']
+            rows.append([str(settings.get(option, '-')).lower() for option in options] + [
+                str(result['requests']),
+                '%.2f%%' % (result['success'] * 100),
+                '%.1f/s' % result['throughput'],
+                '%.1f' % (result['mean'] * 1000),
+                '%.1f' % (result['p50'] * 1000),
+                '%.1f' % (result['p99'] * 1000),
+            ])
+        widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+        return '\n'.join(' '.join(cell.rjust(width) for cell, width in zip(row, widths))
+                         for row in [header] + rows)
@@ -0,0 +1,538 @@
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import logging
+import datetime
+import tempfile
+import threading
+
+from utils.session import PooledSession, summarize_connection_stats
+from utils.tokens import TokenCache
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+# httpx logs every request at INFO, far too verbose under load.
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+MANIFEST_ACCEPT = 'application/vnd.docker.distribution.manifest.v2+json, application/vnd.oci.image.manifest.v1+json'
+
+# Size of the reads used when hashing a blob assembled from range segments.
+HASH_CHUNK_SIZE = 2 * 1024 * 1024
+
+# Per-thread read buffers reused by `hash_file`.
+_buffers = threading.local()
+
+
+class CorruptBlobError(Exception):
+    """
+    Raised when the content of a blob does not match its digest.
+    """
+
+
+def throughput(num_bytes, seconds):
+    """
+    Return (bytes/sec, MB/sec) for `num_bytes` transferred in `seconds`.
+    """
+    if seconds <= 0:
+        return 0.0, 0.0
+    return round(num_bytes / seconds, 2), round(num_bytes / seconds / 1e6, 3)
+
+
+def hash_file(f):
+    """
+    Return the sha256 digest of a file object's content. The file is read
+    into a buffer allocated once per thread and hashed in place.
+    """
+    if not hasattr(_buffers, 'view'):
+        _buffers.view = memoryview(bytearray(HASH_CHUNK_SIZE))
+    view = _buffers.view
+    f.seek(0)
+    sha = hashlib.sha256()
+    while True:
+        n = f.readinto(view)
+        if not n:
+            break
+        sha.update(view[:n])
+    return 'sha256:' + sha.hexdigest()
+
+
+def verify_digest(digest, blob_digest, layer):
+    """
+    Compare the digest computed while downloading with the requested one,
+    counting mismatches in the layer record. Only sha256 digests are
+    verified.
+    """
+    layer['verified'] = digest.startswith('sha256:')
+    if layer['verified'] and blob_digest != digest:
+        layer['corrupted'] += 1
+        raise CorruptBlobError(f"Digest mismatch: got {blob_digest}")
+
+
+def redirect_url(response):
+    """
+    Return the absolute URL a redirect response points to.
+    """
+    return str(response.url.join(response.headers['Location']))
+
+
+class AsyncPuller:
+    """
+    Pulls images over HTTP (no local storage) on a single asyncio event
+    loop instead of a thread per image and per layer.
+
+    Up to `concurrency` images are pulled at once, each fetching up to
+    `layer_parallelism` layers at once, and `max_in_flight` bounds the
+    requests in flight across all images. Connections are pooled and kept
+    alive, and tokens come from a TokenCache shared by all images.
+    """
+
+    def __init__(self, username=None, password=None, concurrency=10, layer_parallelism=6, max_in_flight=None,
+                 token_cache=None, max_failures=3, max_token_refresh=3, timeout=300,
+                 range_segments=0, range_min_size=64 * 1024 * 1024):
+        """
+        :param username: registry username
+        :param password: registry password
+        :param concurrency: images pulled concurrently
+        :param layer_parallelism: layers of an image fetched concurrently
+        :param max_in_flight: requests in flight across all images
+            (`concurrency * layer_parallelism` by default)
+        :param token_cache: optional TokenCache shared with other pullers
+        :param max_failures: attempts per layer
+        :param max_token_refresh: token refreshes per manifest or layer on 401
+        :param timeout: per-request timeout in seconds
+        :param range_segments: download blobs as this many parallel byte
+            ranges (disabled below 2)
+        :param range_min_size: smallest blob (bytes) downloaded in ranges
+        """
+        assert httpx, "httpx is not installed. Required for the pull engine."
+        self.concurrency = concurrency
+        self.layer_parallelism = layer_parallelism
+        self.max_in_flight = max_in_flight or concurrency * layer_parallelism
+        # Token requests are sent from threads, over their own pooled session.
+        self.token_cache = token_cache or TokenCache(username, password, PooledSession(concurrency))
+        self.max_failures = max_failures
+        self.max_token_refresh = max_token_refresh
+        self.timeout = timeout
+        self.range_segments = range_segments
+        self.range_min_size = range_min_size
+        self.hosts = {}
+        self.client = None
+        self.in_flight = None
+        self.loop = None
+        self.loop_thread = None
+
+    def tracer(self, host):
+        """
+        Return an httpcore trace callback counting the connections opened to
+        `host`.
+        """
+        async def trace(event_name, info):
+            if event_name == 'connection.connect_tcp.complete':
+                self.hosts[host]['connections'] += 1
+        return trace
+
+    async def request(self, method, url, headers, stream=False, follow_redirects=False):
+        """
+        Send a request, counting it in the connection stats. Streamed
+        responses must be closed by the caller.
+        """
+        host = httpx.URL(url).netloc.decode('ascii')
+        stats = self.hosts.setdefault(host, {'requests': 0, 'connections': 0})
+        stats['requests'] += 1
+        request = self.client.build_request(method, url, headers=headers, extensions={'trace': self.tracer(host)})
+        return await self.client.send(request, stream=stream, follow_redirects=follow_redirects)
+
+    async def token(self, registry, repository):
+        return await asyncio.to_thread(self.token_cache.get, registry, repository)
+
+    async def refresh_token(self, registry, repository, token):
+        return await asyncio.to_thread(self.token_cache.invalidate, registry, repository, 'pull', token)
+
+    async def get_manifest(self, registry, repository, tag, token):
+        """
+        Fetch the manifest for a given image tag.
+        On 401 (expired token), refreshes the auth token and retries.
+        Returns (layers, current_token) tuple, where layers are (digest,
+        size) pairs and the size is None for schema 1 manifests.
+        """
+        url = f"https://{registry}/v2/{repository}/manifests/{tag}"
+        for refresh in range(self.max_token_refresh + 1):
+            headers = {'Accept': MANIFEST_ACCEPT}
+            if token:
+                headers['Authorization'] = f'Bearer {token}'
+            try:
+                async with self.in_flight:
+                    response = await self.request('GET', url, headers, follow_redirects=True)
+                logging.debug(f"Fetching manifest for {tag}, HTTP {response.status_code}")
+                if response.status_code == 401 and refresh < self.max_token_refresh:
+                    token = await self.refresh_token(registry, repository, token) or token
+                    logging.info(f"Manifest {tag} got 401, token refreshed (refresh {refresh + 1}/{self.max_token_refresh})")
+                    continue
+                response.raise_for_status()
+                manifest = response.json()
+            except Exception as e:
+                logging.error(f"Failed to get manifest for {tag}: {e}")
+                return [], token
+
+            if 'layers' in manifest:
+                return [(layer['digest'], layer.get('size')) for layer in manifest['layers']], token
+            elif 'fsLayers' in manifest:  # Older manifest format
+                return [(layer['blobSum'], None) for layer in manifest['fsLayers']], token
+            return [], token
+        return [], token
+
+    async def fetch_layer(self, registry, repository, digest, size=None):
+        """
+        Attempt to download a single layer up to `max_failures` times.
+        Every attempt takes the current token from the token cache. On 401
+        (expired token), refreshes the auth token and retries without
+        consuming a retry attempt. Blobs of at least `range_min_size` bytes
+        (by their `size` in the manifest) are downloaded in `range_segments`
+        parallel ranges when enabled; their range support is probed once,
+        before the first attempt.
+
+        The sha256 of the blob is verified against its digest; a mismatch
+        is counted in `corrupted` and fails the attempt.
+
+        When the registry redirects the blob to object storage, the time
+        the registry took to answer with the redirect (`redirect_time`) is
+        recorded apart from the storage download, and the storage is
+        requested without the registry's Authorization header.
+
+        Returns the layer record: the storage host that served the blob,
+        bytes received, time to first byte (until the storage response
+        headers arrived), download time (from the headers to the last byte),
+        storage time (both together) and throughput of the last attempt, and
+        whether the layer was fetched successfully.
+        """
+        url = f"https://{registry}/v2/{repository}/blobs/{digest}"
+        layer = {'digest': digest, 'bytes': 0, 'redirect_time': 0.0, 'storage_host': registry,
+                 'ttfb': 0.0, 'download_time': 0.0, 'storage_time': 0.0, 'attempts': 0, 'corrupted': 0,
+                 'successful': False}
+        blob = None
+        if self.range_segments > 1 and size is not None and size >= self.range_min_size:
+            try:
+                blob = await self.probe_ranges(url, registry, repository, layer)
+            except Exception as e:
+                logging.warning(f"Layer {digest} range probe failed, downloading it whole: {e}")
+        token_refresh_count = 0
+        attempt = 0
+        while attempt < self.max_failures:
+            attempt += 1
+            layer['attempts'] = attempt
+            try:
+                if blob and blob[2] >= self.range_min_size:
+                    await self.fetch_segmented(*blob, registry, repository, digest, layer)
+                    layer['successful'] = True
+                    logging.info(f"Layer {digest} succeeded on attempt {attempt} "
+                                 f"({layer['segments']} ranges, {layer['range_retries']} range retries)")
+                    return layer
+
+                token = await self.token(registry, repository)
+                async with self.in_flight:
+                    sent = time.monotonic()
+                    response = await self.request('GET', url, {'Authorization': f'Bearer {token}'}, stream=True)
+                    headers = time.monotonic()
+                    try:
+                        logging.debug(f"Fetching layer {digest}, attempt {attempt}, HTTP {response.status_code}")
+                        if response.status_code == 401 and token_refresh_count < self.max_token_refresh:
+                            token_refresh_count += 1
+                            await self.refresh_token(registry, repository, token)
+                            logging.info(f"Layer {digest} got 401, token refreshed "
+                                         f"(refresh {token_refresh_count}/{self.max_token_refresh})")
+                            attempt -= 1
+                            continue
+                        layer['redirect_time'] = 0.0
+                        if response.is_redirect:
+                            await response.aclose()
+                            layer['redirect_time'] = round(headers - sent, 6)
+                            sent = time.monotonic()
+                            response = await self.request('GET', redirect_url(response), {}, stream=True)
+                            headers = time.monotonic()
+                        layer['storage_host'] = response.url.netloc.decode('ascii')
+                        response.raise_for_status()
+                        layer['bytes'] = 0
+                        layer['ttfb'] = round(headers - sent, 6)
+                        # Hash the raw body chunks as they arrive, without
+                        # buffering or decoding them.
+                        sha = hashlib.sha256()
+                        async for chunk in response.aiter_raw():
+                            layer['bytes'] += len(chunk)
+                            sha.update(chunk)
+                        layer['download_time'] = round(time.monotonic() - headers, 6)
+                        layer['storage_time'] = round(layer['ttfb'] + layer['download_time'], 6)
+                    finally:
+                        await response.aclose()
+                layer['bytes_per_sec'], layer['mb_per_sec'] = throughput(layer['bytes'], layer['download_time'])
+                verify_digest(digest, 'sha256:' + sha.hexdigest(), layer)
+                layer['successful'] = True
+                logging.info(f"Layer {digest} succeeded on attempt {attempt} (HTTP {response.status_code})")
+                return layer
+            except Exception as e:
+                logging.warning(f"Layer {digest} attempt {attempt} failed: {e}")
+                if attempt >= self.max_failures:
+                    logging.error(f"Layer {digest} failed after {self.max_failures} attempts: {e}")
+                    return layer
+        return layer
+
+    async def probe_ranges(self, url, registry, repository, layer):
+        """
+        Request the first byte of the blob, following the registry's
+        redirect to object storage by hand. The responses are streamed and
+        closed unread, so a server ignoring the Range header does not send
+        the whole blob.
+
+        :return: (blob_url, authenticated, size) where range requests should
+            be sent, or None when ranges are not supported
+        """
+        token = await self.token(registry, repository)
+        headers = {'Authorization': f'Bearer {token}', 'Range': 'bytes=0-0'}
+        async with self.in_flight:
+            sent = time.monotonic()
+            response = await self.request('GET', url, headers, stream=True)
+            layer['redirect_time'] = 0.0
+            authenticated = not response.is_redirect
+            if response.is_redirect:
+                await response.aclose()
+                layer['redirect_time'] = round(time.monotonic() - sent, 6)
+                url = redirect_url(response)
+                response = await self.request('GET', url, {'Range': 'bytes=0-0'}, stream=True)
+            await response.aclose()
+        layer['storage_host'] = response.url.netloc.decode('ascii')
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        if response.status_code != 206 or not total.isdigit():
+            return None
+        return url, authenticated, int(total)
+
+    async def fetch_segmented(self, url, authenticated, size, registry, repository, digest, layer):
+        """
+        Download the blob as parallel byte ranges into a temporary file and
+        verify the sha256 of the whole blob. Every range is retried on its
+        own. Raises when a range keeps failing or the digest does not match.
+        """
+        segments = min(self.range_segments, size)
+        bounds = [(size * n // segments, size * (n + 1) // segments - 1) for n in range(segments)]
+        layer.update({'segments': segments, 'range_retries': 0, 'ttfb': None, 'bytes': 0})
+        with tempfile.TemporaryFile() as f:
+            os.ftruncate(f.fileno(), size)
+            start = time.monotonic()
+            ranges = [asyncio.ensure_future(self.fetch_range(url, authenticated, registry, repository, f.fileno(),
+                                                             first, last, start, layer))
+                      for first, last in bounds]
+            try:
+                await asyncio.gather(*ranges)
+            except BaseException:
+                # Stop the other ranges before the file they write to is closed.
+                for task in ranges:
+                    task.cancel()
+                await asyncio.gather(*ranges, return_exceptions=True)
+                raise
+            layer['storage_time'] = round(time.monotonic() - start, 6)
+            layer['download_time'] = round(layer['storage_time'] - layer['ttfb'], 6)
+            verify_start = time.monotonic()
+            blob_digest = await asyncio.to_thread(hash_file, f)
+            layer['verify_time'] = round(time.monotonic() - verify_start, 6)
+        layer['bytes_per_sec'], layer['mb_per_sec'] = throughput(layer['bytes'], layer['download_time'])
+        verify_digest(digest, blob_digest, layer)
+
+    async def fetch_range(self, url, authenticated, registry, repository, fd, first, last, start, layer):
+        """
+        Download bytes `first`-`last` of the blob into the file `fd` at the
+        same offset, retrying the range up to `max_failures` times. Only
+        `authenticated` (registry) URLs get a bearer token; object storage
+        URLs are signed.
+        """
+        token_refresh_count = 0
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                headers = {'Range': f'bytes={first}-{last}'}
+                if authenticated:
+                    token = await self.token(registry, repository)
+                    headers['Authorization'] = f'Bearer {token}'
+                async with self.in_flight:
+                    response = await self.request('GET', url, headers, stream=True)
+                    try:
+                        ttfb = round(time.monotonic() - start, 6)
+                        if layer['ttfb'] is None or ttfb < layer['ttfb']:
+                            layer['ttfb'] = ttfb
+                        if (authenticated and response.status_code == 401
+                                and token_refresh_count < self.max_token_refresh):
+                            token_refresh_count += 1
+                            await self.refresh_token(registry, repository, token)
+                            attempt -= 1
+                            continue
+                        response.raise_for_status()
+                        if response.status_code != 206:
+                            raise ValueError(f"Range request answered with HTTP {response.status_code}")
+                        offset = first
+                        async for chunk in response.aiter_raw():
+                            os.pwrite(fd, chunk, offset)
+                            offset += len(chunk)
+                    finally:
+                        await response.aclose()
+                if offset != last + 1:
+                    raise ValueError(f"Range ended at byte {offset} instead of {last + 1}")
+                layer['bytes'] += offset - first
+                return
+            except Exception as e:
+                if attempt >= self.max_failures:
+                    raise
+                layer['range_retries'] += 1
+                logging.warning(f"Layer {layer['digest']} range {first}-{last} attempt {attempt} failed: {e}")
+
+    async def pull_image(self, tag):
+        """
+        Pull the layers of a single image with per-layer retries.
+        Returns a dict matching the ES schema of the pull results.
+        """
+        # parse registry/repository:tag
+        try:
+            registry, repo_tag = tag.split('/', 1)
+            repository, image_tag = repo_tag.rsplit(':', 1)
+        except Exception:
+            logging.info(f"Malformed tag: {tag}")
+            return None
+
+        start_time = datetime.datetime.utcnow()
+        result = {
+            'tag': tag,
+            'targets': "image_pulls",
+            'start_time': start_time,
+            'success_count': 0,
+            'failure_count': 1,
+            'successful': False,
+        }
+
+        # get token and manifest
+        auth_start = time.monotonic()
+        try:
+            token = await self.token(registry, repository)
+        except Exception as e:
+            logging.info(f"Auth/token retrieval failed for {tag}: {e}")
+            return dict(result, elapsed_time=0.0, end_time=datetime.datetime.utcnow())
+        result['auth_time'] = round(time.monotonic() - auth_start, 4)
+
+        manifest_start = time.monotonic()
+        blobs, token = await self.get_manifest(registry, repository, image_tag, token)
+        digests = [digest for digest, _ in blobs]
+        result['manifest_time'] = round(time.monotonic() - manifest_start, 6)
+        if not digests:
+            end_time = datetime.datetime.utcnow()
+            return dict(result, elapsed_time=(end_time - start_time).total_seconds(), end_time=end_time)
+
+        layer_slots = asyncio.Semaphore(self.layer_parallelism)
+
+        async def fetch(digest, size):
+            async with layer_slots:
+                return await self.fetch_layer(registry, repository, digest, size)
+
+        layers = await asyncio.gather(*(fetch(digest, size) for digest, size in blobs))
+        failure_count = sum(1 for layer in layers if not layer['successful'])
+
+        end_time = datetime.datetime.utcnow()
+        elapsed_time = (end_time - start_time).total_seconds()
+        layers_succeeded = len(digests) - failure_count
+        layers_per_sec = layers_succeeded / elapsed_time if elapsed_time > 0 else 0.0
+        num_bytes = sum(layer['bytes'] for layer in layers)
+        bytes_per_sec, mb_per_sec = throughput(num_bytes, elapsed_time)
+        result.update({
+            'elapsed_time': elapsed_time,
+            'end_time': end_time,
+            'success_count': 1 if failure_count == 0 else 0,
+            'failure_count': failure_count,
+            'successful': failure_count == 0,
+            'layers_per_sec': round(layers_per_sec, 2),
+            'bytes': num_bytes,
+            'bytes_per_sec': bytes_per_sec,
+            'mb_per_sec': mb_per_sec,
+            'corrupted_layers': sum(1 for layer in layers if layer['corrupted']),
+            'layers': layers,
+        })
+        return result
+
+    async def pull(self, tags, on_result=None):
+        """
+        Pull all the tags, `concurrency` images at a time. A tag is only
+        taken from `tags` when a worker is free, so it can be a lazy
+        iterator such as a queue being drained.
+
+        :param on_result: optional callback receiving every result as soon
+            as its image is done
+        :return: list of results in completion order (None for malformed tags)
+        """
+        tags = iter(tags)
+        next_lock = asyncio.Lock()
+        results = []
+
+        async def next_tag():
+            # Taking a tag may block on the queue, so do it off the loop.
+            async with next_lock:
+                return await asyncio.to_thread(next, tags, None)
+
+        async def worker():
+            while (tag := await next_tag()) is not None:
+                result = await self.pull_image(tag)
+                results.append(result)
+                if on_result:
+                    on_result(result)
+
+        async with self.open():
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return results
+
+    def open(self):
+        """
+        Create the connection pool of a run. The returned client closes it
+        when exited.
+        """
+        self.in_flight = asyncio.Semaphore(self.max_in_flight)
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        self.client = httpx.AsyncClient(verify=False, limits=limits, timeout=self.timeout)
+        return self.client
+
+    def run(self, tags, on_result=None):
+        """
+        Pull all the tags on a new event loop and block until done.
+        """
+        return asyncio.run(self.pull(tags, on_result))
+
+    def start(self):
+        """
+        Run an event loop in a background thread, so that images can be
+        pulled one at a time with `pull_one` from any thread while sharing
+        one connection pool, until `close`.
+        """
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.loop_thread.start()
+        self.open()
+
+    def pull_one(self, tag):
+        """
+        Pull a single image on the loop of `start` and block until done.
+        """
+        return asyncio.run_coroutine_threadsafe(self.pull_image(tag), self.loop).result()
+
+    def close(self):
+        """
+        Close the connection pool and stop the loop of `start`.
+        """
+        asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+        self.loop.close()
+
+    def connection_stats(self):
+        """
+        Return how many requests were sent and how many connections had to
+        be opened for them, in total and per host.
+        """
+        return summarize_connection_stats({host: dict(stats) for host, stats in self.hosts.items()})
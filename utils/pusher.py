@@ -0,0 +1,300 @@
+import io
+import sys
+import gzip
+import time
+import uuid
+import logging
+import tarfile
+import datetime
+from urllib.parse import urlencode, urljoin
+
+from utils.imagegen import DOCKER_MEDIA_TYPES, SyntheticLayer, image_config, image_manifest, sha256_digest
+from utils.session import PooledSession
+from utils.tokens import TokenCache
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+# Token scope needed to upload blobs and manifests.
+PUSH_SCOPE = 'push,pull'
+
+
+def synthesize_layer():
+    """
+    Return a gzipped tar layer holding a unique /tmp/key.txt, like the one
+    `podman build` creates for the pushed images, and its diff_id.
+    """
+    content = str(uuid.uuid4()).encode('ascii') + b'\n'
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w') as tar:
+        info = tarfile.TarInfo('tmp/key.txt')
+        info.size = len(content)
+        tar.addfile(info, io.BytesIO(content))
+    diff = buf.getvalue()
+    return gzip.compress(diff, mtime=0), sha256_digest(diff)
+
+
+def rechunk(chunks, size):
+    """
+    Regroup a stream of chunks into (offset, chunk) pairs of `size` bytes,
+    the last one possibly shorter.
+    """
+    buf = bytearray()
+    offset = 0
+    for chunk in chunks:
+        buf += chunk
+        while len(buf) >= size:
+            yield offset, bytes(buf[:size])
+            del buf[:size]
+            offset += size
+    if buf:
+        yield offset, bytes(buf)
+
+
+class StreamedBody:
+    """
+    Request body streamed from a synthetic layer. Its length is known, so
+    it is sent with a Content-Length instead of chunked transfer encoding,
+    and it can be iterated again when a request is retried.
+    """
+
+    def __init__(self, layer):
+        self.layer = layer.describe()
+
+    def __iter__(self):
+        return self.layer.stream()
+
+    def __len__(self):
+        return self.layer.blob_size
+
+
+class NativePusher:
+    """
+    Pushes synthesized images straight to the registry's distribution API
+    (`/v2/<repo>/blobs/uploads/` and `/v2/<repo>/manifests/<tag>`) instead of
+    running podman build, push and rmi for every tag.
+
+    Blobs are uploaded either monolithically (POST then a PUT with the
+    content) or in chunks (POST, a PATCH per `chunk_size` bytes, then an
+    empty PUT). All threads share a pool of keep-alive connections and one
+    token per repository. The time spent in every step is recorded.
+
+    Without a `generator` every image is a single small unique layer like
+    the one `podman build` creates. With an `ImageGenerator`, images get
+    its layer count and sizes, and layers are streamed to the registry as
+    they are generated.
+
+    With `dedup`, layers are pushed the way clients push shared base
+    layers: a HEAD checks whether the repository already has the layer,
+    then the layer is mounted from a repository it was seen in, and only
+    uploaded when both fail. The bytes uploaded and skipped and the
+    latency of every mount are recorded.
+    """
+
+    def __init__(self, username=None, password=None, concurrency=4, upload_mode='monolithic',
+                 chunk_size=5 * 1024 * 1024, max_token_refresh=3, generator=None, dedup=False):
+        """
+        :param username: registry username
+        :param password: registry password
+        :param concurrency: threads pushing through this pusher
+        :param upload_mode: monolithic or chunked
+        :param chunk_size: bytes per PATCH of chunked uploads
+        :param max_token_refresh: token refreshes per request on 401
+        :param generator: optional ImageGenerator of the pushed images
+        :param dedup: check for existing layers and mount them across
+            repositories before uploading
+        """
+        assert upload_mode in ('monolithic', 'chunked'), "Unknown upload mode: %s" % upload_mode
+        self.upload_mode = upload_mode
+        self.chunk_size = chunk_size
+        self.max_token_refresh = max_token_refresh
+        self.generator = generator
+        self.dedup = dedup
+        # Repository each layer digest is known to exist in, to mount it from.
+        self.blob_repositories = {}
+        self.session = PooledSession(concurrency)
+        self.token_cache = TokenCache(username, password, self.session)
+
+    def send(self, method, url, registry, repository, steps, step, headers=None, data=None, allow=(),
+             mount_from=None):
+        """
+        Send an authenticated request, refreshing the token on 401, and add
+        its duration to `steps[step]`. Error statuses in `allow` are
+        returned instead of raised.
+        """
+        token = self.token_cache.get(registry, repository, PUSH_SCOPE, mount_from)
+        for refresh in range(self.max_token_refresh + 1):
+            start = time.monotonic()
+            response = self.session.request(method, url, data=data, verify=False,
+                                            headers=dict(headers or {}, Authorization=f'Bearer {token}'))
+            steps[step] = steps.get(step, 0.0) + time.monotonic() - start
+            if response.status_code == 401 and refresh < self.max_token_refresh:
+                token = self.token_cache.invalidate(registry, repository, PUSH_SCOPE, token, mount_from) or token
+                continue
+            if response.status_code not in allow:
+                response.raise_for_status()
+            return response
+        return response
+
+    def upload_blob(self, registry, repository, blob, steps, transfer, location=None):
+        """
+        Upload a blob, either bytes or a SyntheticLayer streamed as it is
+        generated, with the configured upload mode. An upload already
+        started at `location` is continued instead of initiating one.
+
+        :return: (digest, size) of the blob
+        """
+        base = f"https://{registry}"
+        if location is None:
+            response = self.send('POST', f"{base}/v2/{repository}/blobs/uploads/", registry, repository,
+                                 steps, 'initiate')
+            location = urljoin(base, response.headers['Location'])
+
+        streamed = isinstance(blob, SyntheticLayer)
+        if self.upload_mode == 'chunked':
+            for offset, chunk in rechunk(blob.stream() if streamed else (blob,), self.chunk_size):
+                headers = {
+                    'Content-Type': 'application/octet-stream',
+                    'Content-Range': '%s-%s' % (offset, offset + len(chunk) - 1),
+                }
+                response = self.send('PATCH', location, registry, repository, steps, 'patch', headers, chunk)
+                location = urljoin(base, response.headers['Location'])
+            body = b''
+        else:
+            # The digest of a monolithic upload is needed up front, so
+            # synthetic layers are generated once to hash them.
+            body = StreamedBody(blob) if streamed else blob
+
+        digest, size = (blob.digest, blob.blob_size) if streamed else (sha256_digest(blob), len(blob))
+        location += ('&' if '?' in location else '?') + urlencode({'digest': digest})
+        self.send('PUT', location, registry, repository, steps, 'put',
+                  {'Content-Type': 'application/octet-stream'}, body)
+        transfer['bytes_uploaded'] += size
+        return digest, size
+
+    def ensure_layer(self, registry, repository, layer, steps, transfer):
+        """
+        Make a SyntheticLayer available in `repository`: skip it when a HEAD
+        finds it there already, else mount it from a repository it is known
+        to exist in, and upload it when neither works. A repository is only
+        used as a mount source once the layer was found, mounted or uploaded
+        there, so concurrent pushes of a new layer upload it rather than
+        mount it from an upload still in progress.
+
+        :return: (digest, size) of the layer
+        """
+        base = f"https://{registry}"
+        digest, size = layer.describe().digest, layer.blob_size
+        response = self.send('HEAD', f"{base}/v2/{repository}/blobs/{digest}", registry, repository,
+                             steps, 'head', allow=(404,))
+        if response.status_code == 200:
+            self.blob_repositories.setdefault(digest, repository)
+            transfer['layers_existing'] += 1
+            transfer['bytes_skipped'] += size
+            return digest, size
+
+        location = None
+        source = self.blob_repositories.get(digest)
+        if source is not None and source != repository:
+            query = urlencode({'mount': digest, 'from': source})
+            start = time.monotonic()
+            response = self.send('POST', f"{base}/v2/{repository}/blobs/uploads/?{query}", registry, repository,
+                                 steps, 'mount', mount_from=source)
+            transfer['mount_times'].append(round(time.monotonic() - start, 6))
+            if response.status_code == 201:
+                self.blob_repositories.setdefault(digest, repository)
+                transfer['layers_mounted'] += 1
+                transfer['bytes_skipped'] += size
+                return digest, size
+            # The registry could not mount the layer and started a regular
+            # upload instead.
+            transfer['mount_failures'] += 1
+            location = urljoin(base, response.headers['Location'])
+        blob = self.upload_blob(registry, repository, layer, steps, transfer, location)
+        self.blob_repositories.setdefault(digest, repository)
+        return blob
+
+    def push_image(self, registry, repository, image_tag, steps, transfer):
+        """
+        Upload the layers, the config and the manifest of one image.
+
+        :return: size of the image in bytes
+        """
+        if self.generator:
+            image = self.generator.image(f"{repository}:{image_tag}")
+            upload_layer = self.ensure_layer if self.dedup else self.upload_blob
+            layers = [upload_layer(registry, repository, layer, steps, transfer) for layer in image.layers]
+            config = image.config()
+            manifest = image.manifest(config)
+            media_type = image.media_types['manifest']
+        else:
+            layer, diff_id = synthesize_layer()
+            config = image_config([diff_id])
+            layers = [self.upload_blob(registry, repository, layer, steps, transfer)]
+            manifest = image_manifest(config, layers)
+            media_type = DOCKER_MEDIA_TYPES['manifest']
+        transfer['layers_uploaded'] = len(layers) - transfer['layers_existing'] - transfer['layers_mounted']
+        self.upload_blob(registry, repository, config, steps, transfer)
+
+        self.send('PUT', f"https://{registry}/v2/{repository}/manifests/{image_tag}", registry, repository,
+                  steps, 'manifest_put', {'Content-Type': media_type}, manifest)
+        return sum(size for _, size in layers) + len(config) + len(manifest)
+
+    def push(self, tag, max_failures=3):
+        """
+        Push a single image, retrying up to `max_failures` times.
+        Returns statistics dict matching the podman push results.
+        """
+        try:
+            registry, repo_tag = tag.split('/', 1)
+            repository, image_tag = repo_tag.rsplit(':', 1)
+        except ValueError:
+            logging.info(f"Malformed tag: {tag}")
+            return None
+
+        failure_count = 0
+        success_count = 0
+        steps = {}
+        transfer = {}
+        num_bytes = 0
+        start_time = datetime.datetime.utcnow()
+        while failure_count < max_failures:
+            steps = {}
+            transfer = {
+                'bytes_uploaded': 0,
+                'bytes_skipped': 0,
+                'layers_uploaded': 0,
+                'layers_existing': 0,
+                'layers_mounted': 0,
+                'mount_failures': 0,
+                'mount_times': [],
+            }
+            try:
+                num_bytes = self.push_image(registry, repository, image_tag, steps, transfer)
+                success_count += 1
+                break
+            except Exception as e:
+                failure_count += 1
+                logging.info(f"Failed to push tag: {tag}: {e}")
+                logging.info(f"Retrying {failure_count}/{max_failures}")
+        end_time = datetime.datetime.utcnow()
+
+        return {
+            'tag': tag,
+            'targets': "image_pushes",
+            'engine': 'native',
+            'elapsed_time': (end_time - start_time).total_seconds(),
+            'start_time': start_time,
+            'end_time': end_time,
+            'failure_count': failure_count,
+            'success_count': success_count,
+            'successful': success_count > 0,
+            'bytes': num_bytes,
+            'steps': {step: round(seconds, 6) for step, seconds in steps.items()},
+            **transfer,
+        }
+
+    def connection_stats(self):
+        return self.session.connection_stats()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,54 @@
+from utils.histogram import LatencyHistogram
+
+# Transfer counters of natively pushed images, see `NativePusher.push`.
+TRANSFER_COUNTERS = ('bytes_uploaded', 'bytes_skipped', 'layers_uploaded', 'layers_existing', 'layers_mounted',
+                     'mount_failures')
+
+
+class PushStats:
+    """
+    Running summary of push results.
+
+    Results are added one at a time into counters and histograms, so a
+    push pod keeps the same memory whatever the number of images it
+    pushes: the results themselves only travel through the result stream.
+    """
+
+    def __init__(self):
+        self.durations = LatencyHistogram()
+        self.total = 0
+        self.successful = 0
+        self.steps = {}
+        self.mount_times = LatencyHistogram()
+        self.transfer = dict.fromkeys(TRANSFER_COUNTERS, 0)
+
+    def add(self, result):
+        self.total += 1
+        if result.get('successful'):
+            self.successful += 1
+        self.durations.record(result['elapsed_time'])
+        # Time spent in every registry API step (upload initiation, PATCH,
+        # PUT, manifest PUT, blob HEAD and mount) of natively pushed images.
+        for step, seconds in result.get('steps', {}).items():
+            self.steps.setdefault(step, LatencyHistogram()).record(seconds)
+        # Bytes uploaded and skipped thanks to existing or mounted layers.
+        for seconds in result.get('mount_times', []):
+            self.mount_times.record(seconds)
+        for counter in TRANSFER_COUNTERS:
+            self.transfer[counter] += result.get(counter, 0)
+
+    def summary(self, native=True):
+        """
+        Return the push summary; the step and transfer stats only when
+        `native`.
+        """
+        summary = {
+            'durations': self.durations.summary(),
+            'total': self.total,
+            'successful': self.successful,
+            'failed': self.total - self.successful,
+        }
+        if native:
+            summary['steps'] = {step: histogram.summary() for step, histogram in self.steps.items()}
+            summary['transfer'] = dict(self.transfer, mount_times=self.mount_times.summary())
+        return summary
@@ -0,0 +1,124 @@
+import json
+import time
+import datetime
+
+import redis
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def encode_default(o):
+    return o.isoformat() if isinstance(o, datetime.datetime) else str(o)
+
+
+def encode(result):
+    """
+    Encode a result as the fields of a stream entry: msgpack when it is
+    installed, JSON otherwise.
+    """
+    if msgpack is not None:
+        return {'m': msgpack.packb(result, default=encode_default)}
+    return {'j': json.dumps(result, default=encode_default)}
+
+
+def decode(fields):
+    if b'm' in fields:
+        assert msgpack is not None, "msgpack is required to decode these results"
+        return msgpack.unpackb(fields[b'm'], raw=False)
+    return json.loads(fields[b'j'])
+
+
+class ResultStream:
+    """
+    Redis Stream of the per-image results of the push or pull pods.
+
+    Pods add results as their images complete and write them with one
+    pipelined XADD per `batch_size` results, or as soon as `flush_interval`
+    elapsed since the last write, so a pod that dies only loses the results
+    of about its last second. The controller reads them through a
+    consumer group in batches of thousands and acknowledges them once they
+    are saved. Results it read but did not acknowledge before crashing are
+    read again on the next collection (at-least-once).
+    """
+
+    def __init__(self, redis_client, key, group='controller', batch_size=100, flush_interval=1.0):
+        """
+        :param redis_client: Redis client
+        :param key: key of the stream
+        :param group: consumer group of the controller
+        :param batch_size: results per pipelined write
+        :param flush_interval: seconds after which buffered results are written
+        """
+        self.redis = redis_client
+        self.key = key
+        self.group = group
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def reset(self):
+        """
+        Drop stale results and create the consumer group.
+        """
+        self.redis.delete(self.key)
+        try:
+            self.redis.xgroup_create(self.key, self.group, id='0', mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            # Another controller process created the group already.
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def add(self, result):
+        self.buffer.append(result)
+        if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered results in one round trip.
+        """
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        pipeline = self.redis.pipeline(transaction=False)
+        for result in self.buffer:
+            pipeline.xadd(self.key, encode(result))
+        pipeline.execute()
+        self.buffer = []
+
+    def collect(self, consumer='controller', count=5000):
+        """
+        Read every result not acknowledged yet: first the ones this
+        consumer read before without acknowledging them, then the new ones.
+
+        :return: (results, entry ids to acknowledge once they are saved)
+        """
+        results = []
+        ids = []
+        for start in ('0', '>'):
+            while True:
+                response = self.redis.xreadgroup(self.group, consumer, {self.key: start}, count=count)
+                entries = response[0][1] if response else []
+                if not entries:
+                    break
+                for entry_id, fields in entries:
+                    ids.append(entry_id)
+                    if fields:
+                        results.append(decode(fields))
+                if start != '>':
+                    # Page through the pending entries.
+                    start = entries[-1][0]
+        return results, ids
+
+    def ack(self, ids, chunk_size=5000):
+        """
+        Acknowledge collected results.
+        """
+        pipeline = self.redis.pipeline(transaction=False)
+        for i in range(0, len(ids), chunk_size):
+            pipeline.xack(self.key, self.group, *ids[i:i + chunk_size])
+        pipeline.execute()
@@ -0,0 +1,110 @@
+import sys
+import math
+import logging
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+
+class SaturationSearch:
+    """
+    Finds the highest request rate an endpoint sustains within its SLOs.
+
+    `attack_step(rate)` must attack at the given rate for a fixed duration
+    and return a Vegeta style JSON report. A step is within the SLOs when its
+    success ratio and p99 latency do not cross the configured limits. The
+    `step` strategy multiplies the rate by `step_factor` until the first step
+    breaks the SLOs, the `binary` strategy bisects between the start and the
+    maximum rate.
+    """
+
+    def __init__(self, attack_step, start_rate, max_rate, strategy='step', step_factor=2.0,
+                 p99_slo=1.0, success_slo=0.99, resolution=0.05):
+        """
+        :param attack_step: callable(rate) returning a Vegeta style report
+        :param start_rate: first rate to try (requests per second)
+        :param max_rate: highest rate to try (requests per second)
+        :param strategy: step or binary
+        :param step_factor: rate multiplier between two steps of the step strategy
+        :param p99_slo: highest acceptable p99 latency in seconds
+        :param success_slo: lowest acceptable success ratio
+        :param resolution: relative precision at which the binary search stops
+        """
+        assert 0 < start_rate <= max_rate, "Saturation start rate must be positive and below the max rate"
+        assert strategy in ('step', 'binary'), "Unknown saturation strategy: %s" % strategy
+        assert step_factor > 1, "Saturation step factor must be greater than 1"
+        self.attack_step = attack_step
+        self.start_rate = start_rate
+        self.max_rate = max_rate
+        self.strategy = strategy
+        self.step_factor = step_factor
+        self.p99_slo = p99_slo
+        self.success_slo = success_slo
+        self.resolution = resolution
+        self.steps = []
+
+    def measure(self, rate):
+        """
+        Attack at `rate` and record whether the step was within the SLOs.
+        """
+        report = self.attack_step(rate)
+        p99 = report['latencies']['99th'] / 1e9
+        step = {
+            'rate': rate,
+            'requests': report['requests'],
+            'throughput': report['throughput'],
+            'success': report['success'],
+            'p50': report['latencies']['50th'] / 1e9,
+            'p99': p99,
+            'within_slo': report['success'] >= self.success_slo and p99 <= self.p99_slo,
+        }
+        self.steps.append(step)
+        logging.info("Saturation step: rate=%s/s throughput=%.1f/s success=%.2f%% p99=%.1fms %s",
+                     rate, step['throughput'], step['success'] * 100, p99 * 1000,
+                     'OK' if step['within_slo'] else 'SLO BREACHED')
+        return step
+
+    def search_step(self):
+        best = None
+        rate = self.start_rate
+        while True:
+            step = self.measure(rate)
+            if not step['within_slo']:
+                break
+            best = step
+            if rate >= self.max_rate:
+                break
+            rate = min(self.max_rate, max(rate + 1, int(math.ceil(rate * self.step_factor))))
+        return best
+
+    def search_binary(self):
+        low = self.measure(self.start_rate)
+        if not low['within_slo']:
+            return None
+        high = self.measure(self.max_rate)
+        if high['within_slo']:
+            return high
+        while high['rate'] - low['rate'] > max(1, low['rate'] * self.resolution):
+            step = self.measure((low['rate'] + high['rate']) // 2)
+            if step['within_slo']:
+                low = step
+            else:
+                high = step
+        return low
+
+    def run(self):
+        """
+        Run the search.
+
+        :return: dict with every step and the maximum sustainable rate and
+            throughput (None when even the start rate breaks the SLOs)
+        """
+        best = self.search_binary() if self.strategy == 'binary' else self.search_step()
+        knee = [step['rate'] for step in self.steps if not step['within_slo']]
+        return {
+            'strategy': self.strategy,
+            'slo': {'p99': self.p99_slo, 'success': self.success_slo},
+            'steps': self.steps,
+            'knee_rate': min(knee) if knee else None,
+            'max_sustainable_rate': best['rate'] if best else None,
+            'max_sustainable_throughput': best['throughput'] if best else None,
+        }
@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import random
+import logging
+import itertools
+
+from utils.attacker import Attacker
+from utils.engine import AsyncAttackEngine
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+
+def parse_mix(spec):
+    """
+    Parse a mix such as "get_users:5,get_catalog:3,image_pull:1" into a dict
+    of names to weights.
+    """
+    mix = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition(':')
+        mix[name.strip()] = float(weight or 1)
+        assert mix[name.strip()] > 0, "Scenario weight of %s must be positive" % name
+    return mix
+
+
+class Scenario:
+    """
+    Mixed workload that drives several endpoint tests and push/pull
+    operations concurrently at a global rate.
+
+    Every slot of the global rate picks a name from the weighted mix and
+    sends the next request of that endpoint (requests are replayed once
+    exhausted) or runs the operation. Latency is reported per name, so the
+    effect of one kind of traffic on another becomes visible.
+    """
+
+    def __init__(self, mix, env_config):
+        """
+        :param mix: dict of names (endpoint test names or operations) to weights
+        :param env_config: test configuration
+        """
+        self.mix = mix
+        self.env_config = env_config
+        self.sources = {}
+        self.known = set()
+
+    def add_requests(self, name, request_dicts):
+        """
+        Register the requests of an endpoint test. When it is part of the mix
+        they are spooled to disk so they can be replayed for the whole
+        scenario.
+        """
+        self.known.add(name)
+        if name not in self.mix:
+            return
+        env_config = self.env_config
+        spool = '%s/%s_scenario_%s_targets.jsonl' % (env_config["log_directory"], env_config["test_uuid"], name)
+        Attacker().spool_targets(request_dicts, spool)
+        assert os.path.getsize(spool), "No requests to replay for %s" % name
+        self.sources[name] = lambda: Attacker().replay_targets(spool)
+
+    def add_operation(self, name, operation):
+        """
+        Register a blocking operation, e.g. pushing or pulling one image.
+        """
+        self.known.add(name)
+        self.sources[name] = lambda: itertools.repeat({'call': operation})
+
+    def requests(self):
+        """
+        Endlessly yield requests picked according to the weighted mix.
+        """
+        missing = set(self.mix) - self.known
+        assert not missing, "Unknown scenario entries: %s. Valid entries: %s" % (
+            ', '.join(sorted(missing)), ', '.join(sorted(self.known)))
+        rng = random.Random(self.env_config["scenario_seed"])
+        names = list(self.mix)
+        cum_weights = list(itertools.accumulate(self.mix[name] for name in names))
+        sources = {name: self.sources[name]() for name in names}
+        while True:
+            name = rng.choices(names, cum_weights=cum_weights)[0]
+            yield dict(next(sources[name]), name=name)
+
+    def run(self):
+        """
+        Run the scenario for `SCENARIO_DURATION` seconds at `CONCURRENCY`
+        requests per second and write the per endpoint reports.
+
+        :return: dict with the total and the per endpoint reports
+        """
+        env_config = self.env_config
+        rate = env_config["concurrency"]
+        engine = AsyncAttackEngine(
+            rate,
+            env_config["auth_token"],
+            max_workers=env_config["attack_max_workers"],
+            http2=env_config["attack_http2"] == "true",
+        )
+        requests = itertools.islice(self.requests(), rate * env_config["scenario_duration"])
+        result_filename = '%s/%s_scenario_result.json' % (env_config["log_directory"], env_config["test_uuid"])
+        with open(result_filename, 'w') as output:
+            stats = engine.run('scenario', requests, output=output)
+
+        report = {
+            'mix': self.mix,
+            'total': stats.report(),
+            'endpoints': {name: endpoint.report() for name, endpoint in sorted(engine.endpoints.items())},
+        }
+        logging.info("%-40s %10s %9s %10s %10s %10s", 'endpoint', 'requests', 'success', 'rate', 'p50 (ms)', 'p99 (ms)')
+        for name, endpoint in report['endpoints'].items():
+            logging.info("%-40s %10s %8.2f%% %10.1f %10.1f %10.1f", name, endpoint['requests'],
+                         endpoint['success'] * 100, endpoint['rate'],
+                         endpoint['latencies']['50th'] / 1e6, endpoint['latencies']['99th'] / 1e6)
+
+        # Write the final report of every endpoint in the Vegeta format, so
+        # they can be indexed like the results of the single endpoint tests.
+        for name, endpoint in report['endpoints'].items():
+            filename = '%s/%s_scenario_%s_result.json' % (env_config["log_directory"], env_config["test_uuid"], name)
+            with open(filename, 'w') as f:
+                f.write(json.dumps(endpoint) + '\n')
+            Attacker().index_results('scenario_%s' % name, filename, env_config)
+            spool = '%s/%s_scenario_%s_targets.jsonl' % (env_config["log_directory"], env_config["test_uuid"], name)
+            if os.path.exists(spool):
+                os.remove(spool)
+
+        summary_filename = '%s/%s_scenario_summary.json' % (env_config["log_directory"], env_config["test_uuid"])
+        with open(summary_filename, 'w') as f:
+            json.dump(report, f, indent=2)
+        logging.info('Scenario results written to file: %s' % summary_filename)
+        return report
@@ -0,0 +1,93 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledSession:
+    """
+    Connection pooled HTTP session shared by all the threads of a push or
+    pull.
+
+    Requests go over keep-alive connections taken from a per-host pool
+    instead of paying a TCP+TLS handshake each, so timings reflect the
+    registry and not the client's handshakes. The pool blocks rather than
+    opening throwaway connections when all of its connections are in use,
+    so size it to the number of threads using it.
+    """
+
+    def __init__(self, pool_size, hosts=32):
+        """
+        :param pool_size: connections kept per host, e.g. image concurrency
+            times layer parallelism
+        :param hosts: number of hosts (registry, storage backends) to keep
+            pools for
+        """
+        self.session = requests.Session()
+        self.session.verify = False
+        self.adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def connection_stats(self):
+        """
+        Return how many requests were sent and how many connections had to
+        be opened for them, in total and per host.
+        """
+        hosts = {}
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+            host = hosts.setdefault('%s:%s' % (pool.host, pool.port), {'requests': 0, 'connections': 0})
+            host['requests'] += pool.num_requests
+            host['connections'] += pool.num_connections
+        return summarize_connection_stats(hosts)
+
+
+def summarize_connection_stats(hosts):
+    """
+    Add the totals and connection reuse ratios to per host request and
+    connection counts.
+    """
+    for host in hosts.values():
+        host['reuse_ratio'] = reuse_ratio(host['requests'], host['connections'])
+    total_requests = sum(host['requests'] for host in hosts.values())
+    total_connections = sum(host['connections'] for host in hosts.values())
+    return {
+        'requests': total_requests,
+        'connections': total_connections,
+        'reuse_ratio': reuse_ratio(total_requests, total_connections),
+        'hosts': hosts,
+    }
+
+
+def merge_connection_stats(stats_list):
+    """
+    Merge the connection stats of several sessions (e.g. pods).
+    """
+    hosts = {}
+    for stats in stats_list:
+        for name, host in stats['hosts'].items():
+            merged = hosts.setdefault(name, {'requests': 0, 'connections': 0})
+            merged['requests'] += host['requests']
+            merged['connections'] += host['connections']
+    return summarize_connection_stats(hosts)
+
+
+def reuse_ratio(requests_sent, connections):
+    """
+    Share of the requests that were sent over an already open connection.
+    """
+    if not requests_sent:
+        return 0.0
+    return round(max(0.0, 1 - connections / requests_sent), 4)
@@ -0,0 +1,167 @@
+import json
+
+
+class TagRange:
+    """
+    Image tags defined by a pattern and an index range instead of a list,
+    e.g. TagRange('quay.io/org/{repo}:{index}', 0, 1000000, ['a', 'b']).
+
+    `{index}` is replaced by the index of the tag and `{repo}` by one of
+    `repos`, taken round-robin by index. A range costs the same memory at
+    any size and behaves like a read-only list of its tags.
+    """
+
+    def __init__(self, pattern, start, stop, repos=()):
+        """
+        :param pattern: tag pattern with an {index} and optionally a {repo} field
+        :param start: first index
+        :param stop: index after the last one
+        :param repos: repositories the tags are spread across
+        """
+        self.pattern = pattern
+        self.start = start
+        self.stop = stop
+        self.repos = list(repos)
+
+    def __len__(self):
+        return max(0, self.stop - self.start)
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError('tag index out of range')
+        index = self.start + i
+        return self.pattern.format(index=index, repo=self.repos[index % len(self.repos)] if self.repos else '')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def dumps(self):
+        return json.dumps({'pattern': self.pattern, 'start': self.start, 'stop': self.stop, 'repos': self.repos})
+
+    @staticmethod
+    def loads(data):
+        return TagRange(**json.loads(data))
+
+
+class TagQueue:
+    """
+    Redis queue of image tags shared by the push or pull worker pods.
+
+    A list of tags is stored as a Redis list and popped in bulk with one
+    LRANGE + LTRIM transaction instead of one LPOP round trip per tag. This
+    works on every Redis version, unlike LPOP with a count, which needs
+    Redis 6.2.
+
+    A TagRange is not expanded: only the range and a cursor are stored.
+    Workers claim index ranges by moving the cursor with INCRBY and derive
+    the tag names locally, so queueing any number of tags is O(1).
+
+    A list queue can also be filled open and fed while it is drained:
+    producers `push` tags as they become available, consumers `drain` it
+    with `follow` and wait for more tags until the queue is `close`d.
+    """
+
+    def __init__(self, redis_client, key):
+        """
+        :param redis_client: Redis client
+        :param key: key of the Redis list
+        """
+        self.redis = redis_client
+        self.key = key
+        self.range_key = key + ':range'
+        self.cursor_key = key + ':cursor'
+        self.closed_key = key + ':closed'
+        self.tag_range = None
+
+    def fill(self, tags, closed=True):
+        """
+        Replace the content of the queue with `tags`, a list or a TagRange.
+
+        :param closed: False to let producers `push` more tags until `close`
+        """
+        pipeline = self.redis.pipeline()
+        pipeline.delete(self.key, self.range_key, self.cursor_key, self.closed_key)  # avoid stale data
+        if isinstance(tags, TagRange):
+            pipeline.set(self.range_key, tags.dumps())
+            pipeline.set(self.cursor_key, 0)
+            self.tag_range = tags
+        else:
+            if tags:
+                pipeline.rpush(self.key, *tags)
+            self.tag_range = False
+        if closed:
+            pipeline.set(self.closed_key, 1)
+        pipeline.execute()
+
+    def load_range(self):
+        """
+        Return the TagRange of the queue, or None when it holds a list.
+        """
+        if self.tag_range is None:
+            data = self.redis.get(self.range_key)
+            self.tag_range = TagRange.loads(data) if data else False
+        return self.tag_range if self.tag_range is not False else None
+
+    def pop(self, count):
+        """
+        Atomically pop up to `count` tags.
+
+        :return: list of tags, empty once the queue is drained
+        """
+        if count <= 0:
+            return []
+        tag_range = self.load_range()
+        if tag_range is not None:
+            end = self.redis.incrby(self.cursor_key, count)
+            return [tag_range[i] for i in range(end - count, min(end, len(tag_range)))]
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.lrange(self.key, 0, count - 1)
+        pipeline.ltrim(self.key, count, -1)
+        tags, _ = pipeline.execute()
+        return [tag.decode('utf-8') for tag in tags]
+
+    def push(self, tags):
+        """
+        Append tags to a list queue.
+        """
+        self.redis.rpush(self.key, *tags)
+
+    def close(self):
+        """
+        Mark that no more tags will be pushed, so following consumers stop
+        once the queue is empty.
+        """
+        self.redis.set(self.closed_key, 1)
+
+    def closed(self):
+        return bool(self.redis.exists(self.closed_key))
+
+    def drain(self, count, follow=False, poll_timeout=1):
+        """
+        Yield tags until the queue is empty, popping `count` at a time. The
+        next tags are only popped once the previous ones were consumed, so
+        workers sharing the queue each take work as they have capacity for it.
+
+        :param follow: wait for tags to be pushed until the queue is closed
+            instead of stopping at the first empty pop
+        :param poll_timeout: seconds to block waiting for a tag when following
+        """
+        while True:
+            # Closed is read before popping: every tag was pushed before the
+            # close, so an empty pop after it means the queue is done.
+            closed = not follow or self.closed()
+            tags = self.pop(count)
+            if tags:
+                yield from tags
+            elif closed:
+                return
+            else:
+                item = self.redis.blpop(self.key, timeout=poll_timeout)
+                if item:
+                    yield item[1].decode('utf-8')
+
+    def remaining(self):
+        tag_range = self.load_range()
+        if tag_range is not None:
+            return max(0, len(tag_range) - int(self.redis.get(self.cursor_key) or 0))
+        return self.redis.llen(self.key)
@@ -0,0 +1,142 @@
+import math
+import random
+import logging
+
+
+def log1p_over_x(x):
+    """
+    Return log1p(x) / x, numerically stable around 0.
+    """
+    if abs(x) > 1e-8:
+        return math.log1p(x) / x
+    return 1 - x * (0.5 - x * (1 / 3 - 0.25 * x))
+
+
+def expm1_over_x(x):
+    """
+    Return expm1(x) / x, numerically stable around 0.
+    """
+    if abs(x) > 1e-8:
+        return math.expm1(x) / x
+    return 1 + x * 0.5 * (1 + x * (1 / 3) * (1 + 0.25 * x))
+
+
+class ZipfSampler:
+    """
+    Draws ranks in [0, n) following a Zipf distribution using the
+    rejection-inversion method (Hörmann & Derflinger), which needs O(1)
+    memory regardless of `n`.
+    """
+
+    def __init__(self, n, exponent, rng):
+        assert n > 0, "Zipf population must not be empty"
+        assert exponent > 0, "Zipf exponent must be positive"
+        self.n = n
+        self.exponent = exponent
+        self.rng = rng
+        self.h_integral_x1 = self.h_integral(1.5) - 1
+        self.h_integral_n = self.h_integral(n + 0.5)
+        self.s = 2 - self.h_integral_inverse(self.h_integral(2.5) - self.h(2))
+
+    def h(self, x):
+        return math.exp(-self.exponent * math.log(x))
+
+    def h_integral(self, x):
+        log_x = math.log(x)
+        return expm1_over_x((1 - self.exponent) * log_x) * log_x
+
+    def h_integral_inverse(self, x):
+        t = max(x * (1 - self.exponent), -1)
+        return math.exp(log1p_over_x(t) * x)
+
+    def sample(self):
+        while True:
+            u = self.h_integral_n + self.rng.random() * (self.h_integral_x1 - self.h_integral_n)
+            x = self.h_integral_inverse(u)
+            k = min(max(int(x + 0.5), 1), self.n)
+            if k - x <= self.s or u >= self.h_integral(k + 0.5) - self.h(k):
+                return k - 1
+
+
+def sample_indices(population, sample_size, seed=None, distribution='uniform', exponent=1.0):
+    """
+    Yield `sample_size` distinct indices in [0, population) chosen with a
+    fixed seed. Memory is proportional to the sample size, never to the
+    population.
+
+    :param population: number of candidates
+    :param sample_size: number of distinct indices to draw
+    :param seed: seed of the random generator, the same seed yields the same indices
+    :param distribution: uniform or zipfian
+    :param exponent: skew of the zipfian distribution
+    """
+    rng = random.Random(seed)
+    sample_size = min(sample_size, population)
+    if distribution == 'uniform':
+        yield from rng.sample(range(population), sample_size)
+        return
+
+    assert distribution == 'zipfian', "Unknown sampling distribution: %s" % distribution
+    zipf = ZipfSampler(population, exponent, rng)
+    yield from _distinct_draws(zipf.sample, lambda: rng.randrange(population), sample_size)
+
+
+def _distinct_draws(draw, fallback, sample_size):
+    """
+    Yield `sample_size` distinct values of `draw()`.
+
+    The tail of a zipfian distribution is rarely hit, so the draws for a
+    large sample would mostly be duplicates. The attempts are bounded and
+    the remainder is filled from `fallback()`, a uniform draw.
+    """
+    seen = set()
+    attempts = 20 * sample_size
+    while len(seen) < sample_size and attempts > 0:
+        attempts -= 1
+        value = draw()
+        if value not in seen:
+            seen.add(value)
+            yield value
+    if len(seen) < sample_size:
+        logging.info("Zipfian sampling saturated after %s values, drawing the rest uniformly", len(seen))
+    while len(seen) < sample_size:
+        value = fallback()
+        if value not in seen:
+            seen.add(value)
+            yield value
+
+
+def pairs(rows, cols, sample_size=0, seed=None, distribution='uniform'):
+    """
+    Lazily yield (row, col) combinations of `rows` × `cols`.
+
+    Without a sample size every combination is yielded in row major order.
+    Otherwise `sample_size` distinct combinations are drawn (see
+    `sample_indices`). Zipfian sampling draws the row and the column
+    independently, so it favours the first rows and the first columns.
+
+    :param rows: list of first elements, e.g. repos
+    :param cols: list of second elements, e.g. teams or users
+    :param sample_size: number of combinations to yield, 0 for all of them
+    :param seed: seed used when sampling
+    :param distribution: uniform or zipfian
+    """
+    population = len(rows) * len(cols)
+    if not sample_size or sample_size >= population:
+        for row in rows:
+            for col in cols:
+                yield row, col
+        return
+
+    if distribution == 'zipfian':
+        # A single rank over the row major combinations would only favour
+        # the first rows, with every column of them before the next row.
+        rng = random.Random(seed)
+        row_zipf = ZipfSampler(len(rows), 1.0, rng)
+        col_zipf = ZipfSampler(len(cols), 1.0, rng)
+        draws = _distinct_draws(lambda: (row_zipf.sample(), col_zipf.sample()),
+                               lambda: (rng.randrange(len(rows)), rng.randrange(len(cols))), sample_size)
+    else:
+        draws = (divmod(index, len(cols)) for index in sample_indices(population, sample_size, seed, distribution))
+    for row, col in draws:
+        yield rows[row], cols[col]
@@ -0,0 +1,140 @@
+import time
+import threading
+
+from utils.histogram import LatencyHistogram
+
+# Prefix of the latency bucket fields in the per-second hashes.
+LATENCY_FIELD = 'l'
+
+
+class Telemetry:
+    """
+    Per-second counters of a push or pull run shared through Redis, so the
+    controller can follow a run while the worker pods are still busy.
+
+    Workers record every completed image into the bucket of the second it
+    completed in: operations, errors, bytes and the latency buckets of a
+    `LatencyHistogram`. About once per `flush_interval` the buckets are
+    added to one Redis hash per second with pipelined HINCRBYs, so any
+    number of pods can write the same second without coordination, and
+    the per-second hashes expire after `ttl`. Running totals of the whole
+    run are kept in one more hash.
+
+    The controller adds up the hashes of the last seconds into a rolling
+    view of the throughput, error rate and latency quantiles.
+    """
+
+    def __init__(self, redis_client, key, flush_interval=1.0, ttl=24 * 3600):
+        """
+        :param redis_client: Redis client
+        :param key: prefix of the per-second hashes
+        :param flush_interval: seconds between writes to Redis
+        :param ttl: seconds the per-second hashes are kept
+        """
+        self.redis = redis_client
+        self.key = key
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        self.total_key = key + ':total'
+        self.buckets = {}
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        # Only used for its bucket layout.
+        self.histogram = LatencyHistogram()
+
+    def record(self, successful, elapsed=None, num_bytes=0, now=None):
+        """
+        Count one completed operation, and flush the counters when the
+        flush interval elapsed.
+
+        :param successful: whether the operation succeeded
+        :param elapsed: latency in seconds, None when unknown
+        :param num_bytes: bytes transferred
+        :param now: completion time (epoch seconds), defaults to now
+        """
+        second = int(now if now is not None else time.time())
+        with self.lock:
+            bucket = self.buckets.setdefault(second, {})
+            bucket['ops'] = bucket.get('ops', 0) + 1
+            if not successful:
+                bucket['errors'] = bucket.get('errors', 0) + 1
+            if num_bytes:
+                bucket['bytes'] = bucket.get('bytes', 0) + num_bytes
+            if elapsed is not None and successful:
+                value = int(round(max(elapsed, 0.0) / self.histogram.unit))
+                field = '%s%s' % (LATENCY_FIELD, self.histogram.bucket(value))
+                bucket[field] = bucket.get(field, 0) + 1
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Add the buffered counters to Redis in one round trip.
+        """
+        with self.lock:
+            buckets, self.buckets = self.buckets, {}
+            self.last_flush = time.monotonic()
+        if not buckets:
+            return
+        pipeline = self.redis.pipeline(transaction=False)
+        for second, counters in buckets.items():
+            name = '%s:%s' % (self.key, second)
+            for field, value in counters.items():
+                pipeline.hincrby(name, field, value)
+                if not field.startswith(LATENCY_FIELD):
+                    pipeline.hincrby(self.total_key, field, value)
+            pipeline.expire(name, self.ttl)
+        pipeline.expire(self.total_key, self.ttl)
+        pipeline.execute()
+
+    def reset(self):
+        """
+        Drop the counters of a previous run with the same key.
+        """
+        names = list(self.redis.scan_iter(match='%s:*' % self.key, count=1000))
+        if names:
+            self.redis.delete(*names)
+
+    def totals(self):
+        """
+        Return the operations, errors and bytes counted since the start.
+        """
+        totals = {'ops': 0, 'errors': 0, 'bytes': 0}
+        for field, value in self.redis.hgetall(self.total_key).items():
+            totals[field.decode('utf-8')] = int(value)
+        return totals
+
+    def window(self, seconds=60, now=None):
+        """
+        Aggregate the counters of the last `seconds` complete seconds.
+
+        :return: dict with the operations, errors and bytes of the window,
+            their rates, the error rate and the latency quantiles
+        """
+        end = int(now if now is not None else time.time())
+        pipeline = self.redis.pipeline(transaction=False)
+        for second in range(end - seconds, end):
+            pipeline.hgetall('%s:%s' % (self.key, second))
+
+        totals = {'ops': 0, 'errors': 0, 'bytes': 0}
+        histogram = LatencyHistogram(self.histogram.precision_bits, self.histogram.unit)
+        for counters in pipeline.execute():
+            for field, value in counters.items():
+                field, value = field.decode('utf-8'), int(value)
+                if field.startswith(LATENCY_FIELD):
+                    histogram.record(histogram.bucket_value(int(field[len(LATENCY_FIELD):])) * histogram.unit, value)
+                else:
+                    totals[field] = totals.get(field, 0) + value
+
+        return {
+            'window': seconds,
+            'ops': totals['ops'],
+            'errors': totals['errors'],
+            'bytes': totals['bytes'],
+            'ops_per_sec': round(totals['ops'] / seconds, 2),
+            'mb_per_sec': round(totals['bytes'] / seconds / 1e6, 3),
+            'error_rate': round(totals['errors'] / totals['ops'], 4) if totals['ops'] else 0.0,
+            'latency': {q: round(histogram.quantile(value), 4) for q, value in
+                        (('p50', 0.50), ('p90', 0.90), ('p99', 0.99))} if histogram.count else {},
+        }
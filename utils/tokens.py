@@ -0,0 +1,153 @@
+import sys
+import time
+import logging
+import threading
+
+import requests
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+# Lifetime the registry token spec assumes when a response has no expires_in.
+DEFAULT_EXPIRES_IN = 60
+
+
+def request_token(registry, repository, scope='pull', username=None, password=None, session=None, mount_from=None):
+    """
+    Request a bearer token for `repository:<repository>:<scope>` from the
+    registry, plus pull access to `mount_from` when blobs are mounted from
+    that repository.
+
+    :return: (token, expires_in seconds)
+    """
+    auth_url = f"https://{registry}/v2/auth?service={registry}&scope=repository:{repository}:{scope}"
+    if mount_from:
+        auth_url += f"&scope=repository:{mount_from}:pull"
+    http = session or requests
+    if username and password:
+        response = http.get(auth_url, auth=(username, password), verify=False)
+    else:
+        response = http.get(auth_url, verify=False)
+    response.raise_for_status()
+    data = response.json()
+    return data.get('token'), int(data.get('expires_in') or DEFAULT_EXPIRES_IN)
+
+
+class TokenCache:
+    """
+    Thread-safe cache of registry bearer tokens keyed by (registry,
+    repository, scope, mount_from).
+
+    Tokens are refreshed `refresh_margin` seconds before they expire, or
+    halfway through their lifetime when it is shorter than twice the
+    margin, so short-lived tokens are still reused. Only
+    one thread requests a token for a given key at a time, the others wait
+    for it and reuse its token, so many threads hitting a 401 together
+    trigger a single refresh instead of a stampede on the auth endpoint.
+    """
+
+    def __init__(self, username=None, password=None, session=None, refresh_margin=10):
+        """
+        :param username: registry username (anonymous when not set)
+        :param password: registry password
+        :param session: optional PooledSession used for the token requests
+        :param refresh_margin: seconds before expiry at which a token is refreshed
+        """
+        self.username = username
+        self.password = password
+        self.session = session
+        self.refresh_margin = refresh_margin
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.tokens = {}
+        self.hits = 0
+        self.fetches = 0
+        self.failures = 0
+        self.invalidations = 0
+        self.auth_time = 0.0
+
+    def key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def cached(self, key):
+        """
+        Return the cached token of `key` unless it is about to expire.
+        """
+        entry = self.tokens.get(key)
+        if entry and time.monotonic() < entry[1]:
+            return entry[0]
+        return None
+
+    def get(self, registry, repository, scope='pull', mount_from=None):
+        """
+        Return a valid token, requesting a new one if needed.
+
+        :return: the token or None if it could not be fetched
+        """
+        key = (registry, repository, scope, mount_from)
+        token = self.cached(key)
+        if token:
+            with self.lock:
+                self.hits += 1
+            return token
+        with self.key_lock(key):
+            # Another thread may have refreshed the token while we waited.
+            token = self.cached(key)
+            if token:
+                with self.lock:
+                    self.hits += 1
+                return token
+            return self.fetch(key)
+
+    def invalidate(self, registry, repository, scope, token, mount_from=None):
+        """
+        Drop `token` after the registry rejected it and return a fresh one.
+        When another thread already replaced it, that token is returned
+        without requesting a new one.
+        """
+        key = (registry, repository, scope, mount_from)
+        with self.key_lock(key):
+            entry = self.tokens.get(key)
+            if entry and entry[0] != token:
+                return entry[0]
+            with self.lock:
+                self.invalidations += 1
+            self.tokens.pop(key, None)
+            return self.fetch(key)
+
+    def fetch(self, key):
+        """
+        Request the token of `key`. Must be called holding its key lock.
+        """
+        registry, repository, scope, mount_from = key
+        start = time.monotonic()
+        try:
+            token, expires_in = request_token(registry, repository, scope, self.username, self.password, self.session,
+                                              mount_from)
+        except Exception as e:
+            logging.info(f"Failed to get auth token: {e}")
+            token, expires_in = None, 0
+        elapsed = time.monotonic() - start
+        with self.lock:
+            self.fetches += 1
+            self.auth_time += elapsed
+            if not token:
+                self.failures += 1
+        if token:
+            # Stored with the time at which it should be refreshed.
+            self.tokens[key] = (token, start + expires_in - min(self.refresh_margin, expires_in / 2))
+        return token
+
+    def stats(self):
+        """
+        Return the number of token requests and cache hits and the total
+        time spent requesting tokens.
+        """
+        with self.lock:
+            return {
+                'fetches': self.fetches,
+                'hits': self.hits,
+                'failures': self.failures,
+                'invalidations': self.invalidations,
+                'auth_time': round(self.auth_time, 4),
+            }
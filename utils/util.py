@@ -1,5 +1,6 @@
 import sys
 import logging
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
@@ -9,4 +10,22 @@ def print_header(title, **kwargs):
     Pretty-Print a Banner.
     """
     metadata = " ".join(["%s=%s" % (k, v) for k, v in kwargs.items()])
-    logging.info("%s\t%s", title, metadata)
\ No newline at end of file
+    logging.info("%s\t%s", title, metadata)
+
+
+def imap_bounded(executor, fn, items, limit):
+    """
+    Call `fn` on every item in `executor` and yield the results as they
+    complete, like `as_completed` over `executor.submit`. The next item is
+    only taken when fewer than `limit` calls are running, so `items` can be
+    a lazy iterator such as a queue being drained.
+    """
+    pending = set()
+    for item in items:
+        if len(pending) >= limit:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+        pending.add(executor.submit(fn, item))
+    for future in as_completed(pending):
+        yield future.result()